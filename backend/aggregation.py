@@ -0,0 +1,163 @@
+from typing import Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+
+# Pre-aggregated chart builders.
+# Instead of shipping every raw row to Plotly and letting the browser group
+# them, these compute the summary (group sums, counts, 2D bins, box quartiles)
+# with pandas/NumPy and build the trace from that summary only.
+# Each builder returns (figure, plotted_elements) or None when the column
+# combination is not one it summarizes; callers then fall back to plotly.express.
+
+DEFAULT_HEATMAP_BINS = 30
+
+
+def _is_numeric(series: pd.Series) -> bool:
+    return pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series)
+
+
+def _counts(series: pd.Series) -> pd.Series:
+    return series.value_counts(sort=False, dropna=True)
+
+
+def _group_sum(df: pd.DataFrame, key: str, value: str) -> pd.Series:
+    return df.groupby(key, sort=False, observed=True)[value].sum()
+
+
+def aggregate_frame(df: pd.DataFrame, x: str, y: Optional[str], color: Optional[str], agg: str) -> Tuple[pd.DataFrame, str]:
+    """One row per x (and color) value, sorted by x, with y aggregated by `agg`; returns (frame, y column).
+
+    Without a y column (or for "count") the value is the row count, named "count" when y is not set.
+    """
+    keys = list(dict.fromkeys(k for k in (x, color) if k))
+    grouped = df.groupby(keys, sort=True, observed=True)
+    if not y or y in keys:
+        return grouped.size().reset_index(name="count"), "count"
+    return grouped[y].agg(agg).reset_index(), y
+
+
+def build_bar(df: pd.DataFrame, x: Optional[str], y: Optional[str], title: str) -> Optional[Tuple[go.Figure, int]]:
+    if not x:
+        return None
+
+    if not y:
+        summary = _counts(df[x])
+        trace = go.Bar(x=summary.index, y=summary.to_numpy(), name="count")
+        x_title, y_title = x, "count"
+    elif _is_numeric(df[y]):
+        summary = _group_sum(df, x, y)
+        trace = go.Bar(x=summary.index, y=summary.to_numpy())
+        x_title, y_title = x, y
+    elif _is_numeric(df[x]):
+        summary = _group_sum(df, y, x)
+        trace = go.Bar(x=summary.to_numpy(), y=summary.index, orientation="h")
+        x_title, y_title = x, y
+    else:
+        return None
+
+    fig = go.Figure(trace)
+    fig.update_layout(title=title, xaxis_title=x_title, yaxis_title=y_title)
+    return fig, len(summary)
+
+
+def build_pie(df: pd.DataFrame, names: Optional[str], values: Optional[str], title: str) -> Optional[Tuple[go.Figure, int]]:
+    if not names:
+        return None
+
+    if not values:
+        summary = _counts(df[names])
+    elif _is_numeric(df[values]):
+        summary = _group_sum(df, names, values)
+    else:
+        return None
+
+    fig = go.Figure(go.Pie(labels=summary.index, values=summary.to_numpy()))
+    fig.update_layout(title=title)
+    return fig, len(summary)
+
+
+def _box_stats(values: pd.Series, groups: Optional[pd.Series]) -> pd.DataFrame:
+    """Quartiles and Tukey whiskers (1.5 IQR, clamped to data) per group."""
+    mask = values.notna()
+    if groups is not None:
+        mask &= groups.notna()
+    values = values[mask].astype(np.float64)
+    keys = groups[mask] if groups is not None else pd.Series(0, index=values.index)
+    if values.empty:
+        # Nothing to summarize (e.g. a filter matched no rows): an empty trace, not an error.
+        return pd.DataFrame(columns=["q1", "median", "q3", "mean", "lowerfence", "upperfence"], dtype=np.float64)
+
+    grouped = values.groupby(keys, sort=False, observed=True)
+    stats = grouped.quantile([0.25, 0.5, 0.75]).unstack()
+    stats.columns = ["q1", "median", "q3"]
+    stats["mean"] = grouped.mean()
+
+    iqr = stats["q3"] - stats["q1"]
+    low = (stats["q1"] - 1.5 * iqr).reindex(keys).to_numpy()
+    high = (stats["q3"] + 1.5 * iqr).reindex(keys).to_numpy()
+    stats["lowerfence"] = values.where(values.to_numpy() >= low).groupby(keys, sort=False, observed=True).min()
+    stats["upperfence"] = values.where(values.to_numpy() <= high).groupby(keys, sort=False, observed=True).max()
+    return stats
+
+
+def build_box(df: pd.DataFrame, x: Optional[str], y: Optional[str], title: str) -> Optional[Tuple[go.Figure, int]]:
+    if x and y and _is_numeric(df[y]) and not _is_numeric(df[x]):
+        stats = _box_stats(df[y], df[x])
+        trace = go.Box(x=stats.index, orientation="v")
+    elif x and y and _is_numeric(df[x]) and not _is_numeric(df[y]):
+        stats = _box_stats(df[x], df[y])
+        trace = go.Box(y=stats.index, orientation="h")
+    elif (x or y) and not (x and y) and _is_numeric(df[x or y]):
+        column = x or y
+        stats = _box_stats(df[column], None)
+        trace = go.Box(name=column, orientation="h" if x else "v")
+    else:
+        return None
+
+    trace.update(
+        q1=stats["q1"].to_numpy(),
+        median=stats["median"].to_numpy(),
+        q3=stats["q3"].to_numpy(),
+        mean=stats["mean"].to_numpy(),
+        lowerfence=stats["lowerfence"].to_numpy(),
+        upperfence=stats["upperfence"].to_numpy(),
+    )
+
+    fig = go.Figure(trace)
+    fig.update_layout(title=title, xaxis_title=x, yaxis_title=y)
+    return fig, len(stats)
+
+
+def _bin_axis(series: pd.Series, nbins: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Returns (per-row bin code, bin labels). Numeric/datetime axes are binned, others factorized."""
+    if _is_numeric(series) or pd.api.types.is_datetime64_any_dtype(series):
+        is_datetime = pd.api.types.is_datetime64_any_dtype(series)
+        raw = series.to_numpy(dtype="datetime64[ns]").astype(np.int64) if is_datetime else series.to_numpy(dtype=np.float64)
+        values = raw.astype(np.float64)
+        edges = np.histogram_bin_edges(values, bins=nbins)
+        codes = np.clip(np.searchsorted(edges, values, side="right") - 1, 0, len(edges) - 2)
+        centers = (edges[:-1] + edges[1:]) / 2
+        if is_datetime:
+            centers = pd.to_datetime(centers.astype(np.int64))
+        return codes, np.asarray(centers)
+
+    codes, uniques = pd.factorize(series, sort=True)
+    return codes, np.asarray(uniques)
+
+
+def build_heatmap(df: pd.DataFrame, x: Optional[str], y: Optional[str], title: str, nbins: int = DEFAULT_HEATMAP_BINS) -> Optional[Tuple[go.Figure, int]]:
+    if not (x and y):
+        return None
+
+    pair = df[[x, y]].dropna() if x != y else df[[x]].dropna()
+    x_codes, x_labels = _bin_axis(pair[x], nbins)
+    y_codes, y_labels = _bin_axis(pair[y], nbins)
+
+    flat = y_codes.astype(np.int64) * len(x_labels) + x_codes
+    z = np.bincount(flat, minlength=len(x_labels) * len(y_labels)).reshape(len(y_labels), len(x_labels))
+
+    fig = go.Figure(go.Heatmap(x=x_labels, y=y_labels, z=z, colorbar={"title": "count"}))
+    fig.update_layout(title=title, xaxis_title=x, yaxis_title=y)
+    return fig, int(z.size)
@@ -0,0 +1,99 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+# Content-addressed cache for chart-image analysis results.
+# Keys are derived from the image bytes, the dataset schema description and the
+# model name, so an identical screenshot against an identical dataset skips the
+# Gemini round-trip. An in-memory LRU tier sits in front of an optional SQLite
+# tier that survives restarts; both honour the same TTL.
+
+
+def make_analysis_key(image_bytes: bytes, dataset_context: str, model_name: str) -> str:
+    digest = hashlib.sha256()
+    digest.update(hashlib.sha256(image_bytes).digest())
+    digest.update(hashlib.sha256(dataset_context.encode("utf-8")).digest())
+    digest.update(model_name.encode("utf-8"))
+    return digest.hexdigest()
+
+
+class AnalysisCache:
+    def __init__(self, max_entries: int, db_path: Optional[str] = None, ttl_seconds: float = 0):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+
+        self._memory: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+        self._db: Optional[sqlite3.Connection] = None
+        if db_path:
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS analysis_cache ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, stored_at REAL NOT NULL)"
+            )
+            self._db.commit()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        now = time.time()
+        with self._lock:
+            item = self._memory.get(key)
+            if item is not None and not self._is_expired(item[0], now):
+                self._memory.move_to_end(key)
+                self._hits += 1
+                return item[1]
+            self._memory.pop(key, None)
+
+            stored = self._db_get(key, now)
+            if stored is None:
+                self._misses += 1
+                return None
+            self._hits += 1
+            self._memory_put(key, stored[1], stored[0])
+            return stored[1]
+
+    def put(self, key: str, value: Dict[str, Any]) -> None:
+        now = time.time()
+        with self._lock:
+            self._memory_put(key, value, now)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO analysis_cache (key, value, stored_at) VALUES (?, ?, ?)",
+                    (key, json.dumps(value), now),
+                )
+                self._db.commit()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"entries": len(self._memory), "hits": self._hits, "misses": self._misses}
+
+    # --- internals (caller holds the lock) ---
+
+    def _is_expired(self, stored_at: float, now: float) -> bool:
+        return bool(self.ttl_seconds) and now - stored_at > self.ttl_seconds
+
+    def _memory_put(self, key: str, value: Dict[str, Any], stored_at: float) -> None:
+        self._memory[key] = (stored_at, value)
+        self._memory.move_to_end(key)
+        while self.max_entries and len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _db_get(self, key: str, now: float) -> Optional[Tuple[float, Dict[str, Any]]]:
+        if self._db is None:
+            return None
+        row = self._db.execute(
+            "SELECT value, stored_at FROM analysis_cache WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        if self._is_expired(row[1], now):
+            self._db.execute("DELETE FROM analysis_cache WHERE key = ?", (key,))
+            self._db.commit()
+            return None
+        return row[1], json.loads(row[0])
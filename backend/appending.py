@@ -0,0 +1,80 @@
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+from compaction import downcast_numeric
+
+# Rows appended to an existing session (/api/sessions/{id}/append-csv).
+# New rows are parsed on their own and then conformed to the session's stored
+# dtypes, so a growing log keeps the compact dtypes chosen at upload time:
+# numbers are downcast the same way (concatenation widens the stored column
+# only when a new value does not fit), date columns are parsed as dates, and
+# categorical columns keep their categories with any new values added.
+
+
+class SchemaMismatchError(ValueError):
+    """Raised when appended rows do not fit the session's columns; reported as HTTP 400."""
+
+
+def _conform_column(name: str, series: pd.Series, dtype) -> pd.Series:
+    present = series.notna()
+    if pd.api.types.is_bool_dtype(dtype):
+        if pd.api.types.is_bool_dtype(series):
+            return series
+        text = series.astype(str).str.lower()
+        if not text[present].isin(["true", "false"]).all():
+            raise SchemaMismatchError(f"Column '{name}' expects true/false values.")
+        flags = text.eq("true")
+        # Missing values need the nullable dtype; object would profile as categorical.
+        return flags if present.all() else flags.astype("boolean").where(present, pd.NA)
+
+    if pd.api.types.is_numeric_dtype(dtype):
+        try:
+            return downcast_numeric(pd.to_numeric(series))
+        except (TypeError, ValueError):
+            raise SchemaMismatchError(f"Column '{name}' expects numeric values.")
+
+    if pd.api.types.is_datetime64_any_dtype(dtype):
+        if pd.api.types.is_datetime64_any_dtype(series):
+            parsed = series
+        else:
+            parsed = pd.to_datetime(series.astype(str).where(present), errors="coerce")
+            if parsed.notna().sum() < present.sum():
+                raise SchemaMismatchError(f"Column '{name}' expects dates.")
+        tz = getattr(dtype, "tz", None)
+        if tz is not None and parsed.dt.tz is None:
+            parsed = parsed.dt.tz_localize(tz)
+        elif tz is None and parsed.dt.tz is not None:
+            parsed = parsed.dt.tz_convert(None)
+        return parsed
+
+    # Text and categorical columns: values keep their CSV text form.
+    text = series.astype(str).where(present)
+    if isinstance(dtype, pd.CategoricalDtype):
+        return text.astype("category")
+    return text.astype(dtype) if pd.api.types.is_string_dtype(dtype) else text
+
+
+def conform_frame(rows: pd.DataFrame, dtypes: pd.Series) -> pd.DataFrame:
+    """`rows` in the session's column order, each column converted to match the stored dtype."""
+    missing = [c for c in dtypes.index if c not in rows.columns]
+    extra = [c for c in rows.columns if c not in dtypes.index]
+    if missing or extra:
+        parts = []
+        if missing:
+            parts.append(f"missing columns: {', '.join(map(str, missing))}")
+        if extra:
+            parts.append(f"unknown columns: {', '.join(map(str, extra))}")
+        raise SchemaMismatchError("Appended rows do not match the session: " + "; ".join(parts))
+    return pd.DataFrame({col: _conform_column(col, rows[col], dtypes[col]) for col in dtypes.index})
+
+
+def concat_frames(df: pd.DataFrame, rows: pd.DataFrame) -> pd.DataFrame:
+    """`df` followed by `rows` with a fresh RangeIndex; categorical columns get the union of their categories."""
+    columns = {}
+    for col in df.columns:
+        old, new = df[col], rows[col]
+        if isinstance(old.dtype, pd.CategoricalDtype) and isinstance(new.dtype, pd.CategoricalDtype):
+            columns[col] = pd.Series(union_categoricals([old, new], ignore_order=True), name=col)
+        else:
+            columns[col] = pd.concat([old, new], ignore_index=True)
+    return pd.DataFrame(columns)
@@ -0,0 +1,484 @@
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Set, Tuple
+
+import numpy as np
+import pandas as pd
+
+from profiling import ColumnProfile, profile_dataframe, profile_from_json, profile_to_json
+from session_store import SessionBackend, SessionChangedError, SessionEntry, SessionTooLargeError
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc  # noqa: F401
+except ImportError:  # optional: only needed for SESSION_BACKEND=arrow
+    pa = None
+
+# Shared, columnar, file-backed session backend.
+# Each session is one Arrow IPC file in a directory that every worker process
+# (or pod, on a shared volume) can see, so any worker can serve any session
+# without sticky routing, and sessions survive restarts. Files are opened
+# through a memory map and only the columns a request asks for are decoded;
+# decoded columns are kept in a byte-bounded per-process LRU. Writes are
+# atomic renames and the column profile travels in the schema metadata.
+# Idle time is tracked per session through an empty marker file in access/
+# whose mtime is the last access (session files are never touched on reads:
+# shared sessions are links to one file with one atime). The byte budget and
+# TTL are enforced by sweeping the directory on every upload.
+# Sessions with the same content are hard links to one file: the file system
+# counts the references, the data is freed when the last link is removed, and
+# the byte budget counts each file once. Session files are never written in
+# place (appends write a new file), so a shared file stays immutable.
+
+FILE_SUFFIX = ".arrow"
+# Hard links named by content key, pointing at the file of a session stored by content
+CONTENT_DIR = "by-content"
+# One empty file per session, touched on every access
+ACCESS_DIR = "access"
+PROFILE_METADATA_KEY = b"chartly.profile"
+META_CACHE_SESSIONS = 1024
+
+
+def _valid_session_id(session_id: str) -> bool:
+    return bool(session_id) and all(c.isalnum() or c == "-" for c in session_id)
+
+
+def _to_table(df: pd.DataFrame) -> "pa.Table":
+    """Arrow table for `df`; object columns Arrow cannot type (e.g. ints mixed with strings) are stored as text."""
+    try:
+        return pa.Table.from_pandas(df, preserve_index=False)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        pass
+    df = df.copy(deep=False)
+    for col in df.columns:
+        series = df[col]
+        if series.dtype != object:
+            continue
+        try:
+            pa.array(series, from_pandas=True)
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            df[col] = series.astype(str).where(series.notna())
+    return pa.Table.from_pandas(df, preserve_index=False)
+
+
+def _appended_metadata(old: "pa.Schema", added: "pa.Schema") -> Dict[bytes, bytes]:
+    """Schema metadata for stored rows followed by `added` rows.
+
+    The stored pandas metadata is kept, except for bool columns the new rows made nullable:
+    those must read back as pandas "boolean", or missing values turn them into object columns.
+    """
+    metadata = dict(old.metadata or {})
+    if b"pandas" not in metadata or b"pandas" not in (added.metadata or {}):
+        return metadata
+    pandas_metadata = json.loads(metadata[b"pandas"])
+    added_columns = {c["name"]: c for c in json.loads(added.metadata[b"pandas"])["columns"]}
+    for i, column in enumerate(pandas_metadata["columns"]):
+        new = added_columns.get(column["name"])
+        if new is not None and column["numpy_type"] == "bool" and new["numpy_type"] == "boolean":
+            pandas_metadata["columns"][i] = new
+    metadata[b"pandas"] = json.dumps(pandas_metadata).encode("utf-8")
+    return metadata
+
+
+class ArrowFileSessionBackend(SessionBackend):
+    def __init__(self, directory: str, max_bytes: int = 0, ttl_seconds: float = 0, max_sessions: int = 0, column_cache_bytes: int = 0):
+        if pa is None:
+            raise RuntimeError("SESSION_BACKEND=arrow requires pyarrow (pip install pyarrow).")
+        super().__init__()
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.max_sessions = max_sessions
+        self.column_cache_bytes = column_cache_bytes
+        os.makedirs(os.path.join(directory, CONTENT_DIR), exist_ok=True)
+        os.makedirs(os.path.join(directory, ACCESS_DIR), exist_ok=True)
+
+        # Session metadata and decoded columns, both validated against the file's mtime.
+        self._meta: "OrderedDict[str, Tuple[int, SessionEntry]]" = OrderedDict()
+        self._columns: "OrderedDict[Tuple[str, str], Tuple[int, pd.Series, int]]" = OrderedDict()
+        self._column_bytes = 0
+        self._lock = threading.RLock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._expirations = 0
+        self._shares = 0
+
+    def _path(self, session_id: str) -> str:
+        return os.path.join(self.directory, session_id + FILE_SUFFIX)
+
+    def _content_path(self, content_key: str) -> str:
+        return os.path.join(self.directory, CONTENT_DIR, content_key + FILE_SUFFIX)
+
+    def _access_path(self, session_id: str) -> str:
+        return os.path.join(self.directory, ACCESS_DIR, session_id)
+
+    def put(self, session_id: str, df: pd.DataFrame, profile: Optional[Dict[str, ColumnProfile]] = None, content_key: Optional[str] = None) -> SessionEntry:
+        if not _valid_session_id(session_id):
+            raise ValueError(f"Invalid session id '{session_id}'.")
+        profile = profile or profile_dataframe(df)
+
+        path = self._path(session_id)
+        tmp_path, nbytes = self._write_tmp(path, _to_table(df), profile)
+
+        with self._lock:
+            replaced = os.path.exists(path)
+            os.replace(tmp_path, path)
+            self._touch(session_id)
+            mtime_ns = os.stat(path).st_mtime_ns
+            if replaced:
+                self._forget(session_id)
+                self._notify_removed(session_id)
+
+            now = time.time()
+            entry = SessionEntry(
+                df=None,
+                nbytes=nbytes,
+                created_at=now,
+                last_access=now,
+                profile=profile,
+                n_rows=len(df),
+                columns=list(df.columns),
+                content_key=content_key,
+                version=mtime_ns,
+            )
+            self._cache_meta(session_id, mtime_ns, entry)
+            if content_key and _valid_session_id(content_key):
+                try:
+                    os.link(path, self._content_path(content_key))
+                except OSError:  # already stored by another upload, or no hard links here
+                    pass
+            self._sweep(keep=session_id)
+        return entry
+
+    def share(self, content_key: str, session_id: str) -> Optional[SessionEntry]:
+        if not (_valid_session_id(content_key) and _valid_session_id(session_id)):
+            return None
+        with self._lock:
+            self._sweep(keep=None)
+            if os.path.exists(self._path(session_id)):
+                self._remove(session_id)
+            path = self._path(session_id)
+            try:
+                os.link(self._content_path(content_key), path)
+            except FileNotFoundError:
+                return None
+            self._touch(session_id)
+            self._shares += 1
+            entry = self.get_entry(session_id)
+            if entry is not None:
+                entry.content_key = content_key
+        return entry
+
+    def append(self, session_id: str, rows: pd.DataFrame, profile: Dict[str, ColumnProfile], expected_rows: int) -> Optional[SessionEntry]:
+        entry = self.get_entry(session_id)
+        if entry is None:
+            return None
+        if entry.n_rows != expected_rows:
+            raise SessionChangedError("Session changed while rows were being appended.")
+        path = self._path(session_id)
+        mtime_ns = os.stat(path).st_mtime_ns
+
+        # IPC files cannot grow in place: the stored batches are written out again
+        # straight from the memory map (no pandas round trip), followed by the new rows.
+        old = self._open_table(path)
+        added = _to_table(rows)
+        metadata = _appended_metadata(old.schema, added.schema)
+        added = added.replace_schema_metadata(old.schema.metadata)
+        table = pa.concat_tables([old, added], promote_options="permissive").unify_dictionaries()
+        table = table.replace_schema_metadata(metadata)
+        tmp_path, nbytes = self._write_tmp(path, table, profile)
+
+        with self._lock:
+            try:
+                changed = os.stat(path).st_mtime_ns != mtime_ns
+            except FileNotFoundError:
+                changed = True
+            if changed:
+                os.remove(tmp_path)
+                raise SessionChangedError("Session changed while rows were being appended.")
+            os.replace(tmp_path, path)
+            self._touch(session_id)
+            self._forget(session_id)
+            now = time.time()
+            mtime_ns = os.stat(path).st_mtime_ns
+            grown = SessionEntry(
+                df=None,
+                nbytes=nbytes,
+                created_at=now,
+                last_access=now,
+                profile=profile,
+                n_rows=table.num_rows,
+                columns=list(table.column_names),
+                version=mtime_ns,
+            )
+            self._cache_meta(session_id, mtime_ns, grown)
+            self._sweep(keep=session_id)
+        self._notify_appended(session_id, grown, rows)
+        return grown
+
+    def get_entry(self, session_id: str, touch: bool = True) -> Optional[SessionEntry]:
+        if not _valid_session_id(session_id):
+            return None
+        path = self._path(session_id)
+        with self._lock:
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                self._forget(session_id)
+                if touch:
+                    self._misses += 1
+                return None
+
+            now = time.time()
+            last_access = self._last_access(session_id, st)
+            if self._is_expired(last_access, now):
+                self._remove(session_id)
+                self._expirations += 1
+                if touch:
+                    self._misses += 1
+                return None
+
+            cached = self._meta.get(session_id)
+            if cached is not None and cached[0] == st.st_mtime_ns:
+                entry = cached[1]
+                self._meta.move_to_end(session_id)
+            else:
+                self._forget(session_id)
+                entry = self._load_meta(path, st, last_access)
+                self._cache_meta(session_id, st.st_mtime_ns, entry)
+
+            if touch:
+                self._hits += 1
+                entry.last_access = now
+                self._touch(session_id)
+            return entry
+
+    def _frame(self, session_id: str, entry: SessionEntry, columns: List[str]) -> pd.DataFrame:
+        # Decoded columns are valid for the file as it is now, not as this process last saw it
+        # (stat before reading: a file replaced in between is cached under the older mtime and never served).
+        mtime_ns = os.stat(self._path(session_id)).st_mtime_ns
+        with self._lock:
+            series = {}
+            for col in columns:
+                cached = self._columns.get((session_id, col))
+                if cached is not None and cached[0] == mtime_ns:
+                    self._columns.move_to_end((session_id, col))
+                    series[col] = cached[1]
+        missing = [col for col in columns if col not in series]
+
+        if missing:
+            # Only the requested columns' pages of the mapped file are touched and decoded.
+            decoded = self._open_table(self._path(session_id)).select(missing).to_pandas(split_blocks=True)
+            with self._lock:
+                for col in missing:
+                    series[col] = decoded[col]
+                    self._cache_column(session_id, col, mtime_ns, decoded[col])
+
+        return pd.DataFrame({col: series[col] for col in columns}, copy=False)
+
+    def _take_frame(self, session_id: str, entry: SessionEntry, columns: List[str], positions: Optional[np.ndarray]) -> pd.DataFrame:
+        if positions is None:
+            return self._frame(session_id, entry, columns)
+        # Gathers the wanted rows straight from the mapped file instead of decoding whole columns.
+        table = self._open_table(self._path(session_id)).select(columns)
+        return table.take(pa.array(positions)).to_pandas(split_blocks=True)
+
+    def delete(self, session_id: str) -> bool:
+        if not _valid_session_id(session_id):
+            return False
+        with self._lock:
+            return self._remove(session_id)
+
+    def stats(self) -> Dict[str, int]:
+        # Read-only (metrics scrapes call this): expired sessions are left for the next read or write to remove.
+        with self._lock:
+            now = time.time()
+            files = [f for f in self._list_files() if not self._is_expired(f[1], now)]
+            return {
+                "sessions": len(files),
+                "bytes": sum({inode: size for _, _, size, inode in files}.values()),
+                "max_bytes": self.max_bytes,
+                "hits": self._hits,
+                "misses": self._misses,
+                "evictions": self._evictions,
+                "expirations": self._expirations,
+                "frames": len({inode for _, _, _, inode in files}),
+                "shares": self._shares,
+            }
+
+    # --- internals (caller holds the lock) ---
+
+    def _write_tmp(self, path: str, table: "pa.Table", profile: Dict[str, ColumnProfile]) -> Tuple[str, int]:
+        """Writes `table` with its profile next to `path`; returns (temporary path, size) for an atomic rename."""
+        metadata = dict(table.schema.metadata or {})
+        metadata[PROFILE_METADATA_KEY] = profile_to_json(profile).encode("utf-8")
+        table = table.replace_schema_metadata(metadata)
+
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with pa.OSFile(tmp_path, "wb") as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+
+        nbytes = os.path.getsize(tmp_path)
+        if self.max_bytes and nbytes > self.max_bytes:
+            os.remove(tmp_path)
+            raise SessionTooLargeError(
+                f"Dataset needs {nbytes} bytes, session budget is {self.max_bytes} bytes."
+            )
+        return tmp_path, nbytes
+
+    def _open_table(self, path: str) -> "pa.Table":
+        # Zero-copy: the table's buffers point straight into the memory map.
+        with pa.memory_map(path, "r") as source:
+            return pa.ipc.open_file(source).read_all()
+
+    def _load_meta(self, path: str, st: os.stat_result, last_access: float) -> SessionEntry:
+        table = self._open_table(path)
+        metadata = table.schema.metadata or {}
+        raw_profile = metadata.get(PROFILE_METADATA_KEY)
+        if raw_profile:
+            profile = profile_from_json(raw_profile.decode("utf-8"))
+        else:
+            profile = profile_dataframe(table.to_pandas(split_blocks=True))
+        return SessionEntry(
+            df=None,
+            nbytes=st.st_size,
+            created_at=st.st_mtime,
+            last_access=last_access,
+            profile=profile,
+            n_rows=table.num_rows,
+            columns=list(table.column_names),
+            version=st.st_mtime_ns,
+        )
+
+    def _cache_meta(self, session_id: str, mtime_ns: int, entry: SessionEntry) -> None:
+        self._meta[session_id] = (mtime_ns, entry)
+        self._meta.move_to_end(session_id)
+        while len(self._meta) > META_CACHE_SESSIONS:
+            oldest, _ = self._meta.popitem(last=False)
+            self._forget(oldest)
+
+    def _cache_column(self, session_id: str, col: str, mtime_ns: int, series: pd.Series) -> None:
+        nbytes = int(series.memory_usage(deep=True, index=False))
+        if self.column_cache_bytes and nbytes > self.column_cache_bytes:
+            return
+        self._drop_column((session_id, col))
+        self._columns[(session_id, col)] = (mtime_ns, series, nbytes)
+        self._column_bytes += nbytes
+        while self.column_cache_bytes and self._column_bytes > self.column_cache_bytes:
+            self._drop_column(next(iter(self._columns)))
+
+    def _drop_column(self, key: Tuple[str, str]) -> None:
+        cached = self._columns.pop(key, None)
+        if cached is not None:
+            self._column_bytes -= cached[2]
+
+    def _forget(self, session_id: str) -> None:
+        """Drops everything this process has decoded for a session."""
+        self._meta.pop(session_id, None)
+        for key in [k for k in self._columns if k[0] == session_id]:
+            self._drop_column(key)
+
+    def _is_expired(self, last_access: float, now: float) -> bool:
+        return bool(self.ttl_seconds) and now - last_access > self.ttl_seconds
+
+    def _touch(self, session_id: str) -> None:
+        """Records an access to this session only (not to other sessions linked to the same file)."""
+        path = self._access_path(session_id)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            open(path, "ab").close()
+
+    def _last_access(self, session_id: str, st: os.stat_result) -> float:
+        try:
+            return os.stat(self._access_path(session_id)).st_mtime
+        except FileNotFoundError:  # written before access markers, or marker not created yet
+            return st.st_mtime
+
+    def _remove(self, session_id: str) -> bool:
+        self._forget(session_id)
+        try:
+            os.remove(self._path(session_id))
+        except FileNotFoundError:
+            return False
+        try:
+            os.remove(self._access_path(session_id))
+        except FileNotFoundError:
+            pass
+        self._notify_removed(session_id)
+        return True
+
+    def _list_files(self) -> List[Tuple[str, float, int, int]]:
+        """(session id, last access, size, inode) per session file; shared sessions have the same inode."""
+        files = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(FILE_SUFFIX):
+                continue
+            try:
+                st = os.stat(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                continue
+            session_id = name[:-len(FILE_SUFFIX)]
+            files.append((session_id, self._last_access(session_id, st), st.st_size, st.st_ino))
+        return files
+
+    def _sweep(self, keep: Optional[str]) -> List[Tuple[str, float, int, int]]:
+        """Expires idle sessions, then evicts least recently used ones past the budget."""
+        now = time.time()
+        files = []
+        listed = self._list_files()
+        for session_id, last_access, size, inode in listed:
+            if session_id != keep and self._is_expired(last_access, now):
+                if self._remove(session_id):
+                    self._expirations += 1
+                continue
+            files.append((session_id, last_access, size, inode))
+
+        # A shared file counts once and only frees space when its last session goes.
+        links: Dict[int, int] = {}
+        sizes: Dict[int, int] = {}
+        for _, _, size, inode in files:
+            links[inode] = links.get(inode, 0) + 1
+            sizes[inode] = size
+        files.sort(key=lambda f: f[1])
+        total = sum(sizes.values())
+        while files and ((self.max_bytes and total > self.max_bytes) or (self.max_sessions and len(files) > self.max_sessions)):
+            victim = next((f for f in files if f[0] != keep), None)
+            if victim is None:
+                break
+            files.remove(victim)
+            links[victim[3]] -= 1
+            if not links[victim[3]]:
+                total -= victim[2]
+            if self._remove(victim[0]):
+                self._evictions += 1
+
+        self._sweep_content()
+        self._sweep_access({f[0] for f in listed})
+        return files
+
+    def _sweep_content(self) -> None:
+        """Drops content links whose sessions are all gone (the link is the file's last name)."""
+        content_dir = os.path.join(self.directory, CONTENT_DIR)
+        for name in os.listdir(content_dir):
+            path = os.path.join(content_dir, name)
+            try:
+                if os.stat(path).st_nlink <= 1:
+                    os.remove(path)
+            except FileNotFoundError:
+                continue
+
+    def _sweep_access(self, session_ids: Set[str]) -> None:
+        """Drops access markers left behind by sessions that are gone (e.g. after a crash)."""
+        access_dir = os.path.join(self.directory, ACCESS_DIR)
+        for name in os.listdir(access_dir):
+            if name not in session_ids:
+                try:
+                    os.remove(os.path.join(access_dir, name))
+                except FileNotFoundError:
+                    continue
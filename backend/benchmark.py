@@ -0,0 +1,395 @@
+"""Performance benchmark for the Chartly backend.
+
+Drives the ASGI app in-process (no server, no network) with synthetic CSVs
+and reports p50/p99 latency, payload bytes and peak RSS per endpoint. Gemini
+is replaced by a local stub with a configurable delay, so analyze timings
+measure this backend rather than Google's.
+
+    python benchmark.py                              # 10k and 1m rows, and a 300-column session for ranking
+    python benchmark.py --rows 10k,1m,10m --repeat 10
+    python benchmark.py --save baseline.json
+    python benchmark.py --compare baseline.json --max-regression 0.2
+
+Environment variables (SESSION_BACKEND, WORKER_POOL, ...) are honoured as
+usual, so configurations can be compared against each other as well.
+"""
+import argparse
+import asyncio
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+try:
+    import resource
+except ImportError:  # Unix only; peak RSS is reported as unavailable elsewhere (Windows)
+    resource = None
+
+ROW_COUNTS = {"10k": 10_000, "1m": 1_000_000, "10m": 10_000_000}
+# Wide session for ranked suggestions: every column pair is scored, so cost grows with the width
+WIDE_ROWS = 20_000
+CSV_WRITE_CHUNK_ROWS = 1_000_000
+CATEGORIES = [f"product_{i:02d}" for i in range(20)]
+REGIONS = ["north", "south", "east", "west", "central"]
+
+# Chart type -> (x, y) on the synthetic schema
+RENDER_CASES = {
+    "line": ("ts", "value"),
+    "area": ("ts", "amount"),
+    "scatter": ("value", "amount"),
+    "bar": ("category", "amount"),
+    "pie": ("region", "amount"),
+    "box": ("region", "value"),
+    "heatmap": ("value", "amount"),
+    "histogram": ("value", None),
+}
+SUGGEST_CASES = [
+    {},
+    {"x": "ts", "y": "value"},
+    {"x": "category", "y": "amount"},
+    {"x": "value", "y": "amount"},
+    {"x": "region"},
+]
+
+
+# --- SYNTHETIC DATA ---
+
+def write_synthetic_csv(path: str, rows: int, seed: int = 42) -> None:
+    """Mixed numeric, categorical and datetime columns, written in chunks to bound memory."""
+    rng = np.random.default_rng(seed)
+    start = pd.Timestamp("2020-01-01")
+    level = 0.0
+    with open(path, "w", newline="") as f:
+        for offset in range(0, rows, CSV_WRITE_CHUNK_ROWS):
+            n = min(CSV_WRITE_CHUNK_ROWS, rows - offset)
+            steps = rng.standard_normal(n)
+            chunk = pd.DataFrame({
+                "ts": start + pd.to_timedelta(np.arange(offset, offset + n), unit="min"),
+                "value": level + steps.cumsum(),
+                "amount": rng.gamma(2.0, 50.0, n).round(2),
+                "count": rng.integers(0, 1000, n),
+                "category": rng.choice(CATEGORIES, n),
+                "region": rng.choice(REGIONS, n),
+            })
+            level = float(chunk["value"].iloc[-1])
+            chunk.to_csv(f, index=False, header=offset == 0)
+
+
+def write_wide_csv(path: str, rows: int, columns: int, seed: int = 7) -> None:
+    """Half numeric, a third categorical (2 to 200 values) and the rest 0/1 flag columns."""
+    rng = np.random.default_rng(seed)
+    n_num, n_cat = columns // 2, columns // 3
+    data = {}
+    for i in range(n_num):
+        data[f"num_{i}"] = (rng.standard_normal(rows) * (i + 1)).round(3)
+    for i in range(n_cat):
+        data[f"cat_{i}"] = np.char.add("v", rng.integers(0, 2 + (i * 7) % 199, rows).astype(str))
+    for i in range(columns - n_num - n_cat):
+        data[f"flag_{i}"] = (rng.random(rows) < 0.1).astype(np.int8)
+    pd.DataFrame(data).to_csv(path, index=False)
+
+
+def synthetic_csv(cache_dir: str, label: str) -> str:
+    path = os.path.join(cache_dir, f"chartly-bench-{label}.csv")
+    if not os.path.exists(path):
+        print(f"Generating {label} rows -> {path}")
+        write_synthetic_csv(path + ".tmp", ROW_COUNTS[label])
+        os.replace(path + ".tmp", path)
+    return path
+
+
+def chart_png(width: int = 1600, height: int = 1000, variant: int = 0) -> bytes:
+    """A bar-chart-like PNG; `variant` changes one bar so each call misses the analysis cache."""
+    from PIL import Image, ImageDraw
+
+    image = Image.new("RGB", (width, height), "white")
+    draw = ImageDraw.Draw(image)
+    for i in range(12):
+        bar_height = (i * 53 + variant * 7) % (height - 100) + 50
+        x0 = 60 + i * (width - 120) // 12
+        draw.rectangle([x0, height - 50 - bar_height, x0 + 80, height - 50], fill=(40, 90 + i * 10, 200))
+    out = io.BytesIO()
+    image.save(out, format="PNG")
+    return out.getvalue()
+
+
+# --- GEMINI STUB ---
+
+class StubGeminiResponse:
+    text = json.dumps({
+        "detected_chart_type": "bar",
+        "raw_label": "bar chart",
+        "confidence": 0.9,
+        "explanation_tr": "Kategorilere göre değerler.",
+        "is_compatible": True,
+        "compatibility_reason_tr": "Kategorik ve sayısal sütunlar mevcut.",
+    })
+
+
+class StubGeminiModel:
+    def __init__(self, delay_seconds: float):
+        self.delay_seconds = delay_seconds
+
+    async def generate_content_async(self, contents: Any, safety_settings: Any = None) -> StubGeminiResponse:
+        await asyncio.sleep(self.delay_seconds)
+        return StubGeminiResponse()
+
+
+def install_gemini_stub(main_module: Any, delay_seconds: float) -> None:
+    import gemini_client
+
+    model = StubGeminiModel(delay_seconds)
+    gemini_client.get_gemini_model = lambda *args, **kwargs: model
+    main_module.GEMINI_API_KEY = main_module.GEMINI_API_KEY or "benchmark-stub"
+
+
+# --- MEASUREMENT ---
+
+def peak_rss_bytes() -> Optional[int]:
+    """Lifetime peak of this process, so it covers the whole run rather than any one size."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes.
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def summarize(latencies: List[float], payload_bytes: List[int], statuses: List[int]) -> Dict[str, Any]:
+    ms = np.array(latencies) * 1000
+    return {
+        "n": len(latencies),
+        "p50_ms": round(float(np.percentile(ms, 50)), 2),
+        "p99_ms": round(float(np.percentile(ms, 99)), 2),
+        "mean_ms": round(float(ms.mean()), 2),
+        "payload_bytes": int(np.median(payload_bytes)),
+        "errors": sum(1 for s in statuses if s >= 400),
+    }
+
+
+class Recorder:
+    def __init__(self):
+        self.samples: Dict[str, Dict[str, list]] = {}
+
+    def add(self, name: str, seconds: float, payload: int, status: int) -> None:
+        sample = self.samples.setdefault(name, {"latencies": [], "payload": [], "status": []})
+        sample["latencies"].append(seconds)
+        sample["payload"].append(payload)
+        sample["status"].append(status)
+
+    def results(self) -> Dict[str, Any]:
+        return {
+            name: summarize(s["latencies"], s["payload"], s["status"])
+            for name, s in self.samples.items()
+        }
+
+
+async def timed(recorder: Recorder, name: str, request: Any) -> Any:
+    start = time.perf_counter()
+    response = await request
+    # Bytes on the wire: compressed size when the response was encoded.
+    recorder.add(name, time.perf_counter() - start, response.num_bytes_downloaded, response.status_code)
+    return response
+
+
+# --- SCENARIOS ---
+
+async def bench_size(client: Any, main_module: Any, label: str, csv_path: str, args: argparse.Namespace) -> Dict[str, Any]:
+    recorder = Recorder()
+
+    session_id = None
+    for _ in range(args.upload_repeat):
+        with open(csv_path, "rb") as f:
+            response = await timed(recorder, "upload", client.post(
+                "/api/upload-csv", files={"file": ("bench.csv", f, "text/csv")}
+            ))
+        response.raise_for_status()
+        if session_id is not None:
+            await client.delete(f"/api/sessions/{session_id}")
+        session_id = response.json()["session_id"]
+
+    for _ in range(args.repeat):
+        for case in SUGGEST_CASES:
+            await timed(recorder, "suggest", client.post(
+                "/api/suggest-charts", json={"session_id": session_id, **case}
+            ))
+        await timed(recorder, "suggest:rank", client.post(
+            "/api/suggest-charts", json={"session_id": session_id, "mode": "rank"}
+        ))
+
+    for chart_type, (x, y) in RENDER_CASES.items():
+        payload = {"session_id": session_id, "chart_type": chart_type, "x": x, "y": y, "response_format": "figure"}
+        for _ in range(args.repeat):
+            # Drop memoized renders so every iteration measures a full render.
+            main_module.RENDER_CACHE.invalidate_session(session_id)
+            await timed(recorder, f"render:{chart_type}", client.post("/api/render-chart", json=payload))
+        for _ in range(args.repeat):
+            await timed(recorder, "render:cached", client.post("/api/render-chart", json=payload))
+
+    batch = {
+        "session_id": session_id,
+        "charts": [{"chart_type": t, "x": x, "y": y, "response_format": "figure"} for t, (x, y) in RENDER_CASES.items()],
+    }
+    for _ in range(args.repeat):
+        main_module.RENDER_CACHE.invalidate_session(session_id)
+        await timed(recorder, "render-charts", client.post("/api/render-charts", json=batch))
+
+    for i in range(args.repeat):
+        image = chart_png(variant=i + 1)
+        await timed(recorder, "analyze", client.post(
+            "/api/analyze-chart-image", data={"session_id": session_id},
+            files={"file": ("chart.png", image, "image/png")},
+        ))
+        await timed(recorder, "analyze:cached", client.post(
+            "/api/analyze-chart-image", data={"session_id": session_id},
+            files={"file": ("chart.png", image, "image/png")},
+        ))
+
+    await client.delete(f"/api/sessions/{session_id}")
+    return {"rows": ROW_COUNTS[label], "endpoints": recorder.results()}
+
+
+async def bench_wide(client: Any, csv_path: str, columns: int, args: argparse.Namespace) -> Dict[str, Any]:
+    recorder = Recorder()
+    with open(csv_path, "rb") as f:
+        response = await client.post("/api/upload-csv", files={"file": ("wide.csv", f, "text/csv")})
+    response.raise_for_status()
+    session_id = response.json()["session_id"]
+
+    for _ in range(args.repeat):
+        await timed(recorder, "suggest:rank", client.post(
+            "/api/suggest-charts", json={"session_id": session_id, "mode": "rank"}
+        ))
+
+    await client.delete(f"/api/sessions/{session_id}")
+    return {"rows": WIDE_ROWS, "columns": columns, "endpoints": recorder.results()}
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    import httpx
+    import main
+
+    install_gemini_stub(main, args.gemini_delay)
+    results = {}
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        for label in args.rows:
+            csv_path = synthetic_csv(args.data_dir, label)
+            print(f"Benchmarking {label} rows ...")
+            results[label] = await bench_size(client, main, label, csv_path, args)
+        if args.wide_columns:
+            label = f"{WIDE_ROWS // 1000}k x {args.wide_columns} cols"
+            csv_path = os.path.join(args.data_dir, f"chartly-bench-wide-{args.wide_columns}.csv")
+            if not os.path.exists(csv_path):
+                print(f"Generating {label} -> {csv_path}")
+                write_wide_csv(csv_path + ".tmp", WIDE_ROWS, args.wide_columns)
+                os.replace(csv_path + ".tmp", csv_path)
+            print(f"Benchmarking {label} ...")
+            results[label] = await bench_wide(client, csv_path, args.wide_columns, args)
+    return results
+
+
+# --- REPORTING ---
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_report(results: Dict[str, Any], peak_rss: Optional[int], baseline: Optional[Dict[str, Any]] = None) -> List[str]:
+    """Prints one table per row count; returns "size/endpoint" names slower than the baseline's p50."""
+    regressions = []
+    rss = f"{peak_rss / 2**20:.0f} MiB" if peak_rss is not None else "n/a"
+    print(f"Peak RSS over the whole run: {rss}")
+    for label, size in results.items():
+        title = f"{label} rows" if label in ROW_COUNTS else label
+        print(f"\n== {title}")
+        print(f"{'endpoint':<18}{'n':>5}{'p50 ms':>11}{'p99 ms':>11}{'bytes':>12}{'err':>5}{'p50 vs base':>14}")
+        base_endpoints = (baseline or {}).get(label, {}).get("endpoints", {})
+        for name, r in size["endpoints"].items():
+            delta = ""
+            base = base_endpoints.get(name)
+            if base and base["p50_ms"] > 0:
+                change = r["p50_ms"] / base["p50_ms"] - 1
+                delta = f"{change:+.1%}"
+                regressions.append((f"{label}/{name}", change))
+            print(f"{name:<18}{r['n']:>5}{r['p50_ms']:>11.2f}{r['p99_ms']:>11.2f}{r['payload_bytes']:>12}{r['errors']:>5}{delta:>14}")
+    return regressions
+
+
+def main_cli() -> int:
+    parser = argparse.ArgumentParser(description="Chartly backend benchmark (in-process, Gemini stubbed).")
+    parser.add_argument("--rows", default="10k,1m", help=f"Comma-separated sizes from {', '.join(ROW_COUNTS)}.")
+    parser.add_argument("--repeat", type=int, default=5, help="Iterations per suggest/render/analyze case.")
+    parser.add_argument("--upload-repeat", type=int, default=3, help="Uploads per size.")
+    parser.add_argument("--wide-columns", type=int, default=300, help=f"Columns of a {WIDE_ROWS}-row session for ranked suggestions (0 skips it).")
+    parser.add_argument("--gemini-delay", type=float, default=0.0, help="Seconds the Gemini stub waits per call.")
+    parser.add_argument("--data-dir", default=tempfile.gettempdir(), help="Where generated CSVs are cached.")
+    parser.add_argument("--save", help="Write results as a JSON baseline to this path.")
+    parser.add_argument("--compare", help="Baseline JSON to compare p50 latencies against.")
+    parser.add_argument("--max-regression", type=float, help="Exit 1 if any p50 is slower than the baseline by more than this ratio (e.g. 0.2).")
+    args = parser.parse_args()
+
+    args.rows = [r.strip().lower() for r in args.rows.split(",") if r.strip()]
+    unknown = [r for r in args.rows if r not in ROW_COUNTS]
+    if unknown:
+        parser.error(f"Unknown sizes {unknown}; choose from {list(ROW_COUNTS)}.")
+
+    # Keep benchmark sessions away from a running server's session directory.
+    session_dir = None
+    if "SESSION_DIR" not in os.environ:
+        session_dir = tempfile.TemporaryDirectory(prefix="chartly-bench-sessions-")
+        os.environ["SESSION_DIR"] = session_dir.name
+    # Repeated uploads of one file would otherwise measure deduplication, not parsing.
+    os.environ.setdefault("UPLOAD_DEDUP", "false")
+    try:
+        results = asyncio.run(run(args))
+        peak_rss = peak_rss_bytes()
+    finally:
+        if session_dir is not None:
+            session_dir.cleanup()
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)["results"]
+    regressions = print_report(results, peak_rss, baseline)
+
+    if args.save:
+        document = {
+            "commit": git_commit(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "config": {k: os.environ.get(k) for k in ("SESSION_BACKEND", "WORKER_POOL", "WORKER_POOL_SIZE", "CSV_ENGINE", "UPLOAD_DEDUP")},
+            "args": {"repeat": args.repeat, "upload_repeat": args.upload_repeat, "wide_columns": args.wide_columns, "gemini_delay": args.gemini_delay},
+            "peak_rss_bytes": peak_rss,
+            "results": results,
+        }
+        with open(args.save, "w") as f:
+            json.dump(document, f, indent=2)
+        print(f"\nSaved baseline to {args.save}")
+
+    if args.max_regression is not None:
+        failed = [(name, change) for name, change in regressions if change > args.max_regression]
+        for name, change in failed:
+            print(f"REGRESSION {name}: p50 {change:+.1%}")
+        return 1 if failed else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
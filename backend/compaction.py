@@ -0,0 +1,67 @@
+import numpy as np
+import pandas as pd
+from pandas.tseries.api import guess_datetime_format
+
+# Dtype compaction applied when a session is created.
+# - integers are downcast to the smallest (unsigned) type that holds them
+# - floats go to float32 only when the round trip is exact
+# - date-like text columns are parsed to datetime64
+# - low-cardinality text columns become `category`
+
+DATE_SAMPLE_ROWS = 1000
+DATE_MIN_PARSE_RATIO = 0.95
+
+
+def _is_text(series: pd.Series) -> bool:
+    return pd.api.types.is_object_dtype(series) or pd.api.types.is_string_dtype(series)
+
+
+def downcast_numeric(series: pd.Series) -> pd.Series:
+    if pd.api.types.is_bool_dtype(series):
+        return series
+    if pd.api.types.is_integer_dtype(series):
+        downcast = "unsigned" if len(series) and series.min() >= 0 else "integer"
+        return pd.to_numeric(series, downcast=downcast)
+    if pd.api.types.is_float_dtype(series) and series.dtype != np.float32:
+        values = series.to_numpy()
+        narrowed = values.astype(np.float32)
+        if np.array_equal(narrowed.astype(values.dtype), values, equal_nan=True):
+            return pd.Series(narrowed, index=series.index, name=series.name)
+    return series
+
+
+def _parse_dates(series: pd.Series):
+    """Returns the column parsed as datetime64, or None if it does not look like dates."""
+    non_null = series.dropna()
+    if non_null.empty:
+        return None
+    sample = non_null.head(DATE_SAMPLE_ROWS).astype(str)
+    fmt = guess_datetime_format(sample.iloc[0])
+    if fmt is None:
+        return None
+
+    parsed_sample = pd.to_datetime(sample, format=fmt, errors="coerce")
+    if parsed_sample.notna().mean() < DATE_MIN_PARSE_RATIO:
+        return None
+
+    parsed = pd.to_datetime(series, format=fmt, errors="coerce")
+    if parsed.notna().sum() < DATE_MIN_PARSE_RATIO * len(non_null):
+        return None
+    return parsed
+
+
+def compact_dataframe(df: pd.DataFrame, category_max_ratio: float) -> pd.DataFrame:
+    """Returns a dtype-compacted copy of `df`; column order and values are unchanged."""
+    columns = {}
+    for col in df.columns:
+        series = df[col]
+        if pd.api.types.is_numeric_dtype(series):
+            series = downcast_numeric(series)
+        elif _is_text(series):
+            parsed = _parse_dates(series)
+            if parsed is not None:
+                series = parsed
+            elif len(series) and series.nunique() <= category_max_ratio * len(series):
+                series = series.astype("category")
+        columns[col] = series
+    return pd.DataFrame(columns, index=df.index)
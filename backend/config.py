@@ -1,18 +1,137 @@
 
 import os
 import pathlib
-from dotenv import load_dotenv
+import tempfile
 
 # Force load .env from the same directory as this config file
 # This ensures consistency regardless of where the script is run from
+# (python-dotenv is only imported when there is a .env file to read)
 env_path = pathlib.Path(__file__).parent / '.env'
-load_dotenv(dotenv_path=env_path)
+if env_path.is_file():
+    from dotenv import load_dotenv
+    load_dotenv(dotenv_path=env_path)
 
 GEMINI_API_KEY = os.environ.get("GEMINI_API_KEY")
+# Safe-to-log form of the key, e.g. for the startup log line
+GEMINI_API_KEY_MASKED = (
+    (f"{GEMINI_API_KEY[:6]}...{GEMINI_API_KEY[-4:]}" if len(GEMINI_API_KEY) > 10 else "***")
+    if GEMINI_API_KEY else None
+)
 
-# One-time debug log on import
-if GEMINI_API_KEY:
-    masked_key = f"{GEMINI_API_KEY[:6]}...{GEMINI_API_KEY[-4:]}" if len(GEMINI_API_KEY) > 10 else "***"
-    print(f"[CONFIG] GEMINI_API_KEY loaded: {masked_key}")
-else:
-    print("[CONFIG] GEMINI_API_KEY NOT FOUND in environment!")
+# --- STARTUP ---
+# After startup, warm Plotly (and the worker processes when WORKER_POOL=process) in the background
+# so the first render does not pay for it.
+PREWARM = os.environ.get("PREWARM", "true").lower() in ("1", "true", "yes")
+
+# --- OBSERVABILITY ---
+# Level of the "chartly" logger. Per-request detail (Gemini raw output, image sizes) is DEBUG.
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO")
+# "text" (key=value fields) or "json" (one object per line).
+LOG_FORMAT = os.environ.get("LOG_FORMAT", "text")
+# Expose Prometheus metrics at /api/metrics.
+METRICS_ENABLED = os.environ.get("METRICS_ENABLED", "true").lower() in ("1", "true", "yes")
+# Add a Server-Timing header with per-stage durations to every response (visible in browser devtools).
+SERVER_TIMING = os.environ.get("SERVER_TIMING", "false").lower() in ("1", "true", "yes")
+
+# --- RENDERING ---
+# Point budget for line/area/scatter charts before server-side downsampling kicks in.
+# Clients can override per request via RenderRequest.options["max_points"] (0 disables).
+RENDER_MAX_POINTS = int(os.environ.get("RENDER_MAX_POINTS", "5000"))
+# Chart responses at least this large are gzip/brotli compressed when the client accepts it.
+RENDER_COMPRESS_MIN_BYTES = int(os.environ.get("RENDER_COMPRESS_MIN_BYTES", "1024"))
+# Byte budget for memoized render-chart bodies (LRU). 0 disables the limit.
+RENDER_CACHE_MAX_BYTES = int(os.environ.get("RENDER_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+# Charts of one /api/render-charts batch rendered at the same time, and the most charts a batch may request.
+RENDER_BATCH_WORKERS = int(os.environ.get("RENDER_BATCH_WORKERS", str(min(4, os.cpu_count() or 1))))
+RENDER_BATCH_MAX_CHARTS = int(os.environ.get("RENDER_BATCH_MAX_CHARTS", "50"))
+
+# --- CHART SUGGESTIONS ---
+# /api/suggest-charts with "mode": "rank" scores every column pair on at most this many evenly spaced rows.
+SUGGEST_SAMPLE_ROWS = int(os.environ.get("SUGGEST_SAMPLE_ROWS", "20000"))
+# Ranked suggestions returned when the request does not set "top_k".
+SUGGEST_TOP_K = int(os.environ.get("SUGGEST_TOP_K", "10"))
+
+# --- WORKER POOLS ---
+# Chart rendering runs off the event loop in a "thread" or "process" pool of WORKER_POOL_SIZE workers.
+# CSV parsing and image decoding always use threads (they work on this process's objects).
+WORKER_POOL = os.environ.get("WORKER_POOL", "thread")
+WORKER_POOL_SIZE = int(os.environ.get("WORKER_POOL_SIZE", str(os.cpu_count() or 1)))
+# Per-endpoint limits: requests doing CPU work at once, and how many more may wait for a slot.
+# Beyond that the endpoint answers 503 with Retry-After. A concurrency of 0 disables the limit.
+UPLOAD_MAX_CONCURRENCY = int(os.environ.get("UPLOAD_MAX_CONCURRENCY", "2"))
+UPLOAD_MAX_QUEUE = int(os.environ.get("UPLOAD_MAX_QUEUE", "8"))
+RENDER_MAX_CONCURRENCY = int(os.environ.get("RENDER_MAX_CONCURRENCY", str(WORKER_POOL_SIZE)))
+RENDER_MAX_QUEUE = int(os.environ.get("RENDER_MAX_QUEUE", "32"))
+RENDER_BATCH_MAX_CONCURRENCY = int(os.environ.get("RENDER_BATCH_MAX_CONCURRENCY", "2"))
+RENDER_BATCH_MAX_QUEUE = int(os.environ.get("RENDER_BATCH_MAX_QUEUE", "4"))
+ANALYZE_MAX_CONCURRENCY = int(os.environ.get("ANALYZE_MAX_CONCURRENCY", "8"))
+ANALYZE_MAX_QUEUE = int(os.environ.get("ANALYZE_MAX_QUEUE", "16"))
+SUGGEST_MAX_CONCURRENCY = int(os.environ.get("SUGGEST_MAX_CONCURRENCY", "2"))
+SUGGEST_MAX_QUEUE = int(os.environ.get("SUGGEST_MAX_QUEUE", "8"))
+# Seconds clients are told to wait in the Retry-After header of a 503.
+WORKER_RETRY_AFTER_SECONDS = int(os.environ.get("WORKER_RETRY_AFTER_SECONDS", "1"))
+
+# --- SESSIONS ---
+# Total memory budget for uploaded DataFrames (deep memory usage). Least recently
+# used sessions are evicted past this limit. 0 disables the limit.
+SESSION_MAX_BYTES = int(os.environ.get("SESSION_MAX_BYTES", str(1024 * 1024 * 1024)))
+# Sessions idle for longer than this are dropped. 0 keeps them until evicted.
+SESSION_TTL_SECONDS = float(os.environ.get("SESSION_TTL_SECONDS", "3600"))
+# Optional cap on the number of live sessions. 0 disables the cap.
+SESSION_MAX_COUNT = int(os.environ.get("SESSION_MAX_COUNT", "0"))
+# "arrow": sessions are columnar Arrow IPC files under SESSION_DIR, memory-mapped and
+#          loaded column by column on demand; shared by all workers (uvicorn --workers N,
+#          or several pods on a shared volume) and kept across restarts. Needs pyarrow.
+# "memory": DataFrames live in this worker process.
+# "auto" (default): "arrow" when pyarrow is installed, otherwise "memory".
+SESSION_BACKEND = os.environ.get("SESSION_BACKEND", "auto")
+SESSION_DIR = os.environ.get("SESSION_DIR", os.path.join(tempfile.gettempdir(), "chartly-sessions"))
+# Byte budget for decoded columns each worker keeps in memory with the arrow backend.
+SESSION_COLUMN_CACHE_BYTES = int(os.environ.get("SESSION_COLUMN_CACHE_BYTES", str(512 * 1024 * 1024)))
+# Byte budget for the sorted indexes each worker builds on filtered datetime/categorical
+# columns (16 bytes per row and column, least recently used dropped first). 0 disables indexes.
+SESSION_INDEX_MAX_BYTES = int(os.environ.get("SESSION_INDEX_MAX_BYTES", str(256 * 1024 * 1024)))
+
+# --- CSV INGESTION ---
+# Uploads larger than this many bytes / rows are rejected with 413. 0 disables a limit.
+UPLOAD_MAX_BYTES = int(os.environ.get("UPLOAD_MAX_BYTES", str(2 * 1024 * 1024 * 1024)))
+UPLOAD_MAX_ROWS = int(os.environ.get("UPLOAD_MAX_ROWS", "0"))
+# Bytes kept in memory before the upload spool rolls over to a temp file on disk.
+UPLOAD_SPOOL_MEMORY_BYTES = int(os.environ.get("UPLOAD_SPOOL_MEMORY_BYTES", str(8 * 1024 * 1024)))
+# Rows per parsed chunk for the pandas "c" engine.
+CSV_CHUNK_ROWS = int(os.environ.get("CSV_CHUNK_ROWS", "250000"))
+# "c" (chunked pandas parser) or "pyarrow" (multithreaded; falls back to "c" if not installed).
+CSV_ENGINE = os.environ.get("CSV_ENGINE", "c")
+# Uploads whose bytes (and parse settings) match a live session share its stored frame
+# instead of being parsed and stored again.
+UPLOAD_DEDUP = os.environ.get("UPLOAD_DEDUP", "true").lower() in ("1", "true", "yes")
+
+# --- DTYPE COMPACTION ---
+# Downcast numerics, parse date-like text and categorize low-cardinality text on upload.
+SESSION_COMPACT = os.environ.get("SESSION_COMPACT", "true").lower() in ("1", "true", "yes")
+# Text columns with at most this ratio of unique values to rows become `category`.
+CATEGORY_MAX_RATIO = float(os.environ.get("CATEGORY_MAX_RATIO", "0.5"))
+
+# --- GEMINI ---
+GEMINI_MODEL_NAME = os.environ.get("GEMINI_MODEL_NAME", "models/gemini-2.0-flash")
+# Maximum number of Gemini vision calls in flight per worker process.
+GEMINI_MAX_CONCURRENCY = int(os.environ.get("GEMINI_MAX_CONCURRENCY", "4"))
+# Per-request timeout for a Gemini call, including time spent waiting for a slot. 0 disables.
+GEMINI_TIMEOUT_SECONDS = float(os.environ.get("GEMINI_TIMEOUT_SECONDS", "30"))
+
+# --- IMAGE ANALYSIS CACHE ---
+# In-memory LRU entries for chart-image analysis results.
+ANALYSIS_CACHE_MAX_ENTRIES = int(os.environ.get("ANALYSIS_CACHE_MAX_ENTRIES", "256"))
+# Optional SQLite file for a persistent cache tier (empty disables it).
+ANALYSIS_CACHE_DB = os.environ.get("ANALYSIS_CACHE_DB", "")
+# Cached results older than this are ignored. 0 keeps them forever.
+ANALYSIS_CACHE_TTL_SECONDS = float(os.environ.get("ANALYSIS_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+
+# --- IMAGE PREPROCESSING ---
+# Longest edge (px) of images sent to Gemini Vision. 0 keeps the original size.
+IMAGE_MAX_EDGE = int(os.environ.get("IMAGE_MAX_EDGE", "1536"))
+# Re-encoding format ("JPEG" or "WEBP") and quality.
+IMAGE_FORMAT = os.environ.get("IMAGE_FORMAT", "JPEG")
+IMAGE_QUALITY = int(os.environ.get("IMAGE_QUALITY", "85"))
+# Images with more pixels than this are rejected before decoding.
+IMAGE_MAX_PIXELS = int(os.environ.get("IMAGE_MAX_PIXELS", "50000000"))
@@ -0,0 +1,113 @@
+from typing import Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+# Server-side point reduction for large line/area/scatter charts.
+# Both strategies return *row positions* into the input frame so the caller
+# can slice the original DataFrame and keep column dtypes intact.
+
+
+def axis_values(series: pd.Series, positional_fallback: bool = True) -> np.ndarray:
+    """Maps a column onto a float64 axis usable by the downsampling math."""
+    if pd.api.types.is_bool_dtype(series):
+        return series.to_numpy(dtype=np.float64)
+    if pd.api.types.is_numeric_dtype(series):
+        return series.to_numpy(dtype=np.float64, na_value=np.nan)
+    if pd.api.types.is_datetime64_any_dtype(series):
+        values = series.to_numpy(dtype="datetime64[ns]").astype(np.int64).astype(np.float64)
+        # NaT comes out as int64-min; keep it missing so the row is left out like a NaN.
+        values[series.isna().to_numpy()] = np.nan
+        return values
+    if positional_fallback:
+        return np.arange(len(series), dtype=np.float64)
+    codes, _ = pd.factorize(series)
+    return codes.astype(np.float64)
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    """Largest-Triangle-Three-Buckets: keeps the visually dominant points of a series."""
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    bucket_size = (n - 2) / (threshold - 2)
+    indices = np.empty(threshold, dtype=np.int64)
+    indices[0] = 0
+    indices[-1] = n - 1
+
+    a = 0
+    for i in range(threshold - 2):
+        start = int(i * bucket_size) + 1
+        end = int((i + 1) * bucket_size) + 1
+        next_end = min(int((i + 2) * bucket_size) + 1, n)
+
+        avg_x = x[end:next_end].mean()
+        avg_y = y[end:next_end].mean()
+
+        bucket_x = x[start:end]
+        bucket_y = y[start:end]
+        area = np.abs((x[a] - avg_x) * (bucket_y - y[a]) - (x[a] - bucket_x) * (avg_y - y[a]))
+
+        a = start + int(np.argmax(area))
+        indices[i + 1] = a
+
+    return indices
+
+
+def minmax_indices(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    """Equal-width x buckets, keeping the min-y and max-y row of each bucket."""
+    n = len(x)
+    if threshold >= n or threshold < 2:
+        return np.arange(n)
+
+    n_buckets = max(threshold // 2, 1)
+    lo, hi = x.min(), x.max()
+    if hi == lo:
+        bins = np.zeros(n, dtype=np.int64)
+    else:
+        bins = ((x - lo) / (hi - lo) * n_buckets).astype(np.int64)
+        np.minimum(bins, n_buckets - 1, out=bins)
+
+    # Sort by bucket then y: each bucket's first/last entry is its min/max.
+    order = np.lexsort((y, bins))
+    sorted_bins = bins[order]
+    first = np.flatnonzero(np.r_[True, sorted_bins[1:] != sorted_bins[:-1]])
+    last = np.r_[first[1:] - 1, n - 1]
+
+    return np.unique(np.concatenate([order[first], order[last]]))
+
+
+def downsample_frame(df: pd.DataFrame, x: str, y: str, max_points: int, method: str, group: Optional[str] = None) -> Tuple[pd.DataFrame, bool]:
+    """Returns (`df` reduced to at most `max_points` rows using `method` ("lttb" or "minmax"), whether it decimated).
+
+    With `group`, each group's trace is reduced separately and the budget is split between them;
+    with more groups than the budget has room for (3 points each), the rows are reduced as one series.
+    Rows with a missing coordinate are always dropped, which on its own does not count as decimation.
+    """
+    if max_points <= 0 or len(df) <= max_points:
+        return df, False
+
+    if group is not None:
+        parts = [part for _, part in df.groupby(group, sort=False, observed=True, dropna=False)]
+        budget = max_points // max(len(parts), 1)
+        if budget >= 3:
+            reduced = [downsample_frame(part, x, y, budget, method) for part in parts]
+            frame = pd.concat([part for part, _ in reduced]).sort_index(kind="stable")
+            return frame, any(decimated for _, decimated in reduced)
+
+    x_vals = axis_values(df[x], positional_fallback=(method == "lttb"))
+    y_vals = axis_values(df[y], positional_fallback=False)
+
+    # Rows with a missing coordinate are never drawn; keep them out of the buckets.
+    valid = ~(np.isnan(x_vals) | np.isnan(y_vals))
+    positions = np.flatnonzero(valid)
+    if len(positions) <= max_points:
+        return df.iloc[positions], False
+
+    if method == "lttb":
+        picked = lttb_indices(x_vals[positions], y_vals[positions], max_points)
+    else:
+        picked = minmax_indices(x_vals[positions], y_vals[positions], max_points)
+
+    return df.iloc[positions[picked]], True
@@ -0,0 +1,85 @@
+import asyncio
+import logging
+import threading
+from functools import lru_cache
+from typing import TYPE_CHECKING, Any, List, Optional
+
+from fastapi import Request
+
+from config import GEMINI_API_KEY, GEMINI_API_KEY_MASKED, GEMINI_MODEL_NAME, GEMINI_MAX_CONCURRENCY, GEMINI_TIMEOUT_SECONDS
+from logging_setup import LOGGER_NAME
+from startup import lazy_import
+
+if TYPE_CHECKING:
+    import google.generativeai as genai
+
+# Shared Gemini access for request handlers.
+# The SDK is imported and configured on first use (the import alone takes
+# about a second), the model object is built once per process, calls go
+# through the SDK's async API so they never block the event loop, and a
+# semaphore bounds how many vision calls are in flight at the same time.
+
+DISCONNECT_POLL_SECONDS = 0.5
+
+_semaphore: Optional[asyncio.Semaphore] = None
+_configure_lock = threading.Lock()
+_configured = False
+
+logger = logging.getLogger(LOGGER_NAME)
+
+
+class ClientDisconnectedError(Exception):
+    """Raised when the HTTP client goes away while a Gemini call is pending."""
+
+
+def get_genai() -> "genai":
+    """The Gemini SDK module, configured with GEMINI_API_KEY on first use."""
+    global _configured
+    sdk = lazy_import("google.generativeai")
+    if not _configured:
+        with _configure_lock:
+            if not _configured:
+                sdk.configure(api_key=GEMINI_API_KEY)
+                _configured = True
+                logger.info("Gemini client configured", extra={"api_key": GEMINI_API_KEY_MASKED})
+    return sdk
+
+
+@lru_cache(maxsize=None)
+def get_gemini_model(model_name: str = GEMINI_MODEL_NAME) -> "genai.GenerativeModel":
+    return get_genai().GenerativeModel(model_name)
+
+
+def _get_semaphore() -> asyncio.Semaphore:
+    global _semaphore
+    if _semaphore is None:
+        _semaphore = asyncio.Semaphore(GEMINI_MAX_CONCURRENCY)
+    return _semaphore
+
+
+async def _generate_bounded(contents: List[Any], safety_settings: Any) -> Any:
+    async with _get_semaphore():
+        return await get_gemini_model().generate_content_async(contents, safety_settings=safety_settings)
+
+
+async def generate_content(contents: List[Any], safety_settings: Any = None, timeout: Optional[float] = None) -> Any:
+    """Runs one Gemini call with the concurrency limit; raises asyncio.TimeoutError after `timeout`."""
+    if timeout is None:
+        timeout = GEMINI_TIMEOUT_SECONDS
+    return await asyncio.wait_for(_generate_bounded(contents, safety_settings), timeout=timeout or None)
+
+
+async def cancel_on_disconnect(request: Request, coro: Any) -> Any:
+    """Awaits `coro`, cancelling it if the client disconnects in the meantime."""
+    task = asyncio.ensure_future(coro)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=DISCONNECT_POLL_SECONDS)
+            if done:
+                return task.result()
+            if await request.is_disconnected():
+                task.cancel()
+                raise ClientDisconnectedError()
+    except asyncio.CancelledError:
+        task.cancel()
+        raise
@@ -0,0 +1,93 @@
+import io
+import warnings
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any, Dict, Tuple
+
+from startup import lazy_import
+
+if TYPE_CHECKING:
+    from PIL import Image
+
+# Image preprocessing before Gemini Vision.
+# Chart classification does not need full-resolution photos, so uploads are
+# bounded on their longest edge, flattened to RGB, stripped of metadata and
+# re-encoded compactly. Dimensions are checked from the header before any
+# pixel data is decoded, which rejects decompression bombs cheaply. Pillow is
+# imported on the first image.
+
+
+class ImageTooLargeError(Exception):
+    """Raised when an image's pixel count exceeds the configured limit."""
+
+
+@dataclass
+class PreparedImage:
+    data: bytes
+    mime_type: str
+    original_bytes: int
+    original_size: Tuple[int, int]
+    sent_size: Tuple[int, int]
+
+    def as_part(self) -> Dict[str, Any]:
+        """Inline blob accepted by the Gemini SDK as a content part."""
+        return {"mime_type": self.mime_type, "data": self.data}
+
+
+def _pil() -> Any:
+    return lazy_import("PIL.Image")
+
+
+def _open_checked(content: bytes, max_pixels: int) -> "Image.Image":
+    pil = _pil()
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter("error", pil.DecompressionBombWarning)
+            image = pil.open(io.BytesIO(content))
+    except (pil.DecompressionBombError, pil.DecompressionBombWarning) as e:
+        raise ImageTooLargeError(str(e))
+
+    width, height = image.size
+    if max_pixels and width * height > max_pixels:
+        raise ImageTooLargeError(f"Image has {width * height} pixels, limit is {max_pixels}.")
+    return image
+
+
+def _to_rgb(image: "Image.Image") -> "Image.Image":
+    if image.mode == "RGB":
+        return image
+    if image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info):
+        # Transparent chart backgrounds would turn black; flatten onto white.
+        rgba = image.convert("RGBA")
+        background = _pil().new("RGB", rgba.size, (255, 255, 255))
+        background.paste(rgba, mask=rgba.getchannel("A"))
+        return background
+    return image.convert("RGB")
+
+
+def prepare_image(content: bytes, max_edge: int, quality: int, fmt: str, max_pixels: int) -> PreparedImage:
+    """Bounds, flattens and re-encodes an uploaded image for the vision model."""
+    image = _open_checked(content, max_pixels)
+    original_size = image.size
+
+    if max_edge:
+        # JPEG can decode straight at a reduced scale, skipping most of the work.
+        image.draft("RGB", (max_edge, max_edge))
+    image = _to_rgb(image)
+    if max_edge:
+        image.thumbnail((max_edge, max_edge), _pil().Resampling.LANCZOS)
+
+    fmt = fmt.upper()
+    out = io.BytesIO()
+    if fmt == "WEBP":
+        image.save(out, format="WEBP", quality=quality, method=4)
+    else:
+        fmt = "JPEG"
+        image.save(out, format="JPEG", quality=quality, optimize=True)
+
+    return PreparedImage(
+        data=out.getvalue(),
+        mime_type=f"image/{fmt.lower()}",
+        original_bytes=len(content),
+        original_size=original_size,
+        sent_size=image.size,
+    )
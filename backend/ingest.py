@@ -0,0 +1,191 @@
+import hashlib
+import logging
+import tempfile
+from dataclasses import dataclass
+from typing import Any, BinaryIO, Iterator, List, Optional
+
+import pandas as pd
+from fastapi import UploadFile
+
+from logging_setup import LOGGER_NAME
+
+# Streaming CSV ingestion.
+# The upload is never materialized as a single bytes object: it is kept in a
+# spooled temp file that rolls over to disk, then parsed chunk by chunk with
+# row/byte limits. Each chunk infers its own column types, so columns whose
+# chunks disagree (numbers early in the file, text later) are read as text
+# throughout before the chunks are concatenated.
+
+logger = logging.getLogger(LOGGER_NAME)
+
+COPY_BUFFER_BYTES = 1024 * 1024
+PREVIEW_ROWS = 20
+
+
+class UploadTooLargeError(Exception):
+    """Raised when an upload exceeds the configured byte or row limits."""
+
+
+@dataclass
+class ParsedCsv:
+    df: pd.DataFrame
+    preview: pd.DataFrame
+    size_bytes: int
+
+
+async def spool_upload(file: UploadFile, max_bytes: int, spool_memory_bytes: int) -> BinaryIO:
+    """Returns a seekable file holding the upload, enforcing `max_bytes`."""
+    # Multipart parsing already spools the body to a temp file; reuse it as-is.
+    if file.file.seekable():
+        file.file.seek(0)
+        if max_bytes and spooled_size(file.file) > max_bytes:
+            raise UploadTooLargeError(f"Upload exceeds the {max_bytes} byte limit.")
+        return file.file
+
+    spool = tempfile.SpooledTemporaryFile(max_size=spool_memory_bytes)
+    total = 0
+    while True:
+        chunk = await file.read(COPY_BUFFER_BYTES)
+        if not chunk:
+            break
+        total += len(chunk)
+        if max_bytes and total > max_bytes:
+            spool.close()
+            raise UploadTooLargeError(f"Upload exceeds the {max_bytes} byte limit.")
+        spool.write(chunk)
+    spool.seek(0)
+    return spool
+
+
+def spooled_size(stream: BinaryIO) -> int:
+    position = stream.tell()
+    stream.seek(0, 2)
+    size = stream.tell()
+    stream.seek(position)
+    return size
+
+
+def content_key(stream: BinaryIO, *settings: Any) -> str:
+    """SHA-256 over the upload's bytes and the parse `settings` that shape the stored frame."""
+    digest = hashlib.sha256(repr(settings).encode("utf-8"))
+    position = stream.tell()
+    stream.seek(0)
+    while True:
+        chunk = stream.read(COPY_BUFFER_BYTES)
+        if not chunk:
+            break
+        digest.update(chunk)
+    stream.seek(position)
+    return digest.hexdigest()
+
+
+def pyarrow_available() -> bool:
+    try:
+        import pyarrow.csv  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def _pandas_chunks(stream: BinaryIO, chunk_rows: int) -> Iterator[pd.DataFrame]:
+    with pd.read_csv(stream, chunksize=chunk_rows) as reader:
+        for chunk in reader:
+            yield chunk
+
+
+def _pyarrow_chunks(stream: BinaryIO) -> Iterator[pd.DataFrame]:
+    # Type inference must see the whole file to stay consistent across blocks,
+    # so the multithreaded reader parses everything and converts in one go.
+    from pyarrow import csv as pa_csv
+
+    table = pa_csv.read_csv(stream)
+    yield table.to_pandas(split_blocks=True, self_destruct=True)
+
+
+# infer_dtype results of object columns, by the broad kind they are treated as
+_OBJECT_KINDS = {
+    "boolean": "bool",
+    "integer": "number",
+    "floating": "number",
+    "mixed-integer-float": "number",
+    "decimal": "number",
+    "string": "text",
+    "datetime64": "datetime",
+    "datetime": "datetime",
+}
+
+
+def _column_kind(series: pd.Series) -> Optional[str]:
+    """Broad type of one chunk of a column ("number", "bool", "datetime", "text" or "mixed"); None if all missing."""
+    if not series.notna().any():
+        return None
+    if pd.api.types.is_bool_dtype(series):
+        return "bool"
+    if pd.api.types.is_numeric_dtype(series):
+        return "number"
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return "datetime"
+    if series.dtype == object:
+        return _OBJECT_KINDS.get(pd.api.types.infer_dtype(series, skipna=True), "mixed")
+    return "text"
+
+
+def _as_text(series: pd.Series) -> pd.Series:
+    return series.astype(str).where(series.notna())
+
+
+def reconcile_chunk_dtypes(parts: List[pd.DataFrame]) -> List[pd.DataFrame]:
+    """Reads every column whose chunks were inferred as different kinds (or mixed values) as text in all chunks."""
+    mixed = []
+    for col in parts[0].columns:
+        kinds = {kind for kind in (_column_kind(part[col]) for part in parts) if kind is not None}
+        if len(kinds) > 1 or "mixed" in kinds:
+            mixed.append(col)
+    if not mixed:
+        return parts
+    logger.warning("csv: columns with mixed value types read as text: %s", ", ".join(map(str, mixed)))
+    reconciled = []
+    for part in parts:
+        part = part.copy(deep=False)
+        for col in mixed:
+            part[col] = _as_text(part[col])
+        reconciled.append(part)
+    return reconciled
+
+
+def parse_csv_stream(stream: BinaryIO, engine: str, chunk_rows: int, max_rows: int, keep_empty_columns: bool = False) -> ParsedCsv:
+    """Parses a CSV file object chunk by chunk into a single cleaned DataFrame.
+
+    Columns without any value are dropped unless `keep_empty_columns` (rows appended to a
+    session must keep every column of the header; a header-only file then gives no rows).
+    """
+    size_bytes = spooled_size(stream)
+
+    if engine == "pyarrow" and pyarrow_available():
+        chunks = _pyarrow_chunks(stream)
+    else:
+        chunks = _pandas_chunks(stream, chunk_rows)
+
+    parts = []
+    rows = 0
+    for chunk in chunks:
+        chunk = chunk.dropna(how='all')
+        rows += len(chunk)
+        if max_rows and rows > max_rows:
+            raise UploadTooLargeError(f"Upload exceeds the {max_rows} row limit.")
+        parts.append(chunk)
+
+    if not parts:
+        raise ValueError("CSV file contains no rows.")
+
+    parts = reconcile_chunk_dtypes(parts)
+    preview = next((part.head(PREVIEW_ROWS) for part in parts if len(part)), None)
+    df = pd.concat(parts, ignore_index=True) if len(parts) > 1 else parts[0].reset_index(drop=True)
+    del parts
+    if not keep_empty_columns:
+        df = df.dropna(axis=1, how='all')
+
+    if preview is None:
+        preview = df.head(0)
+    return ParsedCsv(df=df, preview=preview[df.columns], size_bytes=size_bytes)
+
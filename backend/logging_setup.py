@@ -0,0 +1,56 @@
+import json
+import logging
+import sys
+from typing import Any, Dict
+
+# Structured logging for the "chartly" logger hierarchy.
+# Log calls pass their fields via `extra={...}`; the "text" format appends
+# them as key=value pairs and the "json" format emits one object per line.
+# Per-request detail is logged at DEBUG, so LOG_LEVEL=INFO (the default)
+# keeps hot paths free of formatting work.
+
+LOGGER_NAME = "chartly"
+
+_RESERVED = set(logging.LogRecord("", 0, "", 0, "", (), None).__dict__) | {"message", "asctime"}
+
+
+def _fields(record: logging.LogRecord) -> Dict[str, Any]:
+    return {k: v for k, v in record.__dict__.items() if k not in _RESERVED}
+
+
+class TextFormatter(logging.Formatter):
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    def format(self, record: logging.LogRecord) -> str:
+        line = super().format(record)
+        fields = _fields(record)
+        if fields:
+            line += " " + " ".join(f"{k}={v}" for k, v in fields.items())
+        return line
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            "ts": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            **_fields(record),
+        }
+        if record.exc_info:
+            payload["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(payload, default=str)
+
+
+def configure_logging(level: str, fmt: str) -> logging.Logger:
+    """Sets up the "chartly" logger once per process and returns it."""
+    logger = logging.getLogger(LOGGER_NAME)
+    logger.setLevel(level.upper())
+    if not logger.handlers:
+        handler = logging.StreamHandler(sys.stderr)
+        handler.setFormatter(JsonFormatter() if fmt == "json" else TextFormatter())
+        logger.addHandler(handler)
+        logger.propagate = False
+    return logger
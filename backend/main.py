@@ -1,29 +1,72 @@
-import os
-import io
+import asyncio
 import uuid
 import json
-import pathlib
-from typing import List, Optional, Dict, Any
+import logging
+from contextlib import asynccontextmanager
+from typing import BinaryIO, List, Optional, Dict, Any, Tuple, Union
 
-from fastapi import FastAPI, UploadFile, File, HTTPException, Form
+# Imported first: starts the clock for the startup-time report
+from startup import STARTUP, prewarm_in_background
+
+from fastapi import FastAPI, UploadFile, File, HTTPException, Form, Query, Request, Response
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from starlette.background import BackgroundTask
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
+import numpy as np
 import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
-import google.generativeai as genai
-from PIL import Image
-
 # CENTRALIZED CONFIG IMPORT
-from config import GEMINI_API_KEY
-
-if GEMINI_API_KEY:
-    genai.configure(api_key=GEMINI_API_KEY)
-    print("--- DEBUG: Gemini Client Configured Globally ---")
-else:
-    print("--- DEBUG: Gemini Client NOT Configured (Missing Key) ---")
-
-app = FastAPI(title="Chartly Backend")
+from config import (
+    GEMINI_API_KEY, LOG_LEVEL, LOG_FORMAT, METRICS_ENABLED, SERVER_TIMING,
+    SESSION_MAX_BYTES, SESSION_TTL_SECONDS, SESSION_MAX_COUNT,
+    SESSION_BACKEND, SESSION_DIR, SESSION_COLUMN_CACHE_BYTES, SESSION_INDEX_MAX_BYTES,
+    UPLOAD_MAX_BYTES, UPLOAD_MAX_ROWS, UPLOAD_SPOOL_MEMORY_BYTES, CSV_CHUNK_ROWS, CSV_ENGINE, UPLOAD_DEDUP,
+    SESSION_COMPACT, CATEGORY_MAX_RATIO, GEMINI_MODEL_NAME,
+    ANALYSIS_CACHE_MAX_ENTRIES, ANALYSIS_CACHE_DB, ANALYSIS_CACHE_TTL_SECONDS,
+    IMAGE_MAX_EDGE, IMAGE_FORMAT, IMAGE_QUALITY, IMAGE_MAX_PIXELS,
+    RENDER_COMPRESS_MIN_BYTES, RENDER_CACHE_MAX_BYTES, RENDER_BATCH_WORKERS, RENDER_BATCH_MAX_CHARTS,
+    UPLOAD_MAX_CONCURRENCY, UPLOAD_MAX_QUEUE, RENDER_MAX_CONCURRENCY, RENDER_MAX_QUEUE,
+    RENDER_BATCH_MAX_CONCURRENCY, RENDER_BATCH_MAX_QUEUE, ANALYZE_MAX_CONCURRENCY, ANALYZE_MAX_QUEUE,
+    SUGGEST_MAX_CONCURRENCY, SUGGEST_MAX_QUEUE, WORKER_POOL, PREWARM, SUGGEST_SAMPLE_ROWS, SUGGEST_TOP_K,
+)
+from ingest import spool_upload, spooled_size, content_key, parse_csv_stream, UploadTooLargeError, PREVIEW_ROWS
+from session_store import create_session_backend, SessionEntry, SessionTooLargeError, SessionChangedError, frame_nbytes
+from appending import SchemaMismatchError, conform_frame
+from compaction import compact_dataframe
+from profiling import ColumnProfile, extend_profile, profile_dataframe
+from analysis_cache import AnalysisCache, make_analysis_key
+from image_prep import prepare_image, ImageTooLargeError
+from gemini_client import get_gemini_model, generate_content, cancel_on_disconnect, ClientDisconnectedError
+from render_cache import RenderCache, CachedRender, make_render_key, etag_matches
+from payload import embed_json, choose_encoding, compress_body, encoding_headers, StreamEncoder
+from recommendations import rank_chart_pairs
+from query import QueryError, SessionIndexes, request_predicates, select_rows
+from rendering import RenderChartSpec, RenderRequest, RenderResponse, RenderFigureResponse, chart_columns, render_chart_body, prewarm as prewarm_plotly
+from workers import EndpointLimiter, OverloadedError, run_cpu, run_blocking, prewarm_cpu_pool, shutdown_pools
+from logging_setup import configure_logging
+from metrics import REGISTRY, MetricsMiddleware, PAYLOAD_BYTES, SESSION_BYTES, record_stage, span
+
+logger = configure_logging(LOG_LEVEL, LOG_FORMAT)
+
+STARTUP.mark("imports")
+
+# The Gemini SDK is imported and configured on the first analyze call (gemini_client.get_genai)
+if not GEMINI_API_KEY:
+    logger.warning("GEMINI_API_KEY not found; chart image analysis is disabled")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    STARTUP.mark("server_start")
+    logger.info("Startup complete", extra=STARTUP.report())
+    if PREWARM:
+        tasks = [("plotly", prewarm_plotly)]
+        if WORKER_POOL == "process":
+            tasks.append(("worker_pool", lambda: prewarm_cpu_pool(prewarm_plotly)))
+        prewarm_in_background(tasks)
+    yield
+    shutdown_pools()
+
+app = FastAPI(title="Chartly Backend", lifespan=lifespan)
 
 # CORS Setup
 origins = [
@@ -32,6 +75,9 @@ origins = [
     "*",
 ]
 
+# Request latency histogram (+ Server-Timing header when enabled)
+app.add_middleware(MetricsMiddleware, server_timing=SERVER_TIMING)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=origins,
@@ -40,8 +86,55 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# In-memory session store
-SESSIONS: Dict[str, pd.DataFrame] = {}
+# Session store (byte-bounded, LRU + idle TTL); in-process or shared between workers
+SESSIONS = create_session_backend(
+    SESSION_BACKEND,
+    max_bytes=SESSION_MAX_BYTES,
+    ttl_seconds=SESSION_TTL_SECONDS,
+    max_sessions=SESSION_MAX_COUNT,
+    directory=SESSION_DIR,
+    column_cache_bytes=SESSION_COLUMN_CACHE_BYTES,
+)
+
+# Rendered chart bodies, dropped together with their session
+RENDER_CACHE = RenderCache(max_bytes=RENDER_CACHE_MAX_BYTES)
+SESSIONS.add_removal_listener(RENDER_CACHE.invalidate_session)
+SESSIONS.add_append_listener(lambda session_id, entry, rows: RENDER_CACHE.invalidate_session(session_id))
+
+# Sorted indexes on filtered columns, dropped together with their session
+SESSION_INDEXES = SessionIndexes(max_bytes=SESSION_INDEX_MAX_BYTES)
+SESSIONS.add_removal_listener(SESSION_INDEXES.invalidate_session)
+SESSIONS.add_append_listener(SESSION_INDEXES.extend_session)
+
+# Chart-image analysis results, keyed by image + schema + model
+ANALYSIS_CACHE = AnalysisCache(
+    max_entries=ANALYSIS_CACHE_MAX_ENTRIES,
+    db_path=ANALYSIS_CACHE_DB or None,
+    ttl_seconds=ANALYSIS_CACHE_TTL_SECONDS,
+)
+
+# CPU work per endpoint is bounded; full limiters answer 503 + Retry-After
+UPLOAD_LIMITER = EndpointLimiter("upload-csv", UPLOAD_MAX_CONCURRENCY, UPLOAD_MAX_QUEUE)
+RENDER_LIMITER = EndpointLimiter("render-chart", RENDER_MAX_CONCURRENCY, RENDER_MAX_QUEUE)
+RENDER_BATCH_LIMITER = EndpointLimiter("render-charts", RENDER_BATCH_MAX_CONCURRENCY, RENDER_BATCH_MAX_QUEUE)
+ANALYZE_LIMITER = EndpointLimiter("analyze-chart-image", ANALYZE_MAX_CONCURRENCY, ANALYZE_MAX_QUEUE)
+SUGGEST_LIMITER = EndpointLimiter("suggest-charts", SUGGEST_MAX_CONCURRENCY, SUGGEST_MAX_QUEUE)
+
+@app.exception_handler(OverloadedError)
+async def overloaded_handler(request: Request, exc: OverloadedError):
+    return JSONResponse(
+        status_code=503,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+# Cache, session and limiter stats, read at scrape time
+REGISTRY.add_stats("chartly_session_store", SESSIONS.stats, counters=("hits", "misses", "evictions", "expirations", "shares"))
+REGISTRY.add_stats("chartly_render_cache", RENDER_CACHE.stats, counters=("hits", "misses", "evictions"))
+REGISTRY.add_stats("chartly_session_index", SESSION_INDEXES.stats, counters=("hits", "builds", "evictions"))
+REGISTRY.add_stats("chartly_analysis_cache", ANALYSIS_CACHE.stats, counters=("hits", "misses"))
+for limiter in (UPLOAD_LIMITER, RENDER_LIMITER, RENDER_BATCH_LIMITER, ANALYZE_LIMITER, SUGGEST_LIMITER):
+    REGISTRY.add_stats("chartly_limiter", limiter.stats, counters=("rejected",), endpoint=limiter.name)
 
 # --- PYDANTIC MODELS ---
 
@@ -54,25 +147,43 @@ class SessionResponse(BaseModel):
     session_id: str
     columns: List[ColumnInfo]
     preview: List[Dict[str, Any]]
+    memory_bytes_before: Optional[int] = None
+    memory_bytes_after: Optional[int] = None
+    # True when the upload matched a live session and shares its stored frame
+    deduplicated: bool = False
+
+class AppendResponse(BaseModel):
+    session_id: str
+    appended_rows: int
+    n_rows: int
+    columns: List[ColumnInfo]
 
 class Suggestion(BaseModel):
     chart_type: str
     reason: str
     recommended: bool
+    # Set by "mode": "rank", which picks the columns itself
+    x: Optional[str] = None
+    y: Optional[str] = None
+    score: Optional[float] = None
 
 class SuggestionsResponse(BaseModel):
     suggestions: List[Suggestion]
 
-class RenderRequest(BaseModel):
+class RenderBatchRequest(BaseModel):
     session_id: str
-    chart_type: str
-    x: Optional[str] = None
-    y: Optional[str] = None
-    options: Optional[Dict[str, Any]] = None
-
-class RenderResponse(BaseModel):
-    chart_type: str
-    plotly_json: str
+    charts: List[RenderChartSpec]
+
+class SessionStatsResponse(BaseModel):
+    sessions: int
+    bytes: int
+    max_bytes: int
+    hits: int
+    misses: int
+    evictions: int
+    expirations: int
+    frames: int
+    shares: int
 
 class DebugEnvResponse(BaseModel):
     has_key: bool
@@ -89,40 +200,79 @@ class ChartAnalysisResult(BaseModel):
     is_compatible: bool
     compatibility_reason_tr: str
     error_code: Optional[str] = None
+    cache_hit: bool = False
 
 # --- HELPER FUNCTIONS ---
 
-def get_dtype_str(series: pd.Series) -> str:
-    if pd.api.types.is_numeric_dtype(series):
-        return "numeric"
-    if pd.api.types.is_datetime64_any_dtype(series):
-        return "datetime"
-    if pd.api.types.is_bool_dtype(series):
-        return "boolean"
-    return "categorical"
-
-def get_session_df(session_id: str) -> pd.DataFrame:
-    if session_id not in SESSIONS:
+def get_session_df(session_id: str, columns: Optional[List[str]] = None) -> pd.DataFrame:
+    """Session frame; pass `columns` to load only those (columnar backends skip the rest)."""
+    df = SESSIONS.get(session_id, columns)
+    if df is None:
+        raise HTTPException(status_code=404, detail="Session not found")
+    return df
+
+def take_session_rows(session_id: str, columns: Optional[List[str]], positions) -> pd.DataFrame:
+    df = SESSIONS.take(session_id, columns, positions)
+    if df is None:
+        raise HTTPException(status_code=404, detail="Session not found")
+    return df
+
+def get_chart_df(session_id: str, spec: RenderChartSpec, columns: Optional[List[str]] = None) -> pd.DataFrame:
+    """Like get_session_df, restricted to the rows the chart's filters and time_range select."""
+    entry = get_session_entry(session_id)
+
+    def index_for(column: str):
+        return SESSION_INDEXES.get(session_id, column, entry, lambda: get_session_df(session_id, [column])[column])
+
+    try:
+        with span("filter"):
+            positions = select_rows(
+                entry,
+                request_predicates(spec.filters, spec.time_range, spec.x),
+                index_for if SESSION_INDEX_MAX_BYTES else None,
+                lambda cols, rows: take_session_rows(session_id, cols, rows),
+            )
+    except QueryError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if positions is None:
+        return get_session_df(session_id, columns)
+    return take_session_rows(session_id, columns, positions)
+
+def selection_key(spec: RenderChartSpec) -> str:
+    """Charts with equal keys select the same rows (time_range falls back to the x column)."""
+    time_column = spec.time_range and (spec.time_range.column or spec.x)
+    return json.dumps(
+        [spec.model_dump(include={"filters", "time_range"}), time_column],
+        sort_keys=True, default=str,
+    )
+
+def get_session_entry(session_id: str) -> SessionEntry:
+    entry = SESSIONS.get_entry(session_id)
+    if entry is None:
         raise HTTPException(status_code=404, detail="Session not found")
-    return SESSIONS[session_id]
+    return entry
+
+def session_version(entry: SessionEntry) -> Tuple[int, int]:
+    """Identifies the rows a session holds right now, also after appends made by other workers."""
+    return entry.n_rows, entry.version
 
-def describe_dataset_schema(df: pd.DataFrame) -> str:
+def get_session_profile(session_id: str) -> Dict[str, ColumnProfile]:
+    return get_session_entry(session_id).profile
+
+def describe_dataset_schema(n_rows: int, profile: Dict[str, ColumnProfile]) -> str:
     """Generates a natural language description of the dataset schema for the LLM."""
     description = []
-    description.append(f"The dataset contains {len(df)} rows and {len(df.columns)} columns.")
+    description.append(f"The dataset contains {n_rows} rows and {len(profile)} columns.")
     
-    for col in df.columns:
-        dtype = get_dtype_str(df[col])
-        unique_count = df[col].nunique()
-        example_values = df[col].dropna().head(3).tolist()
-        description.append(f"- Column '{col}': Type is {dtype}. It has {unique_count} unique values. Examples: {example_values}.")
+    for col, info in profile.items():
+        description.append(f"- Column '{col}': Type is {info.dtype}. It has {info.unique_count} unique values. Examples: {info.sample_values}.")
         
     return "\n".join(description)
 
-def detect_chart_type_with_gemini(image: Image.Image, dataset_context: str) -> ChartAnalysisResult:
+async def detect_chart_type_with_gemini(image: Dict[str, Any], dataset_context: str) -> ChartAnalysisResult:
     """
     Robust Chart Detection using Gemini (inspired by AI-Chart-Detective).
-    Uses the globally configured GEMINI_API_KEY.
+    Uses the globally configured GEMINI_API_KEY and the shared, non-blocking client.
     """
     if not GEMINI_API_KEY:
         return ChartAnalysisResult(
@@ -133,9 +283,6 @@ def detect_chart_type_with_gemini(image: Image.Image, dataset_context: str) -> C
             error_code="NO_API_KEY"
         )
 
-    # Using verified model
-    model = genai.GenerativeModel("models/gemini-2.0-flash")
-    
     # 1. ALLOWED TYPES (Normalized)
     ALLOWED_TYPES = [
         "bar", "line", "pie", "radar", "scatter", 
@@ -180,8 +327,10 @@ def detect_chart_type_with_gemini(image: Image.Image, dataset_context: str) -> C
     ]
     
     try:
-        response = model.generate_content([prompt, image], safety_settings=safety_settings)
-        print(f"--- GEMINI RAW: {response.text} ---")
+        with span("gemini"):
+            response = await generate_content([prompt, image], safety_settings=safety_settings)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Gemini raw response", extra={"text": response.text})
         
         # Clean JSON
         clean_text = response.text.replace("```json", "").replace("```", "").strip()
@@ -202,8 +351,17 @@ def detect_chart_type_with_gemini(image: Image.Image, dataset_context: str) -> C
             error_code=None
         )
         
+    except asyncio.TimeoutError:
+        logger.warning("Gemini call timed out")
+        return ChartAnalysisResult(
+            detected_chart_type=None,
+            explanation_tr="Gemini zamanında yanıt vermedi.",
+            is_compatible=False,
+            compatibility_reason_tr="İstek zaman aşımına uğradı.",
+            error_code="GEMINI_TIMEOUT"
+        )
     except Exception as e:
-        print(f"--- GEMINI EXCEPTION: {e} ---")
+        logger.warning("Gemini call failed", extra={"error": str(e)})
         err_str = str(e)
         code = "GEMINI_ERROR"
         msg = "Beklenmeyen hata."
@@ -240,19 +398,22 @@ def debug_gemini_env():
         demo_mode=not has_key
     )
 
+@app.get("/api/debug-startup")
+def debug_startup():
+    """Cold-start timings of this worker: startup phases, lazy imports and background prewarm."""
+    return STARTUP.report()
+
 @app.get("/api/test-gemini-simple")
 def debug_gemini_test_simple():
-    print("--- HIT: /api/test-gemini-simple ---")
     if not GEMINI_API_KEY:
         return {"ok": False, "error_code": "NO_API_KEY"}
     
     try:
-        # Config is already done globally, but safe to call again
-        model = genai.GenerativeModel("models/gemini-2.0-flash") 
-        response = model.generate_content("Return OK.")
+        # Reuses the process-wide model object
+        response = get_gemini_model().generate_content("Return OK.")
         return {"ok": True, "model_response": response.text.strip()}
     except Exception as e:
-        print(f"--- GEMINI ERROR: {e} ---")
+        logger.warning("Gemini test call failed", extra={"error": str(e)})
         return {"ok": False, "error_code": "EXCEPTION", "error_message": str(e)}
 
 # --- APPLICATION ENDPOINTS ---
@@ -261,50 +422,182 @@ def debug_gemini_test_simple():
 def read_root():
     return {"message": "Chartly Backend is running!"}
 
+def preview_records(preview: pd.DataFrame) -> List[Dict[str, Any]]:
+    return [{k: (None if pd.isna(v) else v) for k, v in row.items()} for row in preview.to_dict(orient='records')]
+
+def session_columns(profile: Dict[str, ColumnProfile]) -> List[ColumnInfo]:
+    return [ColumnInfo(name=col, dtype=info.dtype, unique_count=info.unique_count) for col, info in profile.items()]
+
+def ingest_csv(stream: BinaryIO, compact: bool) -> SessionResponse:
+    """Parses, compacts, profiles and stores an uploaded CSV (runs in a worker thread)."""
+    PAYLOAD_BYTES.observe(spooled_size(stream), kind="csv_upload")
+    session_id = str(uuid.uuid4())
+
+    key = None
+    if UPLOAD_DEDUP:
+        # A repeat upload becomes a new session on the stored frame: no parse, no copy.
+        with span("content_hash"):
+            key = content_key(stream, compact, CSV_ENGINE, CATEGORY_MAX_RATIO, UPLOAD_MAX_ROWS)
+        entry = SESSIONS.share(key, session_id)
+        if entry is not None:
+            preview = SESSIONS.take(session_id, None, np.arange(min(PREVIEW_ROWS, entry.n_rows)))
+            # Show dates as text, like the preview of a parsed upload
+            preview = preview.apply(lambda col: col.astype(str).where(col.notna()) if pd.api.types.is_datetime64_any_dtype(col) else col)
+            return SessionResponse(
+                session_id=session_id,
+                columns=session_columns(entry.profile),
+                preview=preview_records(preview),
+                memory_bytes_after=entry.nbytes,
+                deduplicated=True,
+            )
+
+    with span("csv_read"):
+        parsed = parse_csv_stream(stream, CSV_ENGINE, CSV_CHUNK_ROWS, UPLOAD_MAX_ROWS)
+    df = parsed.df
+
+    memory_before = frame_nbytes(df)
+    if compact:
+        with span("compact"):
+            df = compact_dataframe(df, CATEGORY_MAX_RATIO)
+        memory_after = frame_nbytes(df)
+    else:
+        memory_after = memory_before
+    SESSION_BYTES.observe(memory_after)
+    
+    with span("profile"):
+        profile = profile_dataframe(df)
+    with span("session_write"):
+        SESSIONS.put(session_id, df, profile, content_key=key)
+
+    return SessionResponse(
+        session_id=session_id,
+        columns=session_columns(profile),
+        preview=preview_records(parsed.preview),
+        memory_bytes_before=memory_before,
+        memory_bytes_after=memory_after
+    )
+
 @app.post("/api/upload-csv", response_model=SessionResponse)
-async def upload_csv(file: UploadFile = File(...)):
+async def upload_csv(
+    file: UploadFile = File(...),
+    compact: Optional[bool] = Query(None)
+):
     if not file.filename.endswith('.csv'):
         raise HTTPException(status_code=400, detail="Only CSV files are supported.")
     
-    try:
-        content = await file.read()
-        df = pd.read_csv(io.BytesIO(content))
-        df = df.dropna(how='all').dropna(axis=1, how='all')
-        
-        session_id = str(uuid.uuid4())
-        SESSIONS[session_id] = df
-        
-        columns_info = []
-        for col in df.columns:
-            columns_info.append(ColumnInfo(
-                name=col,
-                dtype=get_dtype_str(df[col]),
-                unique_count=int(df[col].nunique())
-            ))
-            
-        preview = df.head(20).to_dict(orient='records')
-        preview_clean = [{k: (None if pd.isna(v) else v) for k, v in row.items()} for row in preview]
+    async with UPLOAD_LIMITER.slot():
+        try:
+            stream = await spool_upload(file, UPLOAD_MAX_BYTES, UPLOAD_SPOOL_MEMORY_BYTES)
+            try:
+                return await run_blocking(ingest_csv, stream, SESSION_COMPACT if compact is None else compact)
+            finally:
+                stream.close()
+        except (SessionTooLargeError, UploadTooLargeError) as e:
+            raise HTTPException(status_code=413, detail=str(e))
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Error parsing CSV: {str(e)}")
+
+def append_csv(session_id: str, stream: BinaryIO) -> AppendResponse:
+    """Parses new rows, conforms them to the session's dtypes and appends them (runs in a worker thread)."""
+    entry = get_session_entry(session_id)
+    PAYLOAD_BYTES.observe(spooled_size(stream), kind="csv_append")
+    max_rows = UPLOAD_MAX_ROWS - entry.n_rows if UPLOAD_MAX_ROWS else 0
+    if UPLOAD_MAX_ROWS and max_rows <= 0:
+        raise UploadTooLargeError(f"Session already has the {UPLOAD_MAX_ROWS} row limit.")
+    with span("csv_read"):
+        rows = parse_csv_stream(stream, CSV_ENGINE, CSV_CHUNK_ROWS, max_rows, keep_empty_columns=True).df
+    dtypes = SESSIONS.dtypes(session_id)
+    if dtypes is None:
+        raise HTTPException(status_code=404, detail="Session not found")
+    with span("compact"):
+        rows = conform_frame(rows, dtypes)
+    if rows.empty:
+        return AppendResponse(session_id=session_id, appended_rows=0, n_rows=entry.n_rows, columns=session_columns(entry.profile))
+    with span("profile"):
+        profile = extend_profile(entry.profile, rows, dtypes, lambda col: get_session_df(session_id, [col])[col])
+    with span("session_write"):
+        grown = SESSIONS.append(session_id, rows, profile, entry.n_rows)
+    if grown is None:
+        raise HTTPException(status_code=404, detail="Session not found")
+    SESSION_BYTES.observe(grown.nbytes)
 
-        return SessionResponse(
-            session_id=session_id,
-            columns=columns_info,
-            preview=preview_clean
-        )
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error parsing CSV: {str(e)}")
+    return AppendResponse(
+        session_id=session_id,
+        appended_rows=len(rows),
+        n_rows=grown.n_rows,
+        columns=session_columns(profile),
+    )
+
+@app.post("/api/sessions/{session_id}/append-csv", response_model=AppendResponse)
+async def append_session_csv(session_id: str, file: UploadFile = File(...)):
+    """Adds the rows of a CSV with the session's columns to the session; its charts are re-rendered on next request."""
+    if not file.filename.endswith('.csv'):
+        raise HTTPException(status_code=400, detail="Only CSV files are supported.")
+    get_session_entry(session_id)
+
+    async with UPLOAD_LIMITER.slot():
+        try:
+            stream = await spool_upload(file, UPLOAD_MAX_BYTES, UPLOAD_SPOOL_MEMORY_BYTES)
+            try:
+                return await run_blocking(append_csv, session_id, stream)
+            finally:
+                stream.close()
+        except HTTPException:
+            raise
+        except SchemaMismatchError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        except SessionChangedError as e:
+            raise HTTPException(status_code=409, detail=str(e))
+        except (SessionTooLargeError, UploadTooLargeError) as e:
+            raise HTTPException(status_code=413, detail=str(e))
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Error parsing CSV: {str(e)}")
+
+@app.get("/api/sessions/stats", response_model=SessionStatsResponse)
+def session_stats():
+    return SessionStatsResponse(**SESSIONS.stats())
+
+@app.get("/api/metrics", response_class=PlainTextResponse)
+def metrics():
+    """Prometheus text exposition of this worker's metrics."""
+    if not METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="Metrics are disabled")
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+@app.delete("/api/sessions/{session_id}")
+def delete_session(session_id: str):
+    if not SESSIONS.delete(session_id):
+        raise HTTPException(status_code=404, detail="Session not found")
+    return {"deleted": True, "session_id": session_id}
 
 @app.post("/api/suggest-charts", response_model=SuggestionsResponse)
 async def suggest_charts(request: dict):
     # Expects {"session_id": "...", "x": "...", "y": "..."}
+    # or {"session_id": "...", "mode": "rank", "top_k": 10} to rank every column pair of the session
     session_id = request.get("session_id")
+    if request.get("mode") == "rank":
+        top_k = SUGGEST_TOP_K
+        if "top_k" in request:
+            try:
+                # str() first, so 2.5, true or null are rejected instead of truncated
+                top_k = int(str(request["top_k"]))
+            except ValueError:
+                top_k = 0
+        if top_k < 1:
+            raise HTTPException(status_code=400, detail="top_k must be a positive integer.")
+        return await rank_suggestions(session_id, top_k)
+
     x_col = request.get("x")
     y_col = request.get("y")
     
-    df = get_session_df(session_id)
+    profile = get_session_profile(session_id)
+    for col in (x_col, y_col):
+        if col and col not in profile:
+            raise HTTPException(status_code=400, detail=f"Column not found: {col}")
     
     # Auto-select columns
     if not x_col and not y_col:
-        dtypes = {c: get_dtype_str(df[c]) for c in df.columns}
+        dtypes = {c: info.dtype for c, info in profile.items()}
         nums = [c for c, t in dtypes.items() if t == "numeric"]
         cats = [c for c, t in dtypes.items() if t == "categorical"]
         dates = [c for c, t in dtypes.items() if t == "datetime"]
@@ -319,8 +612,8 @@ async def suggest_charts(request: dict):
          return SuggestionsResponse(suggestions=[])
     
     suggestions = []
-    x_type = get_dtype_str(df[x_col])
-    y_type = get_dtype_str(df[y_col]) if y_col else None
+    x_type = profile[x_col].dtype
+    y_type = profile[y_col].dtype if y_col else None
     
     if not y_col:
         if x_type == "numeric":
@@ -332,7 +625,7 @@ async def suggest_charts(request: dict):
     else:
         if x_type == "numeric" and y_type == "numeric":
             suggestions.append(Suggestion(chart_type="scatter", reason="Korelasyon analizi.", recommended=True))
-            is_sorted = df[x_col].is_monotonic_increasing
+            is_sorted = profile[x_col].is_monotonic_increasing
             suggestions.append(Suggestion(chart_type="line", reason="Trend takibi.", recommended=is_sorted))
             suggestions.append(Suggestion(chart_type="heatmap", reason="Yoğunluk.", recommended=False))
         elif (x_type == "categorical" and y_type == "numeric") or (x_type == "numeric" and y_type == "categorical"):
@@ -346,42 +639,208 @@ async def suggest_charts(request: dict):
             
     return SuggestionsResponse(suggestions=suggestions[:3])
 
-@app.post("/api/render-chart", response_model=RenderResponse)
-async def render_chart(req: RenderRequest):
-    df = get_session_df(req.session_id)
-    fig = None
+async def rank_suggestions(session_id: str, top_k: int) -> SuggestionsResponse:
+    entry = get_session_entry(session_id)
+    async with SUGGEST_LIMITER.slot():
+        with span("session_read"):
+            sample = await run_blocking(SESSIONS.sample, session_id, SUGGEST_SAMPLE_ROWS)
+        if sample is None:
+            raise HTTPException(status_code=404, detail="Session not found")
+        with span("suggest_rank"):
+            ranked = await run_cpu(rank_chart_pairs, sample, entry.profile, entry.n_rows, top_k)
+    return SuggestionsResponse(suggestions=[
+        Suggestion(chart_type=r.chart_type, reason=r.reason, recommended=i == 0, x=r.x, y=r.y, score=r.score)
+        for i, r in enumerate(ranked)
+    ])
+
+async def render_into_cache(df: pd.DataFrame, req: RenderRequest, cache_key: str) -> CachedRender:
     try:
-        t = req.chart_type
-        if t == "bar": fig = px.bar(df, x=req.x, y=req.y, title=f"{req.x} vs {req.y}")
-        elif t == "line": fig = px.line(df, x=req.x, y=req.y, title=f"{req.x} vs {req.y}")
-        elif t == "scatter": fig = px.scatter(df, x=req.x, y=req.y, title=f"{req.x} vs {req.y}")
-        elif t == "histogram":
-            target = req.x if req.x else req.y
-            fig = px.histogram(df, x=target, title=f"Dist of {target}")
-        elif t == "box": fig = px.box(df, x=req.x, y=req.y, title=f"Box: {req.x}")
-        elif t == "pie": fig = px.pie(df, names=req.x, values=req.y, title=f"Pie: {req.x}")
-        elif t == "heatmap": fig = px.density_heatmap(df, x=req.x, y=req.y, title=f"Heatmap")
-        else: fig = px.scatter(df, x=req.x, y=req.y, title="Chart")
-
-        fig.update_layout(template="plotly_dark")
-        return RenderResponse(chart_type=req.chart_type, plotly_json=fig.to_json())
+        body, timings = await run_cpu(render_chart_body, df, req)
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Chart Error: {str(e)}")
+    for stage, seconds in timings.items():
+        record_stage(stage, seconds)
+    PAYLOAD_BYTES.observe(len(body), kind="render")
+    return RENDER_CACHE.put(cache_key, req.session_id, body)
+
+def batch_line(index: int, cached: Optional[CachedRender] = None, error: Optional[HTTPException] = None) -> bytes:
+    """One NDJSON line of a render-charts response; the rendered body is embedded as-is."""
+    if error is not None:
+        line = json.dumps({"index": index, "status": error.status_code, "detail": error.detail})
+    else:
+        line = embed_json({"index": index, "status": 200, "etag": cached.etag}, "result", cached.body.decode("utf-8"))
+    return line.encode("utf-8") + b"\n"
+
+# The body is sent pre-serialized (cached, possibly compressed), so its two shapes are documented here.
+@app.post("/api/render-chart", responses={
+    200: {"model": Union[RenderResponse, RenderFigureResponse], "description": "RenderResponse, or RenderFigureResponse for response_format=\"figure\""},
+    304: {"description": "Unchanged since the ETag in If-None-Match"},
+})
+async def render_chart(req: RenderRequest, request: Request):
+    entry = get_session_entry(req.session_id)
+
+    # Identical requests on unchanged rows are served from the render cache; a matching ETag skips the body entirely.
+    cache_key = make_render_key(req.model_dump(), session_version(entry))
+    cached = RENDER_CACHE.get(cache_key)
+    if cached is None:
+        async with RENDER_LIMITER.slot():
+            # Only the charted columns of the selected rows are loaded from the session.
+            with span("session_read"):
+                df = await run_blocking(get_chart_df, req.session_id, req, chart_columns(req) or None)
+            cached = await render_into_cache(df, req, cache_key)
+
+    if etag_matches(request.headers.get("if-none-match"), cached.etag):
+        return Response(status_code=304, headers={"ETag": cached.etag})
+
+    encoding = choose_encoding(request.headers.get("accept-encoding", ""), len(cached.body), RENDER_COMPRESS_MIN_BYTES)
+    with span("compress"):
+        content = RENDER_CACHE.encoded_body(cached, encoding, compress_body)
+    PAYLOAD_BYTES.observe(len(content), kind="render_sent")
+    headers = encoding_headers(encoding)
+    headers["ETag"] = cached.etag
+    return Response(content=content, media_type="application/json", headers=headers)
+
+@app.post("/api/render-charts")
+async def render_charts(batch: RenderBatchRequest, request: Request):
+    """Renders a dashboard's charts in one request, streamed back as NDJSON in completion order.
+
+    Each line is `{"index", "status", "etag", "result"}` where `result` is the body
+    /api/render-chart would return for that chart, or `{"index", "status", "detail"}`
+    for a chart that failed.
+    """
+    entry = get_session_entry(batch.session_id)
+    if RENDER_BATCH_MAX_CHARTS and len(batch.charts) > RENDER_BATCH_MAX_CHARTS:
+        raise HTTPException(status_code=400, detail=f"At most {RENDER_BATCH_MAX_CHARTS} charts per batch.")
+
+    # Identical specs in a batch share one cache key and are rendered once.
+    indices_by_key: Dict[str, List[int]] = {}
+    requests_by_key: Dict[str, RenderRequest] = {}
+    for i, spec in enumerate(batch.charts):
+        req = RenderRequest(session_id=batch.session_id, **spec.model_dump())
+        key = make_render_key(req.model_dump(), session_version(entry))
+        indices_by_key.setdefault(key, []).append(i)
+        requests_by_key[key] = req
+
+    cached = {key: RENDER_CACHE.get(key) for key in indices_by_key}
+    pending = [key for key, hit in cached.items() if hit is None]
+
+    # The batch holds a limiter slot until its stream ends (or the client goes away).
+    await RENDER_BATCH_LIMITER.acquire()
+    slot_held = True
+
+    def release_slot():
+        nonlocal slot_held
+        if slot_held:
+            slot_held = False
+            RENDER_BATCH_LIMITER.release()
+
+    # One session read per row selection covers every chart that has to be rendered.
+    selection_of = {key: selection_key(requests_by_key[key]) for key in pending}
+    columns_by_selection: Dict[str, Optional[List[str]]] = {}
+    for key, selection in selection_of.items():
+        columns = chart_columns(requests_by_key[key])
+        current = columns_by_selection.setdefault(selection, [])
+        if current is None or not columns:
+            columns_by_selection[selection] = None
+        else:
+            current.extend(columns)
+
+    frames: Dict[str, Any] = {}
+    try:
+        with span("session_read"):
+            for selection, columns in columns_by_selection.items():
+                spec = next(requests_by_key[key] for key, sel in selection_of.items() if sel == selection)
+                try:
+                    frames[selection] = await run_blocking(get_chart_df, batch.session_id, spec, list(dict.fromkeys(columns)) if columns is not None else None)
+                except HTTPException as e:
+                    # A bad filter fails only the charts that use it.
+                    if e.status_code != 400:
+                        raise
+                    frames[selection] = e
+    except BaseException:
+        release_slot()
+        raise
+
+    encoding = choose_encoding(request.headers.get("accept-encoding", ""), streaming=True)
+    in_flight = asyncio.Semaphore(RENDER_BATCH_WORKERS)
+
+    async def render_one(key: str) -> Tuple[str, Optional[CachedRender], Optional[HTTPException]]:
+        async with in_flight:
+            df = frames[selection_of[key]]
+            if isinstance(df, HTTPException):
+                return key, None, df
+            try:
+                return key, await render_into_cache(df, requests_by_key[key], key), None
+            except HTTPException as e:
+                return key, None, e
+
+    async def lines():
+        try:
+            async for chunk in stream_lines():
+                yield chunk
+        finally:
+            release_slot()
+
+    async def stream_lines():
+        encoder = StreamEncoder(encoding)
+        for key, hit in cached.items():
+            if hit is not None:
+                for i in indices_by_key[key]:
+                    yield encoder.write(batch_line(i, hit))
+
+        tasks = [asyncio.ensure_future(render_one(key)) for key in pending]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                key, rendered, error = await next_done
+                for i in indices_by_key[key]:
+                    yield encoder.write(batch_line(i, rendered, error))
+        finally:
+            # Client went away: charts that have not started yet are dropped.
+            for task in tasks:
+                task.cancel()
+        yield encoder.finish()
+
+    return StreamingResponse(
+        lines(),
+        media_type="application/x-ndjson",
+        headers=encoding_headers(encoding),
+        background=BackgroundTask(release_slot),
+    )
 
 @app.post("/api/analyze-chart-image", response_model=ChartAnalysisResult)
 async def analyze_chart_image(
+    request: Request,
     session_id: str = Form(...),
     file: UploadFile = File(...)
 ):
     try:
         # 1. Get Session Data
-        df = get_session_df(session_id)
-        dataset_context = describe_dataset_schema(df)
+        entry = get_session_entry(session_id)
+        dataset_context = describe_dataset_schema(entry.n_rows, entry.profile)
         
-        # 2. Read Image
+        # 2. Serve identical image + dataset requests from the cache
         content = await file.read()
+        PAYLOAD_BYTES.observe(len(content), kind="image_upload")
+        cache_key = make_analysis_key(content, dataset_context, GEMINI_MODEL_NAME)
+        cached = ANALYSIS_CACHE.get(cache_key)
+        if cached is not None:
+            return ChartAnalysisResult(**cached, cache_hit=True)
+
+        # 3. Read Image (bounded, flattened and re-encoded for the vision model)
         try:
-            image = Image.open(io.BytesIO(content))
+            async with ANALYZE_LIMITER.slot():
+                with span("image_decode"):
+                    prepared = await run_blocking(prepare_image, content, IMAGE_MAX_EDGE, IMAGE_QUALITY, IMAGE_FORMAT, IMAGE_MAX_PIXELS)
+        except ImageTooLargeError:
+            return ChartAnalysisResult(
+                detected_chart_type=None,
+                explanation_tr="Resim çok büyük.",
+                is_compatible=False,
+                compatibility_reason_tr=f"En fazla {IMAGE_MAX_PIXELS} piksel destekleniyor.",
+                error_code="IMAGE_TOO_LARGE"
+            )
+        except OverloadedError:
+            raise
         except Exception:
              return ChartAnalysisResult(
                  detected_chart_type=None,
@@ -391,13 +850,31 @@ async def analyze_chart_image(
                  error_code="INVALID_IMAGE"
              )
 
-        # 3. Delegate to Helper Logic
-        return detect_chart_type_with_gemini(image, dataset_context)
+        PAYLOAD_BYTES.observe(len(prepared.data), kind="image_prepared")
+        logger.debug(
+            "Image prepared",
+            extra={
+                "original_size": prepared.original_size,
+                "original_bytes": prepared.original_bytes,
+                "sent_size": prepared.sent_size,
+                "sent_bytes": len(prepared.data),
+                "mime_type": prepared.mime_type,
+            },
+        )
 
-    except HTTPException as h:
-        raise h
+        # 4. Delegate to Helper Logic (cancelled if the client goes away)
+        result = await cancel_on_disconnect(request, detect_chart_type_with_gemini(prepared.as_part(), dataset_context))
+        if result.error_code is None:
+            ANALYSIS_CACHE.put(cache_key, result.model_dump(exclude={"cache_hit"}))
+        return result
+
+    except (HTTPException, OverloadedError):
+        raise
+    except ClientDisconnectedError:
+        logger.info("Client disconnected; Gemini call cancelled")
+        raise HTTPException(status_code=499, detail="Client disconnected")
     except Exception as e:
-        print(f"--- SERVER ERROR: {e} ---")
+        logger.exception("Chart image analysis failed")
         return ChartAnalysisResult(
             detected_chart_type=None,
             explanation_tr="Sunucu Hatası",
@@ -406,6 +883,8 @@ async def analyze_chart_image(
             error_code="SERVER_ERROR"
         )
             
+STARTUP.mark("app_setup")
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -0,0 +1,184 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+# In-process request instrumentation.
+# Handlers time their stages with `span()`; every span feeds a Prometheus
+# histogram and, for the request it runs in, the Server-Timing header. The
+# registry renders the Prometheus text format for /api/metrics, including
+# gauges/counters pulled from the caches' and session store's stats() at
+# scrape time. Metrics are per worker process.
+
+SECONDS_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+BYTES_BUCKETS = (1e3, 1e4, 1e5, 1e6, 1e7, 1e8, 1e9)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+_request_timings: ContextVar[Optional[List[Tuple[str, float]]]] = ContextVar("request_timings", default=None)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: Labels) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels) + "}"
+
+
+def _format_value(value: float) -> str:
+    value = float(value)
+    if value == float("inf"):
+        return "+Inf"
+    return str(int(value)) if value.is_integer() else repr(value)
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, buckets: Sequence[float] = SECONDS_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(buckets)
+        self._series: Dict[Labels, List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: Any) -> None:
+        key = tuple(sorted((k, str(v)) for k, v in labels.items()))
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            # Per-bucket counts (last slot is +Inf), then sum and count.
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0.0] * (len(self.buckets) + 3)
+            series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            snapshot = {key: list(series) for key, series in self._series.items()}
+        for key, series in sorted(snapshot.items()):
+            cumulative = 0.0
+            for bound, count in zip(self.buckets + (float("inf"),), series):
+                cumulative += count
+                le = key + (("le", _format_value(bound)),)
+                lines.append(f"{self.name}_bucket{_format_labels(le)} {_format_value(cumulative)}")
+            lines.append(f"{self.name}_sum{_format_labels(key)} {_format_value(series[-2])}")
+            lines.append(f"{self.name}_count{_format_labels(key)} {_format_value(series[-1])}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._histograms: List[Histogram] = []
+        self._collectors: List[Callable[[], List[Tuple[str, str, str]]]] = []
+
+    def histogram(self, name: str, help_text: str, buckets: Sequence[float] = SECONDS_BUCKETS) -> Histogram:
+        histogram = Histogram(name, help_text, buckets)
+        self._histograms.append(histogram)
+        return histogram
+
+    def add_stats(self, prefix: str, stats: Callable[[], Dict[str, int]], counters: Sequence[str] = (), **labels: Any) -> None:
+        """Exposes a stats() dict at scrape time: `counters` as `<prefix>_<key>_total`, the rest as gauges."""
+        label_str = _format_labels(tuple(sorted((k, str(v)) for k, v in labels.items())))
+
+        def collect() -> List[Tuple[str, str, str]]:
+            samples = []
+            for key, value in stats().items():
+                if key in counters:
+                    name, kind = f"{prefix}_{key}_total", "counter"
+                else:
+                    name, kind = f"{prefix}_{key}", "gauge"
+                samples.append((name, kind, f"{name}{label_str} {_format_value(value)}"))
+            return samples
+
+        self._collectors.append(collect)
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for histogram in self._histograms:
+            lines.extend(histogram.render())
+        # Samples of one family must be contiguous, even when several collectors report it.
+        families: Dict[str, Tuple[str, List[str]]] = {}
+        for collect in self._collectors:
+            for name, kind, sample in collect():
+                families.setdefault(name, (kind, []))[1].append(sample)
+        for name, (kind, samples) in families.items():
+            lines.append(f"# TYPE {name} {kind}")
+            lines.extend(samples)
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+REQUEST_SECONDS = REGISTRY.histogram("chartly_request_duration_seconds", "HTTP request latency by route.")
+STAGE_SECONDS = REGISTRY.histogram("chartly_stage_duration_seconds", "Time spent in one processing stage.")
+PAYLOAD_BYTES = REGISTRY.histogram("chartly_payload_bytes", "Size of uploads and response bodies by kind.", BYTES_BUCKETS)
+SESSION_BYTES = REGISTRY.histogram("chartly_session_bytes", "In-memory size of uploaded datasets.", BYTES_BUCKETS)
+
+
+def record_stage(stage: str, seconds: float) -> None:
+    STAGE_SECONDS.observe(seconds, stage=stage)
+    timings = _request_timings.get()
+    if timings is not None:
+        timings.append((stage, seconds))
+
+
+@contextmanager
+def span(stage: str) -> Iterator[None]:
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(stage, time.perf_counter() - start)
+
+
+def server_timing_header(timings: List[Tuple[str, float]]) -> str:
+    """`stage;dur=<ms>` entries, repeated stages (e.g. one per chart of a batch) summed."""
+    totals: Dict[str, float] = {}
+    for stage, seconds in timings:
+        totals[stage] = totals.get(stage, 0.0) + seconds
+    return ", ".join(f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in totals.items())
+
+
+class MetricsMiddleware:
+    """ASGI middleware: request latency histogram plus an optional Server-Timing header."""
+
+    def __init__(self, app: Any, server_timing: bool = False):
+        self.app = app
+        self.server_timing = server_timing
+
+    async def __call__(self, scope: Dict[str, Any], receive: Callable, send: Callable) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timings: List[Tuple[str, float]] = []
+        token = _request_timings.set(timings)
+        start = time.perf_counter()
+        status = 500
+
+        async def send_with_timing(message: Dict[str, Any]) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if self.server_timing:
+                    total = ("total", time.perf_counter() - start)
+                    header = server_timing_header(timings + [total]).encode("latin-1")
+                    message["headers"] = list(message.get("headers", [])) + [(b"server-timing", header)]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _request_timings.reset(token)
+            route = scope.get("route")
+            REQUEST_SECONDS.observe(
+                time.perf_counter() - start,
+                method=scope["method"],
+                route=getattr(route, "path", "unmatched"),
+                status=status,
+            )
@@ -0,0 +1,105 @@
+import gzip
+import json
+import zlib
+from typing import Any, Dict, Optional
+
+try:
+    import brotli
+except ImportError:  # optional: gzip is always available
+    brotli = None
+
+# Response body helpers for rendered charts.
+# The "figure" format embeds Plotly's JSON (numeric arrays already encoded as
+# base64 typed arrays, {"dtype": ..., "bdata": ...}) directly in the response
+# instead of as an escaped string, and bodies are compressed according to the
+# client's Accept-Encoding. Streamed bodies (NDJSON) are compressed line by
+# line with a flush after each, so every line reaches the client immediately.
+
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+
+def embed_json(meta: Dict[str, Any], key: str, raw_json: str) -> str:
+    """Builds `{**meta, key: <raw_json>}` without re-parsing the embedded JSON."""
+    head = json.dumps(meta)[:-1]
+    separator = ", " if meta else ""
+    return f'{head}{separator}{json.dumps(key)}: {raw_json}}}'
+
+
+def figure_payload(meta: Dict[str, Any], figure_json: str) -> bytes:
+    """Builds `{**meta, "figure": <figure>}` without re-parsing the figure JSON."""
+    return embed_json(meta, "figure", figure_json).encode("utf-8")
+
+
+def _accepted_encodings(accept_encoding: str) -> Dict[str, float]:
+    accepted = {}
+    for token in accept_encoding.split(","):
+        parts = [p.strip() for p in token.split(";")]
+        if not parts[0]:
+            continue
+        quality = 1.0
+        for param in parts[1:]:
+            if param.startswith("q="):
+                try:
+                    quality = float(param[2:])
+                except ValueError:
+                    quality = 0.0
+        accepted[parts[0].lower()] = quality
+    return accepted
+
+
+def choose_encoding(accept_encoding: str, body_bytes: int = 0, min_bytes: int = 0, streaming: bool = False) -> Optional[str]:
+    """Picks "br" or "gzip" for a body of `body_bytes`, or None to send it uncompressed.
+
+    A `streaming` body's size is not known up front, so it skips the `min_bytes` check.
+    """
+    if not streaming and body_bytes < min_bytes:
+        return None
+    accepted = _accepted_encodings(accept_encoding or "")
+    if brotli is not None and accepted.get("br", 0) > 0:
+        return "br"
+    if accepted.get("gzip", 0) > 0:
+        return "gzip"
+    return None
+
+
+def compress_body(body: bytes, encoding: Optional[str]) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    if encoding == "gzip":
+        return gzip.compress(body, compresslevel=GZIP_LEVEL)
+    return body
+
+
+def encoding_headers(encoding: Optional[str]) -> Dict[str, str]:
+    headers = {"Vary": "Accept-Encoding"}
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    return headers
+
+
+class StreamEncoder:
+    """Incremental compressor for streamed bodies; each write is flushed to a decodable boundary."""
+
+    def __init__(self, encoding: Optional[str]):
+        self.encoding = encoding
+        if encoding == "br":
+            self._compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+        elif encoding == "gzip":
+            self._compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        else:
+            self._compressor = None
+
+    def write(self, data: bytes) -> bytes:
+        if self.encoding == "br":
+            return self._compressor.process(data) + self._compressor.flush()
+        if self.encoding == "gzip":
+            return self._compressor.compress(data) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+        return data
+
+    def finish(self) -> bytes:
+        if self.encoding == "br":
+            return self._compressor.finish()
+        if self.encoding == "gzip":
+            return self._compressor.flush()
+        return b""
@@ -0,0 +1,140 @@
+import json
+from dataclasses import asdict, dataclass, field, replace
+from typing import Any, Callable, Dict, List
+
+import pandas as pd
+
+# Per-session column profile.
+# Computed once when a session is created and stored alongside the DataFrame,
+# so upload, suggest and image-analysis endpoints never rescan the full frame
+# for dtype classes, unique counts or example values.
+
+SAMPLE_VALUES = 3
+SAMPLE_SCAN_ROWS = 1000
+
+
+@dataclass
+class ColumnProfile:
+    name: str
+    dtype: str
+    unique_count: int
+    null_count: int
+    min: Any = None
+    max: Any = None
+    is_monotonic_increasing: bool = False
+    sample_values: List[Any] = field(default_factory=list)
+
+
+def get_dtype_str(series: pd.Series) -> str:
+    if pd.api.types.is_numeric_dtype(series):
+        return "numeric"
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return "datetime"
+    if pd.api.types.is_bool_dtype(series):
+        return "boolean"
+    return "categorical"
+
+
+def _scalar(value: Any) -> Any:
+    if pd.isna(value):
+        return None
+    return value.item() if hasattr(value, "item") else value
+
+
+def _sample_values(series: pd.Series) -> List[Any]:
+    head = series.head(SAMPLE_SCAN_ROWS).dropna()
+    if len(head) < SAMPLE_VALUES and len(series) > SAMPLE_SCAN_ROWS:
+        head = series.dropna()
+    return head.head(SAMPLE_VALUES).tolist()
+
+
+def profile_dataframe(df: pd.DataFrame) -> Dict[str, ColumnProfile]:
+    """Profiles every column with frame-wide reductions instead of per-endpoint rescans."""
+    dtypes = {col: get_dtype_str(df[col]) for col in df.columns}
+    unique_counts = df.nunique()
+    null_counts = df.isna().sum()
+
+    ordered = [c for c, t in dtypes.items() if t in ("numeric", "datetime") and not pd.api.types.is_bool_dtype(df[c])]
+    mins = df[ordered].min() if ordered else pd.Series(dtype=object)
+    maxs = df[ordered].max() if ordered else pd.Series(dtype=object)
+
+    profile = {}
+    for col in df.columns:
+        is_ordered = col in mins.index
+        profile[col] = ColumnProfile(
+            name=col,
+            dtype=dtypes[col],
+            unique_count=int(unique_counts[col]),
+            null_count=int(null_counts[col]),
+            min=_scalar(mins[col]) if is_ordered else None,
+            max=_scalar(maxs[col]) if is_ordered else None,
+            is_monotonic_increasing=bool(df[col].is_monotonic_increasing) if is_ordered else False,
+            sample_values=_sample_values(df[col]),
+        )
+    return profile
+
+
+def _unique_after_append(old: ColumnProfile, new: ColumnProfile, values: pd.Series, dtype: Any, existing_values: Callable[[], pd.Series]) -> int:
+    if not new.unique_count:
+        return old.unique_count
+    if not old.unique_count:
+        return new.unique_count
+    if isinstance(dtype, pd.CategoricalDtype):
+        # Stored categories are exactly the values seen so far.
+        return old.unique_count + int((~values.cat.categories.isin(dtype.categories)).sum())
+    if old.min is not None and new.min is not None and (new.min > old.max or new.max < old.min):
+        return old.unique_count + new.unique_count
+    # Overlapping ranges: look up only the new distinct values in the stored column.
+    distinct = values.dropna().unique()
+    stored = existing_values()
+    seen = stored[stored.isin(distinct)].nunique()
+    return old.unique_count + len(distinct) - int(seen)
+
+
+def extend_profile(
+    profile: Dict[str, ColumnProfile],
+    rows: pd.DataFrame,
+    dtypes: pd.Series,
+    existing_values: Callable[[str], pd.Series],
+) -> Dict[str, ColumnProfile]:
+    """Profile after `rows` are appended to a session, computed from the new rows.
+
+    `dtypes` are the stored column dtypes. `existing_values(col)` loads a stored column;
+    it is only needed for the unique count of a non-categorical column whose new values
+    overlap the stored range.
+    """
+    added = profile_dataframe(rows)
+    extended = {}
+    for col, old in profile.items():
+        new = added[col]
+        ordered = old.min is not None or new.min is not None
+        extended[col] = replace(
+            old,
+            unique_count=_unique_after_append(old, new, rows[col], dtypes[col], lambda: existing_values(col)),
+            null_count=old.null_count + new.null_count,
+            min=min(v for v in (old.min, new.min) if v is not None) if ordered else None,
+            max=max(v for v in (old.max, new.max) if v is not None) if ordered else None,
+            is_monotonic_increasing=bool(
+                old.is_monotonic_increasing and new.is_monotonic_increasing
+                and (old.max is None or new.min is None or new.min >= old.max)
+            ),
+            sample_values=(old.sample_values + new.sample_values)[:SAMPLE_VALUES],
+        )
+    return extended
+
+
+def profile_to_json(profile: Dict[str, ColumnProfile]) -> str:
+    return json.dumps([asdict(p) for p in profile.values()], default=str)
+
+
+def profile_from_json(text: str) -> Dict[str, ColumnProfile]:
+    """Inverse of profile_to_json; datetime bounds and samples come back as Timestamps."""
+    profile = {}
+    for item in json.loads(text):
+        info = ColumnProfile(**item)
+        if info.dtype == "datetime":
+            info.min = pd.Timestamp(info.min) if info.min is not None else None
+            info.max = pd.Timestamp(info.max) if info.max is not None else None
+            info.sample_values = [pd.Timestamp(v) for v in info.sample_values]
+        profile[info.name] = info
+    return profile
@@ -0,0 +1,342 @@
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from profiling import ColumnProfile
+from session_store import SessionEntry
+
+# Row selection for render requests ("filters" and "time_range").
+# Predicates are evaluated in this process before a chart is built, so only
+# the matching rows are loaded from the session and handed to the renderer.
+# Range predicates on datetime columns and equality predicates on categorical
+# columns go through per-session sorted indexes: a binary search returns the
+# matching row positions without scanning the column. Indexes are built on
+# first use and kept in an LRU byte budget, so the columns users actually
+# drill into stay indexed. Every other predicate is a vectorized mask over
+# the rows still selected.
+
+RANGE_OPS = {"gt", "gte", "lt", "lte", "between", "last"}
+EQUALITY_OPS = {"eq", "in"}
+
+_MISSING_TIME = np.iinfo(np.int64).min  # NaT as int64 nanoseconds; sorts first
+
+
+class QueryError(ValueError):
+    """Raised for predicates that do not fit the session's columns; reported as HTTP 400."""
+
+
+@dataclass
+class Predicate:
+    column: str
+    op: str
+    value: Any = None
+
+
+def _as_list(value: Any) -> List[Any]:
+    return list(value) if isinstance(value, (list, tuple)) else [value]
+
+
+def _bounds(p: Predicate) -> Tuple[Any, Any]:
+    if p.op == "between":
+        values = _as_list(p.value)
+        if len(values) != 2:
+            raise QueryError(f"'between' on {p.column} needs [start, end].")
+        return values[0], values[1]
+    if p.op in ("gt", "gte"):
+        return p.value, None
+    return None, p.value
+
+
+def _timestamp(value: Any, column: str) -> pd.Timestamp:
+    try:
+        ts = pd.Timestamp(value)
+    except (TypeError, ValueError):
+        raise QueryError(f"Invalid date for {column}: {value!r}")
+    if ts is pd.NaT:
+        raise QueryError(f"Invalid date for {column}: {value!r}")
+    return ts
+
+
+def _window(p: Predicate) -> pd.Timedelta:
+    try:
+        window = pd.Timedelta(p.value)
+    except (TypeError, ValueError):
+        raise QueryError(f"Invalid time window for {p.column}: {p.value!r}")
+    if window is pd.NaT:
+        raise QueryError(f"Invalid time window for {p.column}: {p.value!r}")
+    return window
+
+
+def _column_time(value: Any, column: str, tz: Any) -> pd.Timestamp:
+    """`value` as a timestamp comparable with a column in `tz`: naive values are read in the column's zone."""
+    ts = _timestamp(value, column)
+    if tz is not None and ts.tz is None:
+        return ts.tz_localize(tz)
+    if tz is None and ts.tz is not None:
+        return ts.tz_convert(None)
+    return ts
+
+
+def _time_key(value: Any, column: str, tz: Any) -> int:
+    ts = _column_time(value, column, tz)
+    if ts.tz is not None:
+        ts = ts.tz_convert(None)
+    return int(ts.as_unit("ns").value)
+
+
+def _time_keys(series: pd.Series) -> np.ndarray:
+    if series.dt.tz is not None:
+        series = series.dt.tz_convert(None)
+    return series.to_numpy(dtype="datetime64[ns]").view(np.int64)
+
+
+@dataclass
+class SortedIndex:
+    """Row positions of one column, sorted by value; missing values sort first."""
+    version: int
+    order: np.ndarray
+    keys: np.ndarray
+    categories: Optional[pd.Index] = None  # code -> value, for categorical indexes
+    tz: Any = None  # the datetime column's time zone; keys are UTC nanoseconds
+
+    @property
+    def nbytes(self) -> int:
+        return self.order.nbytes + self.keys.nbytes
+
+    @classmethod
+    def build(cls, series: pd.Series, version: int) -> "SortedIndex":
+        tz = None
+        if pd.api.types.is_datetime64_any_dtype(series):
+            values, categories, tz = _time_keys(series), None, series.dt.tz
+        else:
+            values, uniques = pd.factorize(series)
+            categories = pd.Index(list(uniques), dtype=object)
+        order = np.argsort(values, kind="stable")
+        return cls(version=version, order=order, keys=values[order], categories=categories, tz=tz)
+
+    def extended(self, series: pd.Series, first_row: int, version: int) -> "SortedIndex":
+        """This index plus `series` (rows from `first_row` on), merged in without re-sorting the old rows."""
+        categories = self.categories
+        if categories is None:
+            values = _time_keys(series)
+        else:
+            values = categories.get_indexer(series.astype(object))
+            unseen = (values < 0) & series.notna().to_numpy()
+            if unseen.any():
+                # New values get the next codes, so existing codes stay valid.
+                added = pd.Index(pd.unique(series[unseen].astype(object)), dtype=object)
+                values[unseen] = len(categories) + added.get_indexer(series[unseen].astype(object))
+                categories = categories.append(added)
+        order = np.argsort(values, kind="stable")
+        keys = values[order].astype(self.keys.dtype, copy=False)
+        at = np.searchsorted(self.keys, keys, "right")
+        return SortedIndex(
+            version=version,
+            order=np.insert(self.order, at, order + first_row),
+            keys=np.insert(self.keys, at, keys),
+            categories=categories,
+            tz=self.tz,
+        )
+
+    def positions(self, p: Predicate) -> np.ndarray:
+        """Matching row positions in row order."""
+        if self.categories is not None:
+            codes = np.unique(self._codes(_as_list(p.value)))
+            spans = [(np.searchsorted(self.keys, c, "left"), np.searchsorted(self.keys, c, "right")) for c in codes]
+        else:
+            spans = [self._range(p)]
+        picked = [self.order[lo:hi] for lo, hi in spans if hi > lo]
+        if not picked:
+            return np.empty(0, dtype=np.int64)
+        return np.sort(np.concatenate(picked))
+
+    def _codes(self, values: List[Any]) -> np.ndarray:
+        codes = self.categories.get_indexer(values)
+        missing = codes < 0
+        if missing.any():
+            # JSON only has strings, numbers and booleans; fall back to comparing text forms.
+            as_text = pd.Index(self.categories.astype(str))
+            codes[missing] = as_text.get_indexer([str(v) for v in np.asarray(values, dtype=object)[missing]])
+        return codes[codes >= 0]
+
+    def _range(self, p: Predicate) -> Tuple[int, int]:
+        first_valid = int(np.searchsorted(self.keys, _MISSING_TIME, "right"))
+        lo, hi = first_valid, len(self.keys)
+        if first_valid == hi:
+            return lo, hi
+        if p.op == "last":
+            return int(np.searchsorted(self.keys, int(self.keys[-1]) - _window(p).value, "left")), hi
+        start, end = _bounds(p)
+        if start is not None:
+            lo = max(lo, int(np.searchsorted(self.keys, _time_key(start, p.column, self.tz), "right" if p.op == "gt" else "left")))
+        if end is not None:
+            hi = int(np.searchsorted(self.keys, _time_key(end, p.column, self.tz), "left" if p.op == "lt" else "right"))
+        return lo, hi
+
+
+class SessionIndexes:
+    """Sorted indexes per (session, column), bounded by total bytes with LRU eviction."""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+
+        self._indexes: "OrderedDict[Tuple[str, str], SortedIndex]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self._hits = 0
+        self._builds = 0
+        self._evictions = 0
+
+    def get(self, session_id: str, column: str, entry: SessionEntry, load: Callable[[], pd.Series]) -> SortedIndex:
+        key = (session_id, column)
+        with self._lock:
+            index = self._indexes.get(key)
+            if index is not None and index.version == entry.version:
+                self._hits += 1
+                self._indexes.move_to_end(key)
+                return index
+
+        index = SortedIndex.build(load(), entry.version)
+        with self._lock:
+            self._builds += 1
+            self._remove(key)
+            if not self.max_bytes or index.nbytes <= self.max_bytes:
+                self._indexes[key] = index
+                self._bytes += index.nbytes
+                self._evict()
+        return index
+
+    def extend_session(self, session_id: str, entry: SessionEntry, rows: pd.DataFrame) -> None:
+        """Merges appended rows into the session's indexes (append listener); stale indexes are dropped."""
+        first_row = entry.n_rows - len(rows)
+        with self._lock:
+            current = [(key, index) for key, index in self._indexes.items() if key[0] == session_id]
+        for key, index in current:
+            grown = None
+            if len(index.keys) == first_row:
+                grown = index.extended(rows[key[1]], first_row, entry.version)
+            with self._lock:
+                if self._indexes.get(key) is not index:
+                    continue
+                self._remove(key)
+                if grown is not None and (not self.max_bytes or grown.nbytes <= self.max_bytes):
+                    self._indexes[key] = grown
+                    self._bytes += grown.nbytes
+                    self._evict()
+
+    def invalidate_session(self, session_id: str) -> None:
+        with self._lock:
+            for key in [k for k in self._indexes if k[0] == session_id]:
+                self._remove(key)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "indexes": len(self._indexes),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self._hits,
+                "builds": self._builds,
+                "evictions": self._evictions,
+            }
+
+    # --- internals (caller holds the lock) ---
+
+    def _evict(self) -> None:
+        while self.max_bytes and self._bytes > self.max_bytes and self._indexes:
+            self._remove(next(iter(self._indexes)))
+            self._evictions += 1
+
+    def _remove(self, key: Tuple[str, str]) -> None:
+        index = self._indexes.pop(key, None)
+        if index is not None:
+            self._bytes -= index.nbytes
+
+
+def _indexable(p: Predicate, info: ColumnProfile) -> bool:
+    if info.dtype == "datetime":
+        return p.op in RANGE_OPS
+    return info.dtype in ("categorical", "boolean") and p.op in EQUALITY_OPS
+
+
+def _mask(series: pd.Series, p: Predicate) -> np.ndarray:
+    """Boolean mask of the rows of `series` matching `p`; missing values never match."""
+    def coerce(value: Any) -> Any:
+        if value is None or not pd.api.types.is_datetime64_any_dtype(series):
+            return value
+        return _column_time(value, p.column, series.dt.tz)
+
+    try:
+        if p.op == "last":
+            if not pd.api.types.is_datetime64_any_dtype(series):
+                raise QueryError(f"'last' needs a datetime column: {p.column}")
+            matched = series >= series.max() - _window(p)
+        elif p.op in ("eq", "ne", "in", "not_in"):
+            matched = series.isin([coerce(v) for v in _as_list(p.value)])
+            if p.op in ("ne", "not_in"):
+                matched = ~matched & series.notna()
+        else:
+            start, end = _bounds(p)
+            matched = pd.Series(True, index=series.index)
+            if start is not None:
+                matched &= series > coerce(start) if p.op == "gt" else series >= coerce(start)
+            if end is not None:
+                matched &= series < coerce(end) if p.op == "lt" else series <= coerce(end)
+    except TypeError as e:
+        raise QueryError(f"Cannot apply '{p.op}' to {p.column}: {e}")
+    return matched.to_numpy(dtype=bool, na_value=False)
+
+
+def request_predicates(filters: Optional[List[Any]], time_range: Optional[Any], default_column: Optional[str]) -> List[Predicate]:
+    """Predicates for a render request's `filters` and `time_range` (which defaults to the x column)."""
+    predicates = [Predicate(f.column, f.op, f.value) for f in filters or ()]
+    if time_range is not None:
+        column = time_range.column or default_column
+        if not column:
+            raise QueryError("time_range needs a column.")
+        if time_range.last:
+            predicates.append(Predicate(column, "last", time_range.last))
+        elif time_range.start is not None or time_range.end is not None:
+            predicates.append(Predicate(column, "between", [time_range.start, time_range.end]))
+    return predicates
+
+
+def select_rows(
+    entry: SessionEntry,
+    predicates: List[Predicate],
+    index_for: Optional[Callable[[str], SortedIndex]],
+    read: Callable[[List[str], Optional[np.ndarray]], pd.DataFrame],
+) -> Optional[np.ndarray]:
+    """Row positions (ascending) matching every predicate, or None when there are none.
+
+    `index_for(column)` returns the column's sorted index (None disables indexes);
+    `read(columns, positions)` loads the given columns for those rows (all rows if None).
+    """
+    if not predicates:
+        return None
+    for p in predicates:
+        if p.column not in entry.profile:
+            raise QueryError(f"Column not found: {p.column}")
+
+    positions: Optional[np.ndarray] = None
+    scanned = []
+    for p in predicates:
+        if index_for is None or not _indexable(p, entry.profile[p.column]):
+            scanned.append(p)
+            continue
+        matched = index_for(p.column).positions(p)
+        positions = matched if positions is None else np.intersect1d(positions, matched, assume_unique=True)
+
+    if scanned and (positions is None or len(positions)):
+        columns = list(dict.fromkeys(p.column for p in scanned))
+        df = read(columns, positions)
+        keep = np.ones(len(df), dtype=bool)
+        for p in scanned:
+            keep &= _mask(df[p.column], p)
+        rows = np.arange(entry.n_rows, dtype=np.int64) if positions is None else positions
+        positions = rows[keep]
+    return positions
@@ -0,0 +1,280 @@
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from profiling import ColumnProfile
+
+# All-pairs chart ranking for /api/suggest-charts (mode "rank").
+# Every candidate (chart_type, x, y) is scored in one pass over a fixed-size
+# row sample of the session, with matrix operations instead of per-pair work:
+# numeric pairs through their correlation matrix, category/numeric pairs
+# through the correlation ratio (eta) from one sorted group sum per category
+# column, single columns by the shape of their distribution, and every column
+# by null ratio and cardinality from the stored profile. Scores are in [0, 1]
+# and comparable across chart types. The pair statistics run on fewer of the
+# sampled rows for wide sessions, so ranking time stays bounded by
+# PAIR_WORK_BUDGET and MAX_RANKED_COLUMNS rather than growing with the width.
+
+# Categories beyond this make bar charts and heatmaps hard to read.
+READABLE_CATEGORIES = 20
+# Category columns with more distinct sampled values are not grouped for eta.
+MAX_GROUP_CATEGORIES = 200
+# Numeric pairs this correlated are near-duplicates, not an interesting chart.
+DUPLICATE_CORRELATION = 0.999
+# Times one column may appear in a ranked list, so the top results are not all the same axis.
+MAX_PER_COLUMN = 2
+# Numeric columns with fewer distinct values read better as counts than as a histogram.
+HISTOGRAM_MIN_VALUES = 10
+# Category columns with fewer values say little in a count chart of their own.
+COUNT_MIN_CATEGORIES = 5
+# Rows x numeric columns x (numeric + category columns) for the pair statistics;
+# wider sessions compute them on fewer of the sampled rows, but never fewer than MIN_PAIR_ROWS.
+PAIR_WORK_BUDGET = 60_000_000
+MIN_PAIR_ROWS = 2_000
+# Columns beyond this many are not ranked; the ones with the best null ratio and cardinality are kept.
+MAX_RANKED_COLUMNS = 400
+
+# How informative each kind of chart usually is, before column quality and signal.
+WEIGHTS = {
+    "time_line": 0.95,
+    "bar": 0.9,
+    "scatter": 0.85,
+    "line": 0.8,
+    "heatmap": 0.6,
+    "histogram": 0.55,
+    "count_bar": 0.5,
+}
+CHART_TYPES = {"time_line": "line", "count_bar": "bar"}
+
+
+@dataclass
+class RankedChart:
+    chart_type: str
+    x: str
+    y: Optional[str]
+    score: float
+    reason: str
+
+
+def _quality(profile: Dict[str, ColumnProfile], columns: List[str], n_rows: int) -> np.ndarray:
+    """Per-column weight in [0, 1]: share of non-null rows, penalized for unreadable cardinality."""
+    quality = np.zeros(len(columns))
+    if not n_rows:
+        return quality
+    for i, col in enumerate(columns):
+        p = profile[col]
+        if p.unique_count <= 1:
+            continue
+        quality[i] = 1 - p.null_count / n_rows
+        if p.dtype in ("categorical", "boolean"):
+            quality[i] *= min(1.0, READABLE_CATEGORIES / p.unique_count)
+    return quality
+
+
+def _standardize(sample: pd.DataFrame, columns: List[str]) -> np.ndarray:
+    """Zero-mean, unit-variance float32 matrix (rows x columns); missing values sit at the mean."""
+    values = sample[columns].to_numpy(dtype=np.float64, na_value=np.nan)
+    valid = ~np.isnan(values)
+    counts = np.maximum(valid.sum(axis=0), 1)
+    centered = np.where(valid, values - np.where(valid, values, 0).sum(axis=0) / counts, 0.0)
+    std = np.sqrt((centered ** 2).sum(axis=0) / max(len(values), 1))
+    std[std == 0] = 1.0
+    return (centered / std).astype(np.float32)
+
+
+def _serial_correlation(z: np.ndarray) -> np.ndarray:
+    """Lag-1 autocorrelation of each standardized column in row order: high when it reads well as a line."""
+    if len(z) < 3:
+        return np.zeros(z.shape[1])
+    return np.clip((z[1:] * z[:-1]).sum(axis=0) / len(z), 0.0, 1.0)
+
+
+def _distribution_shape(z: np.ndarray) -> np.ndarray:
+    """Per standardized column, in [0, 1]: how skewed or multi-modal it is, i.e. how much a histogram shows."""
+    if not len(z):
+        return np.zeros(z.shape[1])
+    z2 = z * z
+    skew = (z2 * z).mean(axis=0)
+    kurtosis = (z2 * z2).mean(axis=0)
+    # Bimodality coefficient: 1/3 for a normal distribution, 5/9 for a uniform one, towards 1 for two separate modes.
+    bimodality = (skew ** 2 + 1) / np.maximum(kurtosis, 1e-9)
+    return np.maximum(np.clip(np.abs(skew) / 2, 0.0, 1.0), np.clip((bimodality - 5 / 9) / (4 / 9), 0.0, 1.0))
+
+
+def _pair_rows(n: int, n_nums: int, n_cats: int) -> np.ndarray:
+    """Evenly spaced sample rows for the pair statistics, as many as PAIR_WORK_BUDGET allows."""
+    work = n_nums * (n_nums + n_cats)
+    limit = max(PAIR_WORK_BUDGET // max(work, 1), MIN_PAIR_ROWS)
+    if n <= limit:
+        return np.arange(n)
+    return np.linspace(0, n - 1, limit).astype(np.int64)
+
+
+def _correlations(z: np.ndarray) -> np.ndarray:
+    """|r| between the columns of `z`."""
+    gram = z.T @ z
+    norms = np.sqrt(np.maximum(np.diag(gram), 1e-12))
+    return np.abs(gram) / np.outer(norms, norms)
+
+
+def _correlation_ratios(codes: List[np.ndarray], z: np.ndarray) -> np.ndarray:
+    """eta (categories x numerics): how much of each numeric column's variance the category explains."""
+    eta = np.zeros((len(codes), z.shape[1]))
+    if not len(z):
+        return eta
+    z = z - z.mean(axis=0)
+    total = np.maximum((z * z).sum(axis=0), 1e-12)
+    for i, col_codes in enumerate(codes):
+        valid = np.flatnonzero(col_codes >= 0)
+        order = valid[np.argsort(col_codes[valid], kind="stable")]
+        sorted_codes = col_codes[order]
+        if len(order) < 2 or sorted_codes[0] == sorted_codes[-1]:
+            continue
+        starts = np.flatnonzero(np.r_[True, sorted_codes[1:] != sorted_codes[:-1]])
+        if len(starts) > MAX_GROUP_CATEGORIES:
+            continue
+        sizes = np.diff(np.r_[starts, len(order)])
+        sums = np.add.reduceat(z[order], starts, axis=0)
+        between = ((sums ** 2) / sizes[:, None]).sum(axis=0)
+        eta[i] = np.sqrt(np.clip(between / total, 0.0, 1.0))
+    return eta
+
+
+def _category_balance(codes: List[np.ndarray]) -> np.ndarray:
+    """Per category column, in [0, 1]: 1 - normalized entropy of its value counts (uneven counts say more)."""
+    balance = np.zeros(len(codes))
+    for i, col_codes in enumerate(codes):
+        counts = np.bincount(col_codes[col_codes >= 0])
+        counts = counts[counts > 0]
+        if len(counts) < 2:
+            continue
+        p = counts / counts.sum()
+        balance[i] = 1 + (p * np.log(p)).sum() / np.log(len(counts))
+    return np.clip(balance, 0.0, 1.0)
+
+
+def rank_chart_pairs(sample: pd.DataFrame, profile: Dict[str, ColumnProfile], n_rows: int, top_k: int) -> List[RankedChart]:
+    """Scores every single-column and column-pair chart and returns the `top_k` best."""
+    columns = [c for c in profile if c in sample.columns]
+    if len(columns) > MAX_RANKED_COLUMNS:
+        best = np.argsort(-_quality(profile, columns, n_rows), kind="stable")[:MAX_RANKED_COLUMNS]
+        columns = [columns[i] for i in np.sort(best)]
+    nums = [c for c in columns if profile[c].dtype == "numeric"]
+    cats = [c for c in columns if profile[c].dtype in ("categorical", "boolean")]
+    dates = [c for c in columns if profile[c].dtype == "datetime"]
+
+    qn = _quality(profile, nums, n_rows)
+    qc = _quality(profile, cats, n_rows)
+    qd = _quality(profile, dates, n_rows)
+    monotonic = np.array([profile[c].is_monotonic_increasing for c in nums], dtype=bool)
+    time_ordered = np.array([profile[c].is_monotonic_increasing for c in dates], dtype=bool)
+
+    z = _standardize(sample, nums) if nums else np.zeros((len(sample), 0), dtype=np.float32)
+    codes = [pd.factorize(sample[col])[0] for col in cats]
+    # The sample keeps row order, so this is the shape of a line over any monotonic x column.
+    serial = _serial_correlation(z)
+    shape = _distribution_shape(z)
+    balance = _category_balance(codes)
+
+    rows = _pair_rows(len(z), len(nums), len(cats))
+    corr = _correlations(z[rows])
+    eta = _correlation_ratios([col_codes[rows] for col_codes in codes], z[rows])
+
+    # Single columns: distinct values and (un)evenness, so a flag or a bell curve does not outrank real pairs.
+    distinct = np.array([profile[c].unique_count for c in nums], dtype=np.float64)
+    hist_signal = (0.3 + 0.7 * shape) * np.clip((distinct - 1) / (HISTOGRAM_MIN_VALUES - 1), 0.0, 1.0)
+    categories = np.array([profile[c].unique_count for c in cats], dtype=np.float64)
+    count_signal = (0.3 + 0.7 * balance) * np.clip((categories - 1) / (COUNT_MIN_CATEGORIES - 1), 0.0, 1.0)
+
+    # Candidate blocks: (kind per candidate, x names, y names, scores, signal for the reason text)
+    blocks = []
+
+    # numeric x numeric: a line when one side is an ordered axis, otherwise a scatter
+    i, j = np.triu_indices(len(nums), 1)
+    if len(i):
+        swap = ~monotonic[i] & monotonic[j]
+        x, y = np.where(swap, j, i), np.where(swap, i, j)
+        r = np.minimum(corr[i, j], 1.0)
+        is_line = monotonic[x]
+        signal = np.where(is_line, 0.3 + 0.7 * serial[y], 0.3 + 0.7 * r)
+        signal[r > DUPLICATE_CORRELATION] = 0.1
+        weight = np.where(is_line, WEIGHTS["line"], WEIGHTS["scatter"])
+        kinds = np.where(is_line, "line", "scatter")
+        blocks.append((kinds, np.array(nums)[x], np.array(nums)[y], weight * qn[x] * qn[y] * signal, r))
+
+    # datetime x numeric: time series, judged in row order when the dates are sorted
+    if dates and nums:
+        d, k = np.meshgrid(np.arange(len(dates)), np.arange(len(nums)), indexing="ij")
+        d, k = d.ravel(), k.ravel()
+        signal = np.where(time_ordered[d], 0.3 + 0.7 * serial[k], 0.65)
+        scores = WEIGHTS["time_line"] * qd[d] * qn[k] * signal
+        blocks.append((np.full(len(d), "time_line"), np.array(dates)[d], np.array(nums)[k], scores, signal))
+
+    # category x numeric: grouped bars, stronger when the groups differ
+    if cats and nums:
+        c, k = np.meshgrid(np.arange(len(cats)), np.arange(len(nums)), indexing="ij")
+        c, k = c.ravel(), k.ravel()
+        e = eta[c, k]
+        scores = WEIGHTS["bar"] * qc[c] * qn[k] * (0.4 + 0.6 * e)
+        blocks.append((np.full(len(c), "bar"), np.array(cats)[c], np.array(nums)[k], scores, e))
+
+    # category x category: cross-tab heatmap
+    a, b = np.triu_indices(len(cats), 1)
+    if len(a):
+        scores = WEIGHTS["heatmap"] * qc[a] * qc[b] * 0.5
+        blocks.append((np.full(len(a), "heatmap"), np.array(cats)[a], np.array(cats)[b], scores, np.zeros(len(a))))
+
+    # single columns
+    if nums:
+        blocks.append((np.full(len(nums), "histogram"), np.array(nums), np.full(len(nums), None), WEIGHTS["histogram"] * qn * hist_signal, shape))
+    if cats:
+        blocks.append((np.full(len(cats), "count_bar"), np.array(cats), np.full(len(cats), None), WEIGHTS["count_bar"] * qc * count_signal, balance))
+
+    if not blocks or top_k <= 0:
+        return []
+    kinds = np.concatenate([blk[0] for blk in blocks])
+    xs = np.concatenate([blk[1].astype(object) for blk in blocks])
+    ys = np.concatenate([blk[2].astype(object) for blk in blocks])
+    scores = np.concatenate([blk[3] for blk in blocks])
+    signals = np.concatenate([blk[4] for blk in blocks])
+
+    # Only a shortlist is sorted; reasons are built for the selected charts only.
+    pool = min(len(scores), top_k * MAX_PER_COLUMN * 8)
+    shortlist = np.argpartition(-scores, pool - 1)[:pool]
+    shortlist = shortlist[np.argsort(-scores[shortlist], kind="stable")]
+    ranked: List[RankedChart] = []
+    uses: Dict[str, int] = {}
+    for n in shortlist:
+        if len(ranked) == top_k or scores[n] <= 0:
+            break
+        used = [c for c in (xs[n], ys[n]) if c is not None]
+        if any(uses.get(c, 0) >= MAX_PER_COLUMN for c in used):
+            continue
+        for c in used:
+            uses[c] = uses.get(c, 0) + 1
+        ranked.append(RankedChart(
+            chart_type=str(CHART_TYPES.get(kinds[n], kinds[n])),
+            x=xs[n],
+            y=ys[n],
+            score=round(float(scores[n]), 4),
+            reason=_reason(kinds[n], float(signals[n])),
+        ))
+    return ranked
+
+
+def _reason(kind: str, signal: float) -> str:
+    if kind == "scatter":
+        return f"Korelasyon analizi (|r|={signal:.2f})."
+    if kind == "line":
+        return "Sıralı eksen üzerinde trend takibi."
+    if kind == "time_line":
+        return "Zaman serisi."
+    if kind == "bar":
+        return f"Kategorik karşılaştırma (η={signal:.2f})."
+    if kind == "heatmap":
+        return "Kategori kesişimi."
+    if kind == "histogram":
+        return "Tek sayısal değişken dağılımı."
+    return "Kategori sayımları."
@@ -0,0 +1,135 @@
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Optional, Set, Tuple
+
+# Memoized /api/render-chart bodies.
+# Entries are keyed by a canonical hash of the render request (session, chart
+# type, columns and options) and the version of the session's rows, bounded by
+# total body bytes with LRU eviction, and dropped as a group when their session
+# goes away. The version makes rows appended by another worker process a cache
+# miss here, even though this process was never told about the append. Each body carries a
+# strong ETag so clients can revalidate with If-None-Match. Compressed variants
+# of a body are memoized on the entry and count towards the byte budget.
+
+
+@dataclass
+class CachedRender:
+    key: str
+    session_id: str
+    body: bytes
+    etag: str
+    variants: Dict[str, bytes] = field(default_factory=dict)
+
+    @property
+    def nbytes(self) -> int:
+        return len(self.body) + sum(len(v) for v in self.variants.values())
+
+
+def make_render_key(request: Dict[str, Any], session_version: Tuple[int, int]) -> str:
+    """Hashes a render request for one version (n_rows, version) of its session; option order and None-vs-empty options do not matter."""
+    canonical = dict(request)
+    canonical["options"] = canonical.get("options") or {}
+    canonical["session_version"] = list(session_version)
+    encoded = json.dumps(canonical, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+def make_etag(body: bytes) -> str:
+    return '"' + hashlib.sha1(body).hexdigest() + '"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates or f"W/{etag}" in candidates
+
+
+class RenderCache:
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+
+        self._entries: "OrderedDict[str, CachedRender]" = OrderedDict()
+        self._by_session: Dict[str, Set[str]] = {}
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def get(self, key: str) -> Optional[CachedRender]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._misses += 1
+                return None
+            self._hits += 1
+            self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key: str, session_id: str, body: bytes) -> CachedRender:
+        entry = CachedRender(key=key, session_id=session_id, body=body, etag=make_etag(body))
+        if self.max_bytes and len(body) > self.max_bytes:
+            return entry
+
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = entry
+            self._by_session.setdefault(session_id, set()).add(key)
+            self._bytes += len(body)
+            self._evict()
+        return entry
+
+    def encoded_body(self, entry: CachedRender, encoding: Optional[str], compress: Callable[[bytes, str], bytes]) -> bytes:
+        """Returns the body compressed with `encoding`, compressing at most once per cached entry."""
+        if not encoding:
+            return entry.body
+        data = entry.variants.get(encoding)
+        if data is not None:
+            return data
+
+        data = compress(entry.body, encoding)
+        with self._lock:
+            if self._entries.get(entry.key) is entry and encoding not in entry.variants:
+                entry.variants[encoding] = data
+                self._bytes += len(data)
+                self._evict()
+        return data
+
+    def invalidate_session(self, session_id: str) -> None:
+        with self._lock:
+            for key in list(self._by_session.get(session_id, ())):
+                self._remove(key)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self._hits,
+                "misses": self._misses,
+                "evictions": self._evictions,
+            }
+
+    # --- internals (caller holds the lock) ---
+
+    def _evict(self) -> None:
+        while self.max_bytes and self._bytes > self.max_bytes and self._entries:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self._evictions += 1
+
+    def _remove(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        self._bytes -= entry.nbytes
+        keys = self._by_session.get(entry.session_id)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._by_session[entry.session_id]
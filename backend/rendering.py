@@ -0,0 +1,153 @@
+import time
+from typing import Any, Dict, List, Literal, Optional, Tuple
+
+import pandas as pd
+import plotly.graph_objects as go
+from pydantic import BaseModel
+
+from config import RENDER_MAX_POINTS
+from downsampling import downsample_frame
+from aggregation import aggregate_frame, build_bar, build_pie, build_box, build_heatmap, DEFAULT_HEATMAP_BINS
+from payload import figure_payload
+from startup import lazy_import
+
+# Chart construction for /api/render-chart and /api/render-charts.
+# Kept free of app state (sessions, caches, Gemini) so rendering can run in a
+# worker process that imports only this module. plotly.express is imported on
+# the first render (or by `prewarm` in the background after startup).
+
+
+class FilterSpec(BaseModel):
+    column: str
+    op: Literal["eq", "ne", "in", "not_in", "gt", "gte", "lt", "lte", "between"] = "eq"
+    # A list for "in"/"not_in" and [start, end] for "between" (either end may be null)
+    value: Any = None
+
+class TimeRange(BaseModel):
+    # Defaults to the chart's x column
+    column: Optional[str] = None
+    start: Optional[str] = None
+    end: Optional[str] = None
+    # Window ending at the column's latest value, e.g. "30D" or "12h"; overrides start/end
+    last: Optional[str] = None
+
+class RenderChartSpec(BaseModel):
+    chart_type: str
+    x: Optional[str] = None
+    y: Optional[str] = None
+    options: Optional[Dict[str, Any]] = None
+    # Evaluated server-side before the chart is built; only matching rows are plotted
+    filters: Optional[List[FilterSpec]] = None
+    time_range: Optional[TimeRange] = None
+    # Splits line/area/scatter/bar/histogram/box traces by this column
+    color: Optional[str] = None
+    # bar/line/area/scatter/pie: one point per x (and color) value, y aggregated this way
+    agg: Optional[Literal["sum", "mean", "median", "min", "max", "count"]] = None
+    # "string": RenderResponse with plotly_json as a string (default)
+    # "figure": same fields, but the figure is embedded as a JSON object under "figure"
+    response_format: Literal["string", "figure"] = "string"
+
+class RenderRequest(RenderChartSpec):
+    session_id: str
+
+class RenderResponse(BaseModel):
+    chart_type: str
+    plotly_json: str
+    original_points: int = 0
+    rendered_points: int = 0
+    # Points were dropped by LTTB/min-max decimation
+    downsampled: bool = False
+    # The plotted points are a server-side summary (agg, or bar/pie/box/heatmap statistics)
+    aggregated: bool = False
+
+class RenderFigureResponse(BaseModel):
+    """Body for response_format="figure": the RenderResponse fields with the figure embedded as an object."""
+    chart_type: str
+    figure: Dict[str, Any]
+    original_points: int = 0
+    rendered_points: int = 0
+    downsampled: bool = False
+    aggregated: bool = False
+
+# Line-like charts keep their shape best with LTTB; scatter clouds with min-max buckets.
+DOWNSAMPLE_METHODS = {"line": "lttb", "area": "lttb", "scatter": "minmax"}
+AGGREGATE_CHARTS = {"bar", "line", "area", "scatter", "pie"}
+
+def chart_columns(spec: RenderChartSpec) -> List[str]:
+    """Session columns a chart plots (filter columns are only needed to select rows)."""
+    return list(dict.fromkeys(c for c in (spec.x, spec.y, spec.color) if c))
+
+def build_chart(df: pd.DataFrame, req: RenderRequest) -> Tuple[go.Figure, Dict[str, Any]]:
+    """Builds the Plotly figure for a render request; returns (figure, point counts and flags)."""
+    t = req.chart_type
+    options = req.options or {}
+    x, y, color = req.x, req.y, req.color
+    downsampled = False
+
+    is_aggregate = bool(req.agg and x and t in AGGREGATE_CHARTS)
+    if is_aggregate:
+        df, y = aggregate_frame(df, x, y, color, req.agg)
+
+    method = DOWNSAMPLE_METHODS.get(t)
+    if method and x and y:
+        max_points = int(options.get("max_points", RENDER_MAX_POINTS))
+        columns = list(dict.fromkeys(c for c in (x, y, color) if c))
+        df, downsampled = downsample_frame(df[columns], x, y, max_points, method, group=color)
+
+    # Grouping charts are summarized server-side; only the summary is serialized.
+    # Color-split bars and boxes go through plotly.express, which draws one trace per group.
+    aggregated = None
+    if t == "bar" and not color: aggregated = build_bar(df, x, y, f"{x} vs {y}")
+    elif t == "pie": aggregated = build_pie(df, x, y, f"Pie: {x}")
+    elif t == "box" and not color: aggregated = build_box(df, x, y, f"Box: {x}")
+    elif t == "heatmap":
+        nbins = int(options.get("nbins", DEFAULT_HEATMAP_BINS))
+        aggregated = build_heatmap(df, x, y, "Heatmap", nbins=nbins)
+
+    px = lazy_import("plotly.express")
+    rendered_points = len(df)
+    if aggregated is not None:
+        fig, rendered_points = aggregated
+        is_aggregate = True
+    elif t == "bar": fig = px.bar(df, x=x, y=y, color=color, title=f"{x} vs {y}")
+    elif t == "line": fig = px.line(df, x=x, y=y, color=color, title=f"{x} vs {y}")
+    elif t == "area": fig = px.area(df, x=x, y=y, color=color, title=f"{x} vs {y}")
+    elif t == "scatter": fig = px.scatter(df, x=x, y=y, color=color, title=f"{x} vs {y}")
+    elif t == "histogram":
+        target = x if x else y
+        fig = px.histogram(df, x=target, color=color, title=f"Dist of {target}")
+    elif t == "box": fig = px.box(df, x=x, y=y, color=color, title=f"Box: {x}")
+    elif t == "pie": fig = px.pie(df, names=x, values=y, title=f"Pie: {x}")
+    elif t == "heatmap": fig = px.density_heatmap(df, x=x, y=y, title=f"Heatmap")
+    else: fig = px.scatter(df, x=x, y=y, color=color, title="Chart")
+
+    fig.update_layout(template="plotly_dark")
+    return fig, {"rendered_points": rendered_points, "downsampled": downsampled, "aggregated": is_aggregate}
+
+def render_chart_body(df: pd.DataFrame, req: RenderRequest) -> Tuple[bytes, Dict[str, float]]:
+    """Renders a chart in the requested response format; returns (body, stage timings in seconds).
+
+    Timings are returned rather than recorded so they survive the hop back from a worker process.
+    """
+    original_points = len(df)
+    start = time.perf_counter()
+    fig, points = build_chart(df, req)
+    built = time.perf_counter()
+    figure_json = fig.to_json()
+    timings = {"figure_build": built - start, "to_json": time.perf_counter() - built}
+
+    meta = {
+        "chart_type": req.chart_type,
+        "original_points": original_points,
+        **points,
+    }
+    if req.response_format == "figure":
+        return figure_payload(meta, figure_json), timings
+    return RenderResponse(plotly_json=figure_json, **meta).model_dump_json().encode("utf-8"), timings
+
+def prewarm() -> None:
+    """Imports plotly.express and builds one small themed figure, loading templates and validators."""
+    px = lazy_import("plotly.express")
+    fig = px.line(pd.DataFrame({"x": [0, 1], "y": [0, 1]}), x="x", y="y")
+    fig.update_layout(template="plotly_dark")
+    fig.to_json()
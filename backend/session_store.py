@@ -0,0 +1,376 @@
+import itertools
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from dataclasses import dataclass, field, replace
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from appending import concat_frames
+from profiling import ColumnProfile, profile_dataframe
+
+# Session storage.
+# SessionBackend is the interface behind get_session_df. Callers ask for the
+# columns they need; backends that persist sessions column-wise only load
+# those. Sessions grow through `append`, which tells append listeners which
+# rows were added (removal listeners are only told about replaced or dropped
+# sessions). Uploads stored with a content key can be shared: `share` points a
+# new session at the stored frame instead of storing another copy, and the
+# frame is only released when the last session using it goes away. The
+# MemorySessionBackend keeps DataFrames in this process: sessions are kept in
+# LRU order and accounted by their deep memory usage, inserting past the byte
+# budget evicts the least recently used sessions, and sessions idle for longer
+# than the TTL are dropped on the next access. Backends that share sessions
+# between worker processes live in their own modules (see arrow_sessions.py).
+
+
+class SessionTooLargeError(Exception):
+    """Raised when a single DataFrame does not fit in the store's byte budget."""
+
+
+class SessionChangedError(Exception):
+    """Raised when a session changed (another append, a replacement) while rows were being appended."""
+
+
+@dataclass
+class SessionEntry:
+    df: Optional[pd.DataFrame]  # None when the backend loads columns on demand
+    nbytes: int
+    created_at: float
+    last_access: float
+    profile: Dict[str, ColumnProfile] = field(default_factory=dict)
+    n_rows: int = 0
+    columns: List[str] = field(default_factory=list)
+    # Set for frames stored by content; sessions with the same key share one read-only frame
+    content_key: Optional[str] = None
+    # Changes whenever the session's rows change, in every process that can see the session
+    version: int = 0
+
+
+# Versions of in-process sessions (arrow sessions use their file's mtime instead)
+_VERSIONS = itertools.count(1)
+
+
+def frame_nbytes(df: pd.DataFrame) -> int:
+    return int(df.memory_usage(deep=True, index=True).sum())
+
+
+def sample_positions(n_rows: int, max_rows: int) -> Optional[np.ndarray]:
+    """Evenly spaced row positions (keeping row order), or None when every row fits."""
+    if not max_rows or n_rows <= max_rows:
+        return None
+    return np.linspace(0, n_rows - 1, max_rows).astype(np.int64)
+
+
+class SessionBackend(ABC):
+    """Stores session DataFrames together with their column profile."""
+
+    def __init__(self):
+        self._listeners: List[Callable[[str], None]] = []
+        self._append_listeners: List[Callable[[str, SessionEntry, pd.DataFrame], None]] = []
+
+    def add_removal_listener(self, listener: Callable[[str], None]) -> None:
+        """Registers `listener(session_id)`, called whenever a session is replaced, deleted, expired or evicted."""
+        self._listeners.append(listener)
+
+    def _notify_removed(self, session_id: str) -> None:
+        for listener in self._listeners:
+            listener(session_id)
+
+    def add_append_listener(self, listener: Callable[[str, SessionEntry, pd.DataFrame], None]) -> None:
+        """Registers `listener(session_id, entry, rows)`, called after `rows` were appended; `entry` is the grown session."""
+        self._append_listeners.append(listener)
+
+    def _notify_appended(self, session_id: str, entry: SessionEntry, rows: pd.DataFrame) -> None:
+        for listener in self._append_listeners:
+            listener(session_id, entry, rows)
+
+    @abstractmethod
+    def put(self, session_id: str, df: pd.DataFrame, profile: Optional[Dict[str, ColumnProfile]] = None, content_key: Optional[str] = None) -> SessionEntry:
+        ...
+
+    @abstractmethod
+    def share(self, content_key: str, session_id: str) -> Optional[SessionEntry]:
+        """Creates `session_id` on the stored frame with `content_key`; None if no live session has it."""
+
+    @abstractmethod
+    def get_entry(self, session_id: str, touch: bool = True) -> Optional[SessionEntry]:
+        ...
+
+    @abstractmethod
+    def append(self, session_id: str, rows: pd.DataFrame, profile: Dict[str, ColumnProfile], expected_rows: int) -> Optional[SessionEntry]:
+        """Adds `rows` (already conformed to the session's dtypes) after the session's `expected_rows` rows."""
+
+    @abstractmethod
+    def delete(self, session_id: str) -> bool:
+        ...
+
+    @abstractmethod
+    def stats(self) -> Dict[str, int]:
+        ...
+
+    @abstractmethod
+    def _frame(self, session_id: str, entry: SessionEntry, columns: List[str]) -> pd.DataFrame:
+        ...
+
+    def get(self, session_id: str, columns: Optional[List[str]] = None) -> Optional[pd.DataFrame]:
+        """Returns the session frame, restricted to `columns` (unknown names are skipped) if given."""
+        entry = self.get_entry(session_id)
+        if entry is None:
+            return None
+        wanted = entry.columns if columns is None else [c for c in dict.fromkeys(columns) if c in entry.columns]
+        return self._frame(session_id, entry, wanted)
+
+    def sample(self, session_id: str, max_rows: int) -> Optional[pd.DataFrame]:
+        """All columns for at most `max_rows` evenly spaced rows of the session."""
+        entry = self.get_entry(session_id)
+        if entry is None:
+            return None
+        return self._take_frame(session_id, entry, entry.columns, sample_positions(entry.n_rows, max_rows))
+
+    def take(self, session_id: str, columns: Optional[List[str]], positions: Optional[np.ndarray]) -> Optional[pd.DataFrame]:
+        """Like `get`, restricted to the rows at `positions` (all rows if None)."""
+        entry = self.get_entry(session_id)
+        if entry is None:
+            return None
+        wanted = entry.columns if columns is None else [c for c in dict.fromkeys(columns) if c in entry.columns]
+        return self._take_frame(session_id, entry, wanted, positions)
+
+    def _take_frame(self, session_id: str, entry: SessionEntry, columns: List[str], positions: Optional[np.ndarray]) -> pd.DataFrame:
+        df = self._frame(session_id, entry, columns)
+        return df if positions is None else df.take(positions)
+
+    def dtypes(self, session_id: str) -> Optional[pd.Series]:
+        """Stored dtype per column, without loading any rows."""
+        entry = self.get_entry(session_id, touch=False)
+        if entry is None:
+            return None
+        return self._take_frame(session_id, entry, entry.columns, np.empty(0, dtype=np.int64)).dtypes
+
+    def __contains__(self, session_id: str) -> bool:
+        return self.get_entry(session_id, touch=False) is not None
+
+
+class MemorySessionBackend(SessionBackend):
+    def __init__(self, max_bytes: int, ttl_seconds: float = 0, max_sessions: int = 0):
+        super().__init__()
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.max_sessions = max_sessions
+
+        self._entries: "OrderedDict[str, SessionEntry]" = OrderedDict()
+        # content key -> (an entry holding the shared frame, number of sessions using it)
+        self._shared: Dict[str, Tuple[SessionEntry, int]] = {}
+        self._lock = threading.RLock()
+        self._bytes = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._expirations = 0
+        self._shares = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def put(self, session_id: str, df: pd.DataFrame, profile: Optional[Dict[str, ColumnProfile]] = None, content_key: Optional[str] = None) -> SessionEntry:
+        nbytes = frame_nbytes(df)
+        if self.max_bytes and nbytes > self.max_bytes:
+            raise SessionTooLargeError(
+                f"Dataset needs {nbytes} bytes, session budget is {self.max_bytes} bytes."
+            )
+
+        now = time.monotonic()
+        entry = SessionEntry(
+            df=df,
+            nbytes=nbytes,
+            created_at=now,
+            last_access=now,
+            profile=profile or profile_dataframe(df),
+            n_rows=len(df),
+            columns=list(df.columns),
+            content_key=content_key,
+            version=next(_VERSIONS),
+        )
+        with self._lock:
+            self._remove(session_id)
+            if content_key in self._shared:
+                # Same content stored meanwhile by a concurrent upload: keep one copy.
+                entry = replace(self._shared[content_key][0], created_at=now, last_access=now, version=entry.version)
+            self._entries[session_id] = entry
+            self._retain(entry)
+            self._expire(now)
+            self._evict(keep=session_id)
+        return entry
+
+    def share(self, content_key: str, session_id: str) -> Optional[SessionEntry]:
+        with self._lock:
+            now = time.monotonic()
+            self._expire(now)
+            shared = self._shared.get(content_key)
+            if shared is None:
+                return None
+            entry = replace(shared[0], created_at=now, last_access=now, version=next(_VERSIONS))
+            self._remove(session_id)
+            self._entries[session_id] = entry
+            self._retain(entry)
+            self._shares += 1
+            self._evict(keep=session_id)
+        return entry
+
+    def get_entry(self, session_id: str, touch: bool = True) -> Optional[SessionEntry]:
+        with self._lock:
+            entry = self._entries.get(session_id)
+            now = time.monotonic()
+            if entry is not None and self._is_expired(entry, now):
+                self._remove(session_id)
+                self._expirations += 1
+                entry = None
+
+            if entry is None:
+                if touch:
+                    self._misses += 1
+                return None
+
+            if touch:
+                self._hits += 1
+                entry.last_access = now
+                self._entries.move_to_end(session_id)
+            return entry
+
+    def append(self, session_id: str, rows: pd.DataFrame, profile: Dict[str, ColumnProfile], expected_rows: int) -> Optional[SessionEntry]:
+        entry = self.get_entry(session_id)
+        if entry is None:
+            return None
+        if entry.n_rows != expected_rows:
+            raise SessionChangedError("Session changed while rows were being appended.")
+
+        # The copy happens outside the lock; the swap below checks nothing replaced the entry meanwhile.
+        df = concat_frames(entry.df, rows)
+        nbytes = frame_nbytes(df)
+        if self.max_bytes and nbytes > self.max_bytes:
+            raise SessionTooLargeError(
+                f"Dataset needs {nbytes} bytes, session budget is {self.max_bytes} bytes."
+            )
+
+        grown = SessionEntry(
+            df=df,
+            nbytes=nbytes,
+            created_at=entry.created_at,
+            last_access=time.monotonic(),
+            profile=profile,
+            n_rows=len(df),
+            columns=list(df.columns),
+            version=next(_VERSIONS),
+        )
+        with self._lock:
+            if self._entries.get(session_id) is not entry:
+                raise SessionChangedError("Session changed while rows were being appended.")
+            # A grown session no longer shares its frame; the others keep the stored one.
+            self._release(entry)
+            self._entries[session_id] = grown
+            self._entries.move_to_end(session_id)
+            self._retain(grown)
+            self._evict(keep=session_id)
+        self._notify_appended(session_id, grown, rows)
+        return grown
+
+    def _frame(self, session_id: str, entry: SessionEntry, columns: List[str]) -> pd.DataFrame:
+        if len(columns) == len(entry.columns):
+            return entry.df
+        return entry.df[columns]
+
+    def delete(self, session_id: str) -> bool:
+        with self._lock:
+            return self._remove(session_id) is not None
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            self._expire(time.monotonic())
+            return {
+                "sessions": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self._hits,
+                "misses": self._misses,
+                "evictions": self._evictions,
+                "expirations": self._expirations,
+                "frames": len({id(e.df) for e in self._entries.values()}),
+                "shares": self._shares,
+            }
+
+    # --- internals (caller holds the lock) ---
+
+    def _retain(self, entry: SessionEntry) -> None:
+        """Accounts for a session using `entry`'s frame; shared frames count once."""
+        key = entry.content_key
+        if key is None:
+            self._bytes += entry.nbytes
+            return
+        holder, refs = self._shared.get(key, (entry, 0))
+        if not refs:
+            self._bytes += entry.nbytes
+        self._shared[key] = (holder, refs + 1)
+
+    def _release(self, entry: SessionEntry) -> None:
+        """Undoes `_retain`; a shared frame is freed with its last session."""
+        key = entry.content_key
+        if key is None:
+            self._bytes -= entry.nbytes
+            return
+        holder, refs = self._shared[key]
+        if refs > 1:
+            self._shared[key] = (holder, refs - 1)
+        else:
+            del self._shared[key]
+            self._bytes -= entry.nbytes
+
+    def _remove(self, session_id: str) -> Optional[SessionEntry]:
+        entry = self._entries.pop(session_id, None)
+        if entry is not None:
+            self._release(entry)
+            self._notify_removed(session_id)
+        return entry
+
+    def _is_expired(self, entry: SessionEntry, now: float) -> bool:
+        return bool(self.ttl_seconds) and now - entry.last_access > self.ttl_seconds
+
+    def _expire(self, now: float) -> None:
+        expired = [sid for sid, e in self._entries.items() if self._is_expired(e, now)]
+        for sid in expired:
+            self._remove(sid)
+            self._expirations += 1
+
+    def _evict(self, keep: str) -> None:
+        def over_budget() -> bool:
+            too_big = self.max_bytes and self._bytes > self.max_bytes
+            too_many = self.max_sessions and len(self._entries) > self.max_sessions
+            return bool(too_big or too_many)
+
+        while over_budget() and len(self._entries) > 1:
+            oldest = next(iter(self._entries))
+            if oldest == keep:
+                break
+            self._remove(oldest)
+            self._evictions += 1
+
+
+def create_session_backend(kind: str, max_bytes: int, ttl_seconds: float, max_sessions: int, directory: str, column_cache_bytes: int) -> SessionBackend:
+    """Builds the configured backend: "memory" (per process), "arrow" (shared files) or "auto"."""
+    if kind == "auto":
+        from arrow_sessions import pa
+        kind = "arrow" if pa is not None else "memory"
+    if kind == "arrow":
+        from arrow_sessions import ArrowFileSessionBackend
+        return ArrowFileSessionBackend(
+            directory,
+            max_bytes=max_bytes,
+            ttl_seconds=ttl_seconds,
+            max_sessions=max_sessions,
+            column_cache_bytes=column_cache_bytes,
+        )
+    if kind != "memory":
+        raise ValueError(f"Unknown SESSION_BACKEND '{kind}' (expected 'memory', 'arrow' or 'auto').")
+    return MemorySessionBackend(max_bytes=max_bytes, ttl_seconds=ttl_seconds, max_sessions=max_sessions)
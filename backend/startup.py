@@ -0,0 +1,87 @@
+import importlib
+import logging
+import sys
+import threading
+import time
+from types import ModuleType
+from typing import Any, Callable, Dict, List, Tuple
+
+from logging_setup import LOGGER_NAME
+
+# Cold-start bookkeeping.
+# main.py marks the end of each startup phase (imports, app setup, server
+# start); heavy dependencies are imported on first use through
+# `lazy_import`, which records what each one cost and when; slow one-time
+# initialisation runs in a background thread after startup. The combined
+# report is logged once the app is serving and available at
+# /api/debug-startup. For a full per-module breakdown of the eager imports
+# run `python -X importtime -c "import main"`.
+
+logger = logging.getLogger(LOGGER_NAME)
+
+
+class StartupReport:
+    def __init__(self):
+        self._started = time.perf_counter()
+        self._last_mark = self._started
+        self._phases: Dict[str, float] = {}
+        self._lazy_imports: Dict[str, float] = {}
+        self._prewarm: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def mark(self, phase: str) -> None:
+        """Records the time since the previous mark as `phase`."""
+        now = time.perf_counter()
+        with self._lock:
+            self._phases[phase] = now - self._last_mark
+            self._last_mark = now
+
+    def record_import(self, name: str, seconds: float) -> None:
+        with self._lock:
+            self._lazy_imports[name] = seconds
+
+    def record_prewarm(self, name: str, seconds: float) -> None:
+        with self._lock:
+            self._prewarm[name] = seconds
+
+    def report(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "phases_seconds": {k: round(v, 4) for k, v in self._phases.items()},
+                "ready_after_seconds": round(sum(self._phases.values()), 4),
+                "lazy_imports_seconds": {k: round(v, 4) for k, v in self._lazy_imports.items()},
+                "prewarm_seconds": {k: round(v, 4) for k, v in self._prewarm.items()},
+            }
+
+
+STARTUP = StartupReport()
+
+
+def lazy_import(name: str) -> ModuleType:
+    """`importlib.import_module`, timing the first (real) import of `name` for the startup report."""
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+    start = time.perf_counter()
+    module = importlib.import_module(name)
+    STARTUP.record_import(name, time.perf_counter() - start)
+    return module
+
+
+def prewarm_in_background(tasks: List[Tuple[str, Callable[[], Any]]]) -> threading.Thread:
+    """Runs one-time warm-up tasks off the serving path; failures are logged, never raised."""
+
+    def run() -> None:
+        for name, task in tasks:
+            start = time.perf_counter()
+            try:
+                task()
+            except Exception:
+                logger.exception("Prewarm task failed", extra={"task": name})
+                continue
+            STARTUP.record_prewarm(name, time.perf_counter() - start)
+        logger.info("Prewarm complete", extra=STARTUP.report()["prewarm_seconds"])
+
+    thread = threading.Thread(target=run, name="prewarm", daemon=True)
+    thread.start()
+    return thread
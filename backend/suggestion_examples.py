@@ -1,5 +1,6 @@
 import pandas as pd
-from main import suggest_charts, SESSIONS, get_dtype_str, Suggestion, SuggestionsResponse
+from main import suggest_charts, SESSIONS
+from profiling import profile_dataframe
 import asyncio
 import uuid
 
@@ -13,7 +14,7 @@ def create_mock_session():
     }
     df = pd.DataFrame(data)
     session_id = str(uuid.uuid4())
-    SESSIONS[session_id] = df
+    SESSIONS.put(session_id, df, profile_dataframe(df))
     return session_id
 
 async def run_tests():
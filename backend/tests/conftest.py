@@ -0,0 +1,9 @@
+import os
+import sys
+import tempfile
+
+# Backend modules import each other by bare name (run from backend/), so tests do the same.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Tests that import main must not touch a running server's sessions.
+os.environ.setdefault("SESSION_DIR", tempfile.mkdtemp(prefix="chartly-test-sessions-"))
+os.environ.setdefault("PREWARM", "false")
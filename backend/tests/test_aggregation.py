@@ -0,0 +1,24 @@
+import numpy as np
+import pandas as pd
+
+from aggregation import build_box
+
+
+def test_box_of_empty_frame_is_an_empty_trace():
+    df = pd.DataFrame({"g": pd.Series([], dtype="category"), "v": pd.Series([], dtype=np.float64)})
+    fig, points = build_box(df, "g", "v", "Box: g")
+    assert points == 0
+    assert len(fig.data[0].q1) == 0
+
+
+def test_box_of_all_nan_values_is_an_empty_trace():
+    df = pd.DataFrame({"v": [np.nan, np.nan, np.nan]})
+    fig, points = build_box(df, "v", None, "Box: v")
+    assert points == 0
+
+
+def test_box_quartiles_per_group():
+    df = pd.DataFrame({"g": ["a"] * 5 + ["b"] * 5, "v": [1, 2, 3, 4, 5, 10, 20, 30, 40, 50]})
+    fig, points = build_box(df, "g", "v", "Box: g")
+    assert points == 2
+    assert list(fig.data[0].median) == [3.0, 30.0]
@@ -0,0 +1,90 @@
+import io
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+
+
+@pytest.fixture
+def client():
+    with TestClient(main.app) as c:
+        yield c
+
+
+def upload(client: TestClient, csv: str) -> str:
+    response = client.post("/api/upload-csv", files={"file": ("data.csv", io.BytesIO(csv.encode("utf-8")), "text/csv")})
+    assert response.status_code == 200, response.text
+    return response.json()["session_id"]
+
+
+def test_render_chart_documents_both_response_shapes():
+    schema = main.app.openapi()["paths"]["/api/render-chart"]["post"]["responses"]["200"]["content"]["application/json"]["schema"]
+    refs = {option["$ref"].rsplit("/", 1)[-1] for option in schema["anyOf"]}
+    assert refs == {"RenderResponse", "RenderFigureResponse"}
+
+
+def test_render_chart_figure_format_matches_its_model(client):
+    session_id = upload(client, "x,y\n1,2\n2,4\n3,1\n")
+    response = client.post("/api/render-chart", json={"session_id": session_id, "chart_type": "line", "x": "x", "y": "y", "response_format": "figure"})
+    assert response.status_code == 200
+    main.RenderFigureResponse.model_validate(response.json())
+    response = client.post("/api/render-chart", json={"session_id": session_id, "chart_type": "line", "x": "x", "y": "y"})
+    main.RenderResponse.model_validate(response.json())
+
+
+@pytest.mark.parametrize("top_k", [0, -1, 2.5, True, None, "many"])
+def test_rank_rejects_top_k_below_one(client, top_k):
+    session_id = upload(client, "a,b,c\n1,2,x\n2,4,y\n3,1,x\n")
+    response = client.post("/api/suggest-charts", json={"session_id": session_id, "mode": "rank", "top_k": top_k})
+    assert response.status_code == 400
+
+
+def test_rank_honours_top_k(client):
+    session_id = upload(client, "a,b,c\n1,2,x\n2,4,y\n3,1,x\n")
+    response = client.post("/api/suggest-charts", json={"session_id": session_id, "mode": "rank", "top_k": 1})
+    assert response.status_code == 200
+    assert len(response.json()["suggestions"]) == 1
+
+
+def test_rank_answers_503_when_its_limiter_is_full(client, monkeypatch):
+    import asyncio
+    from workers import EndpointLimiter
+
+    session_id = upload(client, "a,b\n1,2\n2,4\n3,1\n")
+    limiter = EndpointLimiter("suggest-charts", 1, 0)
+    asyncio.run(limiter.acquire())
+    monkeypatch.setattr(main, "SUGGEST_LIMITER", limiter)
+    response = client.post("/api/suggest-charts", json={"session_id": session_id, "mode": "rank"})
+    assert response.status_code == 503
+    assert "Retry-After" in response.headers
+
+
+def append(client: TestClient, session_id: str, csv: str):
+    return client.post(f"/api/sessions/{session_id}/append-csv", files={"file": ("rows.csv", io.BytesIO(csv.encode("utf-8")), "text/csv")})
+
+
+def test_append_keeps_the_stored_profile_exact(client):
+    from profiling import profile_dataframe
+
+    session_id = upload(client, "t,n,flag,city\n2024-01-01,1.5,true,ankara\n2024-01-02,2.5,false,izmir\n2024-01-03,4,true,ankara\n")
+    for delta, added in [("2024-01-04,8,false,van\n", 1), (",2.5,,zz\n", 1), ("2024-01-05,,,\n2024-01-06,,,\n", 2), ("", 0)]:
+        response = append(client, session_id, "t,n,flag,city\n" + delta)
+        assert response.status_code == 200, response.text
+        assert response.json()["appended_rows"] == added
+
+    entry = main.SESSIONS.get_entry(session_id)
+    assert entry.n_rows == 7
+    fresh = profile_dataframe(main.SESSIONS.get(session_id))
+    for col, expected in fresh.items():
+        got = entry.profile[col]
+        assert (got.dtype, got.unique_count, got.null_count, got.min, got.max, got.is_monotonic_increasing) == (
+            expected.dtype, expected.unique_count, expected.null_count, expected.min, expected.max, expected.is_monotonic_increasing
+        ), col
+
+
+def test_append_rejects_other_columns(client):
+    session_id = upload(client, "a,b\n1,2\n")
+    response = append(client, session_id, "a,c\n3,4\n")
+    assert response.status_code == 400
+    assert "unknown columns: c" in response.json()["detail"]
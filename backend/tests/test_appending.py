@@ -0,0 +1,96 @@
+import io
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from appending import SchemaMismatchError, concat_frames, conform_frame
+from compaction import compact_dataframe
+from ingest import parse_csv_stream
+from profiling import extend_profile, profile_dataframe
+from query import Predicate, SortedIndex
+
+BASE = (
+    "t,n,flag,city,note\n"
+    "2024-01-01,1.5,true,ankara,x\n"
+    "2024-01-02,2.5,false,izmir,y\n"
+    "2024-01-03,4.0,true,ankara,z\n"
+    "2024-01-04,8.0,false,bursa,w\n"
+)
+
+
+def parse(csv: str, keep_empty_columns: bool = False) -> pd.DataFrame:
+    return parse_csv_stream(io.BytesIO(csv.encode("utf-8")), "c", 1000, 0, keep_empty_columns).df
+
+
+def stored() -> pd.DataFrame:
+    return compact_dataframe(parse(BASE), 0.8)
+
+
+def append(df: pd.DataFrame, delta: str):
+    """The stored frame and profile after appending `delta` (rows under BASE's header)."""
+    rows = conform_frame(parse("t,n,flag,city,note\n" + delta, keep_empty_columns=True), df.dtypes)
+    profile = extend_profile(profile_dataframe(df), rows, df.dtypes, lambda col: df[col])
+    return concat_frames(df, rows), profile
+
+
+def assert_profile_matches(full: pd.DataFrame, profile) -> None:
+    fresh = profile_dataframe(full)
+    assert list(profile) == list(fresh)
+    for col, expected in fresh.items():
+        got = profile[col]
+        assert (got.dtype, got.unique_count, got.null_count) == (expected.dtype, expected.unique_count, expected.null_count), col
+        assert (got.min, got.max) == (expected.min, expected.max), col
+        assert got.is_monotonic_increasing == expected.is_monotonic_increasing, col
+
+
+@pytest.mark.parametrize("delta", [
+    "2024-01-05,9.0,true,ankara,v\n2024-01-06,16.0,false,van,u\n",
+    "2024-01-02,2.5,true,izmir,x\n",
+    ",2.5,,zz,\n",
+    "2024-01-05,,,,\n2024-01-06,,,,\n",
+])
+def test_extended_profile_matches_a_fresh_profile(delta):
+    full, profile = append(stored(), delta)
+    assert_profile_matches(full, profile)
+
+
+def test_missing_flags_stay_boolean():
+    rows = conform_frame(parse("t,n,flag,city,note\n,2.5,,zz,\n", keep_empty_columns=True), stored().dtypes)
+    assert rows["flag"].dtype == "boolean"
+    assert rows["flag"].isna().all()
+    full = concat_frames(stored(), rows)
+    assert pd.api.types.is_bool_dtype(full["flag"])
+    assert full["flag"].tolist()[:2] == [True, False]
+
+
+def test_conform_frame_rejects_other_columns_and_values():
+    df = stored()
+    with pytest.raises(SchemaMismatchError, match="missing columns: note"):
+        conform_frame(parse("t,n,flag,city\n2024-01-05,1,true,a\n"), df.dtypes)
+    with pytest.raises(SchemaMismatchError, match="true/false"):
+        conform_frame(parse("t,n,flag,city,note\n2024-01-05,1,maybe,a,b\n"), df.dtypes)
+    with pytest.raises(SchemaMismatchError, match="numeric"):
+        conform_frame(parse("t,n,flag,city,note\n2024-01-05,many,true,a,b\n"), df.dtypes)
+
+
+def test_empty_columns_are_kept_only_when_asked():
+    csv = "a,b\n1,\n2,\n"
+    assert list(parse(csv).columns) == ["a"]
+    assert list(parse(csv, keep_empty_columns=True).columns) == ["a", "b"]
+    assert parse("a,b\n", keep_empty_columns=True).empty
+
+
+@pytest.mark.parametrize("p", [
+    Predicate("t", "gte", "2024-01-02"),
+    Predicate("t", "lt", "2024-01-01"),
+    Predicate("city", "eq", "izmir"),
+    Predicate("city", "in", ["ankara", "van"]),
+])
+def test_extended_index_matches_a_rebuilt_one(p):
+    df = stored()
+    full, _ = append(df, "2024-01-02,1,true,van,q\n,2,false,,r\n2023-12-31,3,true,ankara,s\n")
+    grown = SortedIndex.build(df[p.column], 1).extended(full[p.column].iloc[len(df):], len(df), 2)
+    rebuilt = SortedIndex.build(full[p.column], 2)
+    np.testing.assert_array_equal(grown.positions(p), rebuilt.positions(p))
+    assert len(grown.positions(p))
@@ -0,0 +1,111 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip("pyarrow")
+
+from arrow_sessions import ArrowFileSessionBackend  # noqa: E402
+
+
+@pytest.fixture
+def backend(tmp_path):
+    return ArrowFileSessionBackend(str(tmp_path))
+
+
+def test_put_stores_mixed_object_column_as_text(backend):
+    df = pd.DataFrame({
+        "code": pd.Series([100, "100", "A7", np.nan], dtype=object),
+        "value": [1.0, 2.0, 3.0, 4.0],
+    })
+    entry = backend.put("s1", df)
+    assert entry.n_rows == 4
+
+    stored = backend.get("s1")
+    assert stored["code"].tolist()[:3] == ["100", "100", "A7"]
+    assert pd.isna(stored["code"].iloc[3])
+    assert stored["value"].tolist() == [1.0, 2.0, 3.0, 4.0]
+
+
+def test_put_keeps_typed_columns(backend):
+    df = pd.DataFrame({"n": [1, 2, 3], "t": ["a", "b", None]})
+    backend.put("s1", df)
+    stored = backend.get("s1")
+    assert pd.api.types.is_integer_dtype(stored["n"])
+    assert stored["t"].tolist()[:2] == ["a", "b"]
+
+
+def test_append_by_another_worker_changes_the_session_version(tmp_path):
+    from profiling import profile_dataframe
+    from render_cache import make_render_key
+
+    worker_a = ArrowFileSessionBackend(str(tmp_path))
+    worker_b = ArrowFileSessionBackend(str(tmp_path))
+    df = pd.DataFrame({"x": np.arange(100), "y": np.arange(100) * 2.0})
+    worker_a.put("s1", df)
+    before = worker_a.get_entry("s1")
+    request = {"session_id": "s1", "chart_type": "line", "x": "x", "y": "y"}
+    key_before = make_render_key(request, (before.n_rows, before.version))
+
+    rows = pd.DataFrame({"x": np.arange(100, 150), "y": np.arange(100, 150) * 2.0})
+    grown = pd.concat([df, rows], ignore_index=True)
+    worker_b.append("s1", rows, profile_dataframe(grown), expected_rows=100)
+
+    after = worker_a.get_entry("s1")
+    assert after.n_rows == 150
+    assert after.version != before.version
+    assert make_render_key(request, (after.n_rows, after.version)) != key_before
+
+
+def test_idle_shared_session_expires_while_its_sibling_is_in_use(tmp_path):
+    import os
+    import time
+
+    backend = ArrowFileSessionBackend(str(tmp_path), ttl_seconds=60)
+    df = pd.DataFrame({"x": np.arange(10)})
+    backend.put("active", df, content_key="c0ffee")
+    assert backend.share("c0ffee", "idle") is not None
+
+    past = time.time() - 120
+    os.utime(tmp_path / "access" / "idle", (past, past))
+    assert backend.get_entry("active") is not None
+
+    assert backend.get_entry("idle") is None
+    assert backend.get("active")["x"].tolist() == list(range(10))
+    assert not (tmp_path / "access" / "idle").exists()
+
+
+def test_decoded_columns_are_not_served_after_another_worker_appends(tmp_path):
+    from profiling import profile_dataframe
+
+    worker_a = ArrowFileSessionBackend(str(tmp_path))
+    worker_b = ArrowFileSessionBackend(str(tmp_path))
+    df = pd.DataFrame({"x": np.arange(100)})
+    worker_a.put("s1", df)
+    entry = worker_a.get_entry("s1")
+    # Session metadata can be evicted from this process while columns are decoded.
+    worker_a._meta.clear()
+    assert len(worker_a._frame("s1", entry, ["x"])) == 100
+
+    rows = pd.DataFrame({"x": np.arange(100, 150)})
+    worker_b.append("s1", rows, profile_dataframe(pd.concat([df, rows], ignore_index=True)), expected_rows=100)
+
+    worker_a._meta.clear()
+    assert len(worker_a._frame("s1", entry, ["x"])) == 150
+
+
+def test_stats_do_not_remove_expired_sessions(tmp_path):
+    import os
+    import time
+
+    backend = ArrowFileSessionBackend(str(tmp_path), ttl_seconds=60)
+    backend.put("old", pd.DataFrame({"x": [1, 2]}))
+    backend.put("new", pd.DataFrame({"x": [3, 4]}))
+    past = time.time() - 120
+    os.utime(tmp_path / "access" / "old", (past, past))
+
+    stats = backend.stats()
+    assert stats["sessions"] == 1
+    assert stats["expirations"] == 0
+    assert (tmp_path / "old.arrow").exists()
+    assert backend.get_entry("old") is None
+    assert not (tmp_path / "old.arrow").exists()
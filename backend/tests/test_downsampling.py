@@ -0,0 +1,62 @@
+import numpy as np
+import pandas as pd
+
+from downsampling import axis_values, downsample_frame
+
+
+def _series_with_missing_timestamp(n: int) -> pd.DataFrame:
+    df = pd.DataFrame({
+        "t": pd.date_range("2024-01-01", periods=n, freq="min"),
+        "v": np.sin(np.arange(n) / 50.0),
+    })
+    df.loc[n // 2, "t"] = pd.NaT
+    return df
+
+
+def test_axis_values_maps_nat_to_nan():
+    values = axis_values(pd.Series(pd.to_datetime(["2024-01-01", None, "2024-01-03"])))
+    assert np.isnan(values[1])
+    assert not np.isnan(values[[0, 2]]).any()
+
+
+def test_minmax_skips_missing_timestamp():
+    df = _series_with_missing_timestamp(20_000)
+    reduced, decimated = downsample_frame(df, "t", "v", 1000, "minmax")
+    assert decimated
+    assert 100 < len(reduced) <= 1000
+    assert reduced["t"].notna().all()
+
+
+def test_lttb_skips_missing_timestamp():
+    df = _series_with_missing_timestamp(20_000)
+    reduced, decimated = downsample_frame(df, "t", "v", 1000, "lttb")
+    assert decimated
+    assert len(reduced) == 1000
+    assert reduced["t"].notna().all()
+    assert reduced["t"].iloc[0] == df["t"].iloc[0]
+
+
+def test_dropping_missing_rows_alone_is_not_decimation():
+    df = pd.DataFrame({"x": np.arange(1200, dtype=float), "y": np.arange(1200, dtype=float)})
+    df.loc[:299, "y"] = np.nan
+    reduced, decimated = downsample_frame(df, "x", "y", 1000, "lttb")
+    assert len(reduced) == 900
+    assert not decimated
+
+
+def test_grouped_total_stays_within_budget():
+    rng = np.random.default_rng(0)
+    n = 20_000
+    df = pd.DataFrame({"x": np.arange(n), "y": rng.normal(size=n), "g": np.arange(n) % 4})
+    reduced, decimated = downsample_frame(df, "x", "y", 1000, "lttb", group="g")
+    assert decimated and len(reduced) <= 1000
+    assert set(reduced["g"]) == {0, 1, 2, 3}
+
+
+def test_more_groups_than_budget_room_is_reduced_as_one_series():
+    rng = np.random.default_rng(1)
+    n = 20_000
+    df = pd.DataFrame({"x": np.arange(n), "y": rng.normal(size=n), "g": np.arange(n) % 500})
+    for method in ("lttb", "minmax"):
+        reduced, decimated = downsample_frame(df, "x", "y", 1000, method, group="g")
+        assert decimated and len(reduced) <= 1000
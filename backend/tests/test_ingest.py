@@ -0,0 +1,42 @@
+import io
+
+import pandas as pd
+import pytest
+
+from ingest import parse_csv_stream
+
+
+def _csv(rows) -> io.BytesIO:
+    return io.BytesIO(("id,code,value\n" + "".join(f"{i},{c},{v}\n" for i, c, v in rows)).encode("utf-8"))
+
+
+def test_column_numeric_early_and_text_later_is_text_throughout():
+    rows = [(i, i, i * 0.5) for i in range(30)] + [(i, f"X{i}", i * 0.5) for i in range(30, 60)]
+    df = parse_csv_stream(_csv(rows), "c", chunk_rows=10, max_rows=0).df
+    assert pd.api.types.is_string_dtype(df["code"])
+    assert set(df["code"].map(type)) == {str}
+    assert df["code"].iloc[0] == "0" and df["code"].iloc[-1] == "X59"
+    assert pd.api.types.is_integer_dtype(df["id"])
+    assert pd.api.types.is_float_dtype(df["value"])
+
+
+def test_missing_values_stay_missing_when_read_as_text():
+    rows = [(0, 1, 1.0), (1, "", 2.0), (2, "a", 3.0)]
+    df = parse_csv_stream(_csv(rows), "c", chunk_rows=1, max_rows=0).df
+    assert df["code"].isna().tolist() == [False, True, False]
+
+
+def test_ints_and_floats_across_chunks_stay_numeric():
+    rows = [(i, i, 1) for i in range(10)] + [(i, i, 1.5) for i in range(10, 20)]
+    df = parse_csv_stream(_csv(rows), "c", chunk_rows=10, max_rows=0).df
+    assert pd.api.types.is_float_dtype(df["value"])
+    assert pd.api.types.is_integer_dtype(df["code"])
+
+
+def test_pyarrow_engine_reads_a_column_numeric_early_and_text_later_as_text():
+    pytest.importorskip("pyarrow.csv")
+    rows = [(i, i, i * 0.5) for i in range(30)] + [(i, f"X{i}", i * 0.5) for i in range(30, 60)]
+    df = parse_csv_stream(_csv(rows), "pyarrow", chunk_rows=10, max_rows=0).df
+    assert pd.api.types.is_string_dtype(df["code"])
+    assert df["code"].iloc[0] == "0" and df["code"].iloc[-1] == "X59"
+    assert pd.api.types.is_integer_dtype(df["id"])
@@ -0,0 +1,12 @@
+from payload import choose_encoding
+
+
+def test_small_body_is_sent_uncompressed():
+    assert choose_encoding("gzip", body_bytes=100, min_bytes=1024) is None
+    assert choose_encoding("gzip", body_bytes=4096, min_bytes=1024) == "gzip"
+
+
+def test_streamed_body_follows_accept_encoding_only():
+    assert choose_encoding("gzip", streaming=True) == "gzip"
+    assert choose_encoding("identity", streaming=True) is None
+    assert choose_encoding("", streaming=True) is None
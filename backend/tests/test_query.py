@@ -0,0 +1,97 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from profiling import profile_dataframe
+from query import Predicate, SessionIndexes, SortedIndex, select_rows
+from session_store import SessionEntry
+
+
+def make_entry(df: pd.DataFrame, version: int = 1) -> SessionEntry:
+    return SessionEntry(df=df, nbytes=0, created_at=0.0, last_access=0.0, profile=profile_dataframe(df), n_rows=len(df), columns=list(df.columns), version=version)
+
+
+def run(df: pd.DataFrame, predicates, indexed: bool) -> np.ndarray:
+    entry = make_entry(df)
+    index_for = (lambda column: SortedIndex.build(df[column], entry.version)) if indexed else None
+    positions = select_rows(entry, predicates, index_for, lambda cols, rows: df[cols] if rows is None else df[cols].iloc[rows])
+    return np.arange(len(df)) if positions is None else positions
+
+
+@pytest.fixture
+def frame():
+    times = pd.Series(pd.date_range("2024-01-01", periods=48, freq="h", tz="Europe/Istanbul"))
+    times[[3, 20]] = pd.NaT
+    return pd.DataFrame({
+        "t": times,
+        "city": pd.Categorical(np.array(["ankara", "izmir", "bursa"])[np.arange(48) % 3]),
+        "v": np.arange(48, dtype=float),
+    })
+
+
+@pytest.mark.parametrize("predicates", [
+    [Predicate("t", "between", ["2024-01-01 05:00", "2024-01-01T12:00:00+00:00"])],
+    [Predicate("t", "gt", "2024-01-01 05:00"), Predicate("t", "lt", "2024-01-02")],
+    [Predicate("t", "gte", "2024-01-01 05:00"), Predicate("t", "lte", "2024-01-02")],
+    [Predicate("t", "last", "6h")],
+    [Predicate("city", "eq", "izmir")],
+    [Predicate("city", "in", ["ankara", "bursa", "nowhere"])],
+    [Predicate("city", "eq", "izmir"), Predicate("v", "gte", 10), Predicate("t", "lt", "2024-01-02 06:00")],
+])
+def test_indexed_and_scanned_selection_agree(frame, predicates):
+    indexed = run(frame, predicates, indexed=True)
+    scanned = run(frame, predicates, indexed=False)
+    np.testing.assert_array_equal(indexed, scanned)
+    assert len(indexed)
+
+
+def test_naive_bounds_are_read_in_the_column_time_zone(frame):
+    positions = run(frame, [Predicate("t", "between", ["2024-01-01 05:00", "2024-01-01 07:00"])], indexed=True)
+    np.testing.assert_array_equal(positions, [5, 6, 7])
+
+
+def test_range_skips_missing_times():
+    series = pd.Series(pd.to_datetime(["2024-01-03", None, "2024-01-01", "2024-01-02"]))
+    index = SortedIndex.build(series, 1)
+    assert index._range(Predicate("t", "lte", "2024-01-02")) == (1, 3)
+    np.testing.assert_array_equal(index.positions(Predicate("t", "lte", "2024-01-02")), [2, 3])
+    np.testing.assert_array_equal(index.positions(Predicate("t", "gt", "2024-01-01")), [0, 3])
+    np.testing.assert_array_equal(index.positions(Predicate("t", "last", "1D")), [0, 3])
+
+
+def test_categorical_positions_match_json_text():
+    index = SortedIndex.build(pd.Series([10, 20, 10, None, 30], dtype=object), 1)
+    np.testing.assert_array_equal(index.positions(Predicate("c", "eq", 10)), [0, 2])
+    np.testing.assert_array_equal(index.positions(Predicate("c", "in", ["20", 30, 99])), [1, 4])
+    assert len(index.positions(Predicate("c", "eq", 99))) == 0
+
+
+def test_session_indexes_rebuild_when_the_version_changes():
+    indexes = SessionIndexes(max_bytes=0)
+    df = pd.DataFrame({"c": ["a", "b", "a"]})
+    loads = []
+
+    def load():
+        loads.append(1)
+        return df["c"]
+
+    first = indexes.get("s", "c", make_entry(df, version=1), load)
+    assert indexes.get("s", "c", make_entry(df, version=1), load) is first
+    assert indexes.get("s", "c", make_entry(df, version=2), load) is not first
+    assert len(loads) == 2
+    assert indexes.stats()["hits"] == 1
+
+
+def test_session_indexes_evict_least_recently_used():
+    df = pd.DataFrame({"a": np.arange(100), "b": np.arange(100), "c": np.arange(100)})
+    entry = make_entry(df)
+    one = SortedIndex.build(df["a"], 1).nbytes
+    indexes = SessionIndexes(max_bytes=2 * one)
+    indexes.get("s", "a", entry, lambda: df["a"])
+    indexes.get("s", "b", entry, lambda: df["b"])
+    indexes.get("s", "a", entry, lambda: df["a"])
+    indexes.get("s", "c", entry, lambda: df["c"])
+    stats = indexes.stats()
+    assert stats["evictions"] == 1
+    assert stats["bytes"] == 2 * one
+    assert set(indexes._indexes) == {("s", "a"), ("s", "c")}
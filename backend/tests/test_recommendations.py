@@ -0,0 +1,45 @@
+import numpy as np
+import pandas as pd
+
+from profiling import profile_dataframe
+from recommendations import MIN_PAIR_ROWS, PAIR_WORK_BUDGET, _pair_rows, rank_chart_pairs
+
+
+def _rank(df: pd.DataFrame, top_k: int = 10):
+    return rank_chart_pairs(df, profile_dataframe(df), len(df), top_k)
+
+
+def test_uncorrelated_normal_columns_do_not_rank_only_histograms():
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({f"n{i}": rng.normal(size=5000) for i in range(40)})
+    kinds = [r.chart_type for r in _rank(df)]
+    assert kinds.count("histogram") < len(kinds)
+
+
+def test_flag_column_is_not_the_top_pick():
+    rng = np.random.default_rng(1)
+    n = 5000
+    group = rng.choice(["a", "b", "c", "d"], n)
+    df = pd.DataFrame({
+        "group": pd.Categorical(group),
+        "latency": np.where(group == "a", 100.0, 60.0) + rng.normal(0, 5, n),
+        "flag": (rng.random(n) < 0.05).astype(int),
+    })
+    top = _rank(df)[0]
+    assert (top.chart_type, top.x, top.y) == ("bar", "group", "latency")
+    assert all(not (r.chart_type == "histogram" and r.x == "flag") for r in _rank(df, 2))
+
+
+def test_skewed_column_histogram_beats_a_bell_curve():
+    rng = np.random.default_rng(2)
+    df = pd.DataFrame({"normal": rng.normal(size=5000), "skewed": rng.lognormal(0, 1, 5000)})
+    scores = {r.x: r.score for r in _rank(df) if r.chart_type == "histogram"}
+    assert scores["skewed"] > scores["normal"]
+
+
+def test_pair_rows_shrink_with_width_but_not_below_the_floor():
+    assert len(_pair_rows(20_000, 10, 5)) == 20_000
+    wide = _pair_rows(20_000, 150, 150)
+    assert MIN_PAIR_ROWS <= len(wide) < 20_000
+    assert len(wide) * 150 * 300 <= max(PAIR_WORK_BUDGET, MIN_PAIR_ROWS * 150 * 300)
+    assert len(_pair_rows(20_000, 2000, 0)) == MIN_PAIR_ROWS
@@ -0,0 +1,22 @@
+from render_cache import RenderCache, make_render_key
+
+
+REQUEST = {"session_id": "s1", "chart_type": "bar", "x": "a", "y": "b", "options": None}
+
+
+def test_key_ignores_option_order_and_empty_options():
+    assert make_render_key(REQUEST, (10, 1)) == make_render_key({**REQUEST, "options": {}}, (10, 1))
+    a = make_render_key({**REQUEST, "options": {"p": 1, "q": 2}}, (10, 1))
+    b = make_render_key({**REQUEST, "options": {"q": 2, "p": 1}}, (10, 1))
+    assert a == b
+
+
+def test_key_changes_with_the_session_version():
+    assert make_render_key(REQUEST, (10, 1)) != make_render_key(REQUEST, (15, 1))
+    assert make_render_key(REQUEST, (10, 1)) != make_render_key(REQUEST, (10, 2))
+
+
+def test_entries_of_an_older_version_are_not_served():
+    cache = RenderCache(max_bytes=1 << 20)
+    cache.put(make_render_key(REQUEST, (10, 1)), "s1", b"old")
+    assert cache.get(make_render_key(REQUEST, (15, 2))) is None
@@ -0,0 +1,40 @@
+import json
+
+import numpy as np
+import pandas as pd
+
+from rendering import RenderRequest, render_chart_body
+
+
+def _render(df: pd.DataFrame, **spec) -> dict:
+    body, _ = render_chart_body(df, RenderRequest(session_id="s", **spec))
+    return json.loads(body)
+
+
+def test_decimated_line_is_downsampled():
+    df = pd.DataFrame({"x": np.arange(20_000), "y": np.random.default_rng(0).normal(size=20_000)})
+    meta = _render(df, chart_type="line", x="x", y="y", options={"max_points": 500})
+    assert meta["downsampled"] and not meta["aggregated"]
+    assert meta["rendered_points"] == 500
+
+
+def test_grouped_bar_is_aggregated_not_downsampled():
+    df = pd.DataFrame({"x": np.arange(20_000) % 19_999, "y": np.ones(20_000)})
+    meta = _render(df, chart_type="bar", x="x", y="y")
+    assert meta["aggregated"] and not meta["downsampled"]
+    assert meta["rendered_points"] == 19_999
+
+
+def test_small_line_is_neither():
+    df = pd.DataFrame({"x": [1, 2, 3], "y": [3, 1, 2]})
+    meta = _render(df, chart_type="line", x="x", y="y")
+    assert not meta["downsampled"] and not meta["aggregated"]
+
+
+def test_line_with_only_missing_rows_dropped_is_not_downsampled():
+    y = np.arange(20_000, dtype=float)
+    y[:19_500] = np.nan
+    df = pd.DataFrame({"x": np.arange(20_000), "y": y})
+    meta = _render(df, chart_type="line", x="x", y="y", options={"max_points": 1000})
+    assert not meta["downsampled"]
+    assert meta["rendered_points"] == 500
@@ -0,0 +1,118 @@
+import asyncio
+import multiprocessing
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from functools import partial
+from typing import Any, AsyncIterator, Callable, Dict, Optional
+
+from config import WORKER_POOL, WORKER_POOL_SIZE, WORKER_RETRY_AFTER_SECONDS
+
+# Keeps CPU-bound work (CSV parsing, chart building, image decoding) off the
+# event loop. Chart rendering goes to a configurable thread or process pool;
+# work that has to touch in-process objects (upload spools, the session store)
+# goes to threads. Each endpoint holds a limiter that bounds how many of its
+# requests run at once and how many may queue behind them; past that the
+# request is refused with 503 + Retry-After instead of piling up.
+
+_cpu_pool: Optional[Executor] = None
+
+
+class OverloadedError(Exception):
+    """Raised when an endpoint's concurrency limit and wait queue are both full."""
+
+    def __init__(self, endpoint: str, retry_after: int = WORKER_RETRY_AFTER_SECONDS):
+        super().__init__(f"{endpoint} is overloaded, retry in {retry_after}s.")
+        self.endpoint = endpoint
+        self.retry_after = retry_after
+
+
+class EndpointLimiter:
+    """At most `max_concurrency` requests in a stage, `max_queue` more waiting; 0 disables."""
+
+    def __init__(self, name: str, max_concurrency: int, max_queue: int):
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._active = 0
+        self._waiting = 0
+        self._rejected = 0
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphore
+
+    async def acquire(self) -> None:
+        if self.max_concurrency <= 0:
+            self._active += 1
+            return
+        semaphore = self._get_semaphore()
+        if semaphore.locked() and self._waiting >= self.max_queue:
+            self._rejected += 1
+            raise OverloadedError(self.name)
+        self._waiting += 1
+        try:
+            await semaphore.acquire()
+        finally:
+            self._waiting -= 1
+        self._active += 1
+
+    def release(self) -> None:
+        self._active -= 1
+        if self.max_concurrency > 0:
+            self._get_semaphore().release()
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        await self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "active": self._active,
+            "waiting": self._waiting,
+            "rejected": self._rejected,
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+        }
+
+
+def get_cpu_pool() -> Executor:
+    global _cpu_pool
+    if _cpu_pool is None:
+        if WORKER_POOL == "process":
+            # Spawned workers start clean and only import the modules of the functions they run.
+            _cpu_pool = ProcessPoolExecutor(
+                max_workers=WORKER_POOL_SIZE, mp_context=multiprocessing.get_context("spawn")
+            )
+        else:
+            _cpu_pool = ThreadPoolExecutor(max_workers=WORKER_POOL_SIZE, thread_name_prefix="cpu")
+    return _cpu_pool
+
+
+async def run_cpu(fn: Callable[..., Any], *args: Any) -> Any:
+    """Runs a picklable, module-level function in the CPU pool."""
+    return await asyncio.get_running_loop().run_in_executor(get_cpu_pool(), partial(fn, *args))
+
+
+async def run_blocking(fn: Callable[..., Any], *args: Any) -> Any:
+    """Runs a function that needs this process's objects in a worker thread."""
+    return await asyncio.to_thread(fn, *args)
+
+
+def prewarm_cpu_pool(fn: Callable[[], Any]) -> None:
+    """Runs `fn` once per pool worker slot, so process workers are spawned and warmed up front."""
+    futures = [get_cpu_pool().submit(fn) for _ in range(WORKER_POOL_SIZE)]
+    for future in futures:
+        future.result()
+
+
+def shutdown_pools() -> None:
+    global _cpu_pool
+    if _cpu_pool is not None:
+        _cpu_pool.shutdown(wait=False, cancel_futures=True)
+        _cpu_pool = None
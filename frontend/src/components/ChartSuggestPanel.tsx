@@ -46,9 +46,10 @@ export const ChartSuggestPanel: React.FC<ChartSuggestPanelProps> = ({ sessionId,
                 chart_type: chartType,
                 x: xAxis || undefined,
                 y: yAxis || undefined,
+                response_format: 'figure',
             };
             const res = await api.post('/api/render-chart', payload);
-            setChartData(JSON.parse(res.data.plotly_json));
+            setChartData(res.data.figure);
         } catch (error) {
             console.error(error);
             alert("Grafik oluşturulamadı.");